@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class AccountsConfig(AppConfig):
+    name = 'accounts'
+
+    def ready(self):
+        # Keep CachedTokenAuthentication's token -> user cache in step with the database
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+
+        from .authentication import invalidate_token, invalidate_user
+        from .models import User
+
+        post_delete.connect(invalidate_token, sender=Token, dispatch_uid='token-cache-token-deleted')
+        post_save.connect(invalidate_user, sender=User, dispatch_uid='token-cache-user-saved')
+        post_delete.connect(invalidate_user, sender=User, dispatch_uid='token-cache-user-deleted')
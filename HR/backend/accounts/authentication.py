@@ -0,0 +1,90 @@
+# Token authentication with a per-process cache of token -> user.
+#
+# DRF's TokenAuthentication loads the token and its user on every request. Here the pair is kept
+# in an LRU of AUTH_TOKEN_CACHE_SIZE entries for AUTH_TOKEN_CACHE_TTL seconds, so repeat requests
+# (the MCP server's tool calls in particular) run no auth query at all. Entries are dropped when
+# the token is deleted or its user is saved or deleted (deactivation, password or role change);
+# see AccountsConfig.ready(). Signals only reach the process that made the change, and queryset
+# .update() sends none, so other workers notice within the TTL, which is why it is short.
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.authentication import TokenAuthentication
+
+from core.metrics import auth_token_cache
+
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '1000'))
+AUTH_TOKEN_CACHE_TTL = float(os.environ.get('AUTH_TOKEN_CACHE_TTL', '30'))
+
+
+class TokenCache:
+    # LRU of token key -> (expires_at, user, token); only valid, active tokens are stored
+
+    def __init__(self, maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=AUTH_TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, user, token):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (_, user, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # Drop-in replacement for TokenAuthentication: same header, errors and (user, token) result
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            auth_token_cache.inc('miss')
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            auth_token_cache.inc('hit')
+            user, token = cached
+        # Each request gets its own instance; views may change request.user
+        return copy.copy(user), token
+
+
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    token_cache.discard_user(instance.pk)
@@ -0,0 +1,337 @@
+# Synthetic HR data at scale, for benchmarks and capacity planning.
+#
+# Values are generated a column at a time (random.choices / list comprehensions over a
+# whole chunk) from small pools whose normalised search forms are computed once. The
+# high-volume tables are written with one executemany per chunk: bulk_create spends ~90%
+# of its time building model instances and preparing every value field by field, and on
+# SQLite it also splits each chunk into 999-parameter statements.
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .management.commands.populate_filter_options import CITIES, COMM_SKILLS, SOURCES
+from .models import (
+    Candidate, ChatMessage, ChatSession, City, CommunicationSkill, JobPost, JobTitle, Note, Notification, Source, User,
+    normalise_search_text,
+)
+
+FIRST_NAMES = ['Ali', 'Ahmed', 'Sara', 'Ayesha', 'Usman', 'Fatima', 'Hassan', 'Zainab', 'Bilal', 'Hina', 'Omar', 'Maryam',
+               'Imran', 'Sana', 'Kamran', 'Nadia', 'Jane', 'John', 'Maria', 'David', 'Emma', 'Noah', 'Olivia', 'Liam',
+               'Zoë', 'José', 'Chloé', 'Renée']
+LAST_NAMES = ['Khan', 'Ahmed', 'Malik', 'Hussain', 'Sheikh', 'Qureshi', 'Butt', 'Raza', 'Siddiqui', 'Chaudhry', 'Iqbal',
+              'Mirza', 'Smith', 'Johnson', 'Brown', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Taylor', 'Müller', 'Núñez']
+JOB_TITLES = ['Software Engineer', 'Data Analyst', 'Product Manager', 'HR Generalist', 'Recruiter', 'QA Engineer',
+              'DevOps Engineer', 'UI/UX Designer', 'Sales Executive', 'Accountant', 'Marketing Specialist', 'Team Lead']
+DEPARTMENTS = ['Engineering', 'Product', 'People', 'Sales', 'Finance', 'Marketing', 'Operations']
+NOTE_TEMPLATES = ['Phone screen went well.', 'Strong portfolio, follow up next week.', 'Asked for a higher salary.',
+                  'Needs a second technical round.', 'Available to join in one month.', 'Not responsive to emails.']
+CHAT_PROMPTS = ['Show me candidate {n}', 'How many candidates are in the interview stage?', 'List all candidates',
+                'Move candidate {n} to Offer', 'Give me the hiring metrics', 'Find candidate sara']
+
+# Percentages by default; any positive weights work
+# The stage keys the app stores and filters on (the frontend's selects and badges, intents.STAGES)
+STAGES = ('applied', 'screening', 'technical', 'interview', 'offer', 'hired', 'rejected')
+DEFAULT_STAGE_MIX = {'applied': 35, 'screening': 20, 'technical': 10, 'interview': 15,
+                     'offer': 5, 'hired': 5, 'rejected': 10}
+DEFAULT_SALARY_RANGE = (40000, 600000)
+DEFAULT_RAISE_RANGE = (1.0, 1.5)
+DEFAULT_EXPERIENCE_RANGE = (0.0, 20.0)
+
+
+def parse_mix(value):
+    # "applied=40,hired=10" -> {'applied': 40.0, 'hired': 10.0}
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if not name.strip() or not weight.strip():
+            raise ValueError(f'Expected name=weight, got {part!r}')
+        mix[name.strip()] = float(weight)
+    if not mix or any(w < 0 for w in mix.values()) or not sum(mix.values()):
+        raise ValueError('Weights must be non-negative and not all zero')
+    return mix
+
+
+def parse_range(value, cast=float):
+    # "40000:600000" -> (40000, 600000)
+    low, _, high = value.partition(':')
+    low, high = cast(low), cast(high)
+    if high < low:
+        raise ValueError(f'Empty range {value!r}')
+    return low, high
+
+
+def insert_rows(model, names, rows):
+    # INSERT a chunk of prebuilt tuples (one value per field in `names`) with one executemany.
+    # Values go to the driver as they are (see FakeDataGenerator.timestamps), and defaults and
+    # auto_now_add are not applied, so every column must be given.
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in names]
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        qn(model._meta.db_table), ', '.join(qn(f.column) for f in fields), ', '.join(['%s'] * len(fields)),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def bulk_insert(model, columns):
+    # insert_rows for a chunk given as {field name: list of values}
+    return insert_rows(model, list(columns), list(zip(*columns.values())))
+
+
+def _secondary_indexes(cursor, table):
+    # (name, CREATE statement) of the plain indexes; primary keys and unique constraints stay
+    if connection.vendor == 'sqlite':
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL", [table])
+    elif connection.vendor == 'postgresql':
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+            '(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)', [table, table],
+        )
+    else:
+        return []
+    return cursor.fetchall()
+
+
+@contextmanager
+def deferred_indexes(model):
+    # Drop a table's secondary indexes for a bulk load and rebuild them afterwards: one sorted
+    # build per index is much cheaper than millions of random-order B-tree inserts
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        indexes = _secondary_indexes(cursor, model._meta.db_table)
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {qn(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+@contextmanager
+def sqlite_pragmas(**pragmas):
+    # Set PRAGMAs on this connection for the length of a load and put the previous values back,
+    # including journal_mode, which unlike the rest is stored in the database file
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    previous = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in reversed(previous.items()):
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def lookup_ids(model, names):
+    # get_or_create for a whole list in two queries
+    names = list(dict.fromkeys(names))
+    existing = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [model(name=name) for name in names if name not in existing]
+    if missing:
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    return [existing[name] for name in names]
+
+
+class FakeDataGenerator:
+
+    def __init__(self, seed=42, batch_size=10000, stage_mix=None, salary_range=DEFAULT_SALARY_RANGE,
+                 raise_range=DEFAULT_RAISE_RANGE, experience_range=DEFAULT_EXPERIENCE_RANGE, days=730):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.stage_mix = {stage.lower(): weight for stage, weight in (stage_mix or DEFAULT_STAGE_MIX).items()}
+        unknown = sorted(set(self.stage_mix) - set(STAGES))
+        if unknown:
+            raise ValueError(f"Unknown stage(s) {', '.join(unknown)}; expected {', '.join(STAGES)}")
+        self.salary_range = salary_range
+        self.raise_range = raise_range
+        self.experience_range = experience_range
+        self.days = days
+        self.now = timezone.now()
+        self._lookups = None
+        self._timestamps = None
+
+    def lookups(self):
+        if self._lookups is None:
+            self._lookups = {
+                'job_title': lookup_ids(JobTitle, JOB_TITLES),
+                'city': lookup_ids(City, CITIES),
+                'source': lookup_ids(Source, SOURCES),
+                'communication_skills': lookup_ids(CommunicationSkill, COMM_SKILLS),
+            }
+        return self._lookups
+
+    def chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def timestamps(self, n):
+        # Spread over the last `days` at ten-minute resolution. Only `now` goes through the
+        # backend's conversion (time zone handling included); the rest of the pool is offset from
+        # its result, in the same form: the field-by-field path costs more than the inserts.
+        if self._timestamps is None:
+            latest = models.DateTimeField().get_db_prep_save(self.now, connection)
+            offsets = range(0, max(1, self.days) * 1440, 10)
+            if isinstance(latest, str):
+                # SQLite stores str() of the naive UTC datetime. Ten-minute steps land on the same
+                # 144 times of day, so each value is a day string plus a time string; rendering
+                # the ~100k datetimes one by one took longer than inserting them
+                latest = datetime.fromisoformat(latest)
+                earliest = latest - timedelta(minutes=offsets[-1])
+                times = sorted(str(earliest + timedelta(minutes=m))[11:] for m in range(0, 1440, 10))
+                dates = [str(earliest.date() + timedelta(days=d)) for d in range((latest.date() - earliest.date()).days + 1)]
+                first, last = str(earliest), str(latest)
+                self._timestamps = [stamp for stamp in (f'{d} {t}' for d in dates for t in times) if first <= stamp <= last]
+            else:
+                self._timestamps = [latest - timedelta(minutes=m) for m in offsets]
+        return self.rng.choices(self._timestamps, k=n)
+
+    def steps(self, low, high, step):
+        # Pool of evenly spaced values for rng.choices, which draws a whole column far faster
+        # than one arithmetic expression per row
+        count = int(round((high - low) / step)) + 1
+        return [low + i * step for i in range(count)]
+
+    def candidates(self, n):
+        rng = self.rng
+        lookups = self.lookups()
+        stages, weights = list(self.stage_mix), list(self.stage_mix.values())
+        # Unique across runs: emails and phones continue from the current highest id
+        offset = (Candidate.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        # Independent uniform columns are drawn in pairs from their cross products: one draw per
+        # pair instead of per column, with the same distribution. Search columns come with the
+        # names, normalised once per pool entry rather than per row.
+        people = [(first, last, normalise_search_text(first), normalise_search_text(last))
+                  for first in FIRST_NAMES for last in LAST_NAMES]
+        roles = [(title, city) for title in lookups['job_title'] for city in lookups['city']]
+        origins = [(source, skill) for source in lookups['source'] for skill in lookups['communication_skills']]
+        # Whole numbers are valid decimal column values on every backend
+        salary_pool = self.steps(int(self.salary_range[0]) // 100 * 100, int(self.salary_range[1]), 100)
+        raise_pool = [r / 100 for r in self.steps(int(self.raise_range[0] * 100), int(self.raise_range[1] * 100), 1)]
+        experience_pool = [round(e, 1) for e in self.steps(self.experience_range[0], self.experience_range[1], 0.1)]
+        names = ['first_name', 'last_name', 'email', 'phone_number', 'candidate_stage', 'current_salary',
+                 'expected_salary', 'years_of_experience', 'notes', 'created_at', 'search_name', 'search_last_name',
+                 'search_email', 'search_phone', 'job_title', 'city', 'source', 'communication_skills']
+        created = 0
+        for start, size in self.chunks(n):
+            rows = []
+            for i, (first, last, folded_first, folded_last), stage, salary, rate, years, created_at, (title, city), (source, skill) in zip(
+                range(offset + start, offset + start + size),
+                rng.choices(people, k=size),
+                rng.choices(stages, weights=weights, k=size),
+                rng.choices(salary_pool, k=size),
+                rng.choices(raise_pool, k=size),
+                rng.choices(experience_pool, k=size),
+                self.timestamps(size),
+                rng.choices(roles, k=size),
+                rng.choices(origins, k=size),
+            ):
+                email = f'{folded_first}.{folded_last}.{i}@example.test'.replace(' ', '')
+                # "+92 3xxxxxxxxx", whose normalise_phone() form is the digits
+                digits = f'923{i % 10**9:09d}'
+                rows.append((
+                    first, last, email, f'+92 {digits[2:]}', stage, salary, int(salary * rate) // 100 * 100, years, '',
+                    created_at, f'{folded_first} {folded_last}', folded_last, email, digits, title, city, source, skill,
+                ))
+            created += insert_rows(Candidate, names, rows)
+        return created
+
+    def notes(self, per_candidate):
+        # per_candidate is a mean, so 0.5 gives roughly every second candidate a note
+        ids = list(Candidate.objects.values_list('id', flat=True))
+        created = 0
+        for _, size in self.chunks(int(len(ids) * per_candidate)):
+            created += bulk_insert(Note, {
+                'candidate': self.rng.choices(ids, k=size),
+                'content': self.rng.choices(NOTE_TEMPLATES, k=size),
+                'created_at': self.timestamps(size),
+            })
+        return created
+
+    def job_posts(self, n, posted_by=None):
+        rng = self.rng
+        title_ids = self.lookups()['job_title']
+        titles = dict(zip(title_ids, JOB_TITLES))
+        created = 0
+        for start, size in self.chunks(n):
+            chosen = rng.choices(title_ids, k=size)
+            locations = rng.choices(CITIES, k=size)
+            minimums = rng.choices(self.steps(int(self.salary_range[0]) // 1000 * 1000, int(self.salary_range[1] * 0.7), 1000), k=size)
+            created += bulk_insert(JobPost, {
+                'job_title': chosen,
+                'title': [f'{titles[t]} ({start + i + 1})' for i, t in enumerate(chosen)],
+                'description': [f'We are hiring a {titles[t]} in {loc}.' for t, loc in zip(chosen, locations)],
+                'location': locations,
+                'department': rng.choices(DEPARTMENTS, k=size),
+                'employment_type': rng.choices(['full_time', 'part_time', 'contract', 'internship'], weights=[7, 1, 1, 1], k=size),
+                'salary_min': minimums,
+                'salary_max': [m * 14 // 10 for m in minimums],
+                'requirements': [''] * size,
+                'posted_by': [posted_by.pk if posted_by else None] * size,
+                'created_at': self.timestamps(size),
+                'status': rng.choices(['open', 'closed', 'draft'], weights=[6, 3, 1], k=size),
+            })
+        return created
+
+    def notifications(self, n, users):
+        user_ids = [u.pk for u in users]
+        created = 0
+        for start, size in self.chunks(n):
+            created += bulk_insert(Notification, {
+                'user': self.rng.choices(user_ids, k=size),
+                'message': [f'Candidate {start + i + 1} was updated.' for i in range(size)],
+                'is_read': self.rng.choices([True, False], weights=[7, 3], k=size),
+                'created_at': self.timestamps(size),
+            })
+        return created
+
+    def chat_sessions(self, n, messages_per_session, users):
+        # Sessions go through bulk_create (there are few and their ids are needed), messages in chunks
+        owners = self.rng.choices([u.pk for u in users], k=n)
+        first_id = (ChatSession.objects.order_by('-id').values_list('id', flat=True).first() or 0)
+        with transaction.atomic():
+            ChatSession.objects.bulk_create([
+                ChatSession(user_id=owner, session_name=f'Session {i + 1}', role='admin', model='openai/gpt-4o')
+                for i, owner in enumerate(owners)
+            ], batch_size=self.batch_size)
+        session_ids = list(ChatSession.objects.filter(id__gt=first_id).values_list('id', flat=True))
+        per_chunk = max(1, self.batch_size // max(1, messages_per_session))
+        messages = 0
+        for start in range(0, len(session_ids), per_chunk):
+            chunk = session_ids[start:start + per_chunk]
+            size = len(chunk) * messages_per_session
+            prompts = self.rng.choices(CHAT_PROMPTS, k=size)
+            numbers = self.rng.choices(range(1, 1000), k=size)
+            roles = ['user' if m % 2 == 0 else 'assistant' for m in range(messages_per_session)] * len(chunk)
+            messages += bulk_insert(ChatMessage, {
+                'session': [sid for sid in chunk for _ in range(messages_per_session)],
+                'role': roles,
+                'content': [p.format(n=k) if r == 'user' else 'Here is what I found.' for p, k, r in zip(prompts, numbers, roles)],
+                'timestamp': self.timestamps(size),
+            })
+        return len(session_ids), messages
+
+    def users(self, n, prefix='fake'):
+        # Plain role users with an unusable password; hashing a real one per user would dominate the run
+        existing = set(User.objects.filter(username__startswith=f'{prefix}_').values_list('username', flat=True))
+        batch = []
+        for i in range(n):
+            username = f'{prefix}_{i + 1}'
+            if username not in existing:
+                user = User(username=username, email=f'{username}@example.test', role='user')
+                user.set_unusable_password()
+                batch.append(user)
+        User.objects.bulk_create(batch, batch_size=self.batch_size)
+        return list(User.objects.filter(username__startswith=f'{prefix}_').order_by('id'))
@@ -0,0 +1,216 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.fake_data import FakeDataGenerator
+from accounts.models import Candidate, ChatMessage, ChatSession, JobPost, Note, Notification, User
+from core.querylog import N_PLUS_ONE_THRESHOLD, normalise
+
+# (name, path, query params); every request is a GET with the benchmark user's token
+ENDPOINTS = [
+    ('candidate_list', '/api/candidates/', {}),
+    ('candidate_list_deep_page', '/api/candidates/', {'page': 'deep'}),
+    ('candidate_search', '/api/candidates/', {'search': 'smith'}),
+    ('candidate_filter', '/api/candidates/', {'candidate_stage': 'hired', 'city': 'Lahore'}),
+    ('candidate_ordering', '/api/candidates/', {'ordering': '-expected_salary'}),
+    ('candidate_lookup', '/api/candidates/lookup/', {'q': 'sara kh'}),
+    ('candidate_detail', '/api/candidates/{candidate_id}/', {}),
+    ('metrics', '/api/metrics/', {}),
+    ('candidate_metrics', '/api/candidates/metrics/', {}),
+    ('export_csv', '/api/candidates/export/csv/', {}),
+    ('notifications', '/api/notifications/', {}),
+    ('notifications_unread', '/api/notifications/unread/', {}),
+    ('recent_activities', '/api/recent-activities/', {}),
+    ('chat_sessions', '/api/chatsessions/', {}),
+    ('chat_messages', '/api/chatmessages/', {'session': '{session_id}'}),
+]
+# Endpoints whose cost grows with the whole table get fewer iterations by default
+SLOW_ENDPOINTS = {'export_csv'}
+
+
+class QueryCounter:
+    # execute_wrapper instead of CaptureQueriesContext: the latter relies on the 9000-entry
+    # queries_log, which a single CSV export over a large table overflows
+    def __init__(self):
+        self.count = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements[normalise(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        # Statements run N_PLUS_ONE_THRESHOLD times or more in one request, as core.querylog flags them
+        return {sql: n for sql, n in self.statements.items() if n >= N_PLUS_ONE_THRESHOLD}
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ('Seed an isolated test database with a synthetic HR dataset and benchmark the API '
+            '(p50/p95/p99 latency, throughput, query counts). Runs offline; writes a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=10000, help='Candidates to seed (e.g. 10000, 100000, 1000000)')
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint')
+        parser.add_argument('--slow-requests', type=int, default=3, help='Measured requests for whole-table endpoints (CSV export)')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per endpoint')
+        parser.add_argument('--only', nargs='*', help='Benchmark only these endpoint names')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--output', default='benchmark_report.json', help="Report path ('-' for stdout)")
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse if seeded) the test database')
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = settings.DATABASES['default']['NAME']
+        # The configured database is never touched: everything happens in Django's test database
+        test_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+                report = self.run(options, test_name)
+        finally:
+            if not options['keepdb']:
+                creation.destroy_test_db(old_name, verbosity=0)
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options['output'] == '-':
+            self.stdout.write(payload)
+        else:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        # Timings of error responses say nothing about the endpoint: the run fails, after the report is written
+        failed = [name for name, r in report['endpoints'].items() if r['errors']]
+        if failed:
+            raise CommandError(f"Non-2xx responses from: {', '.join(failed)}")
+
+    def run(self, options, test_name):
+        started = time.perf_counter()
+        if options['keepdb'] and Candidate.objects.count() == options['candidates']:
+            user = User.objects.get(username='benchmark')
+            self.stdout.write(f'Reusing seeded test database ({options["candidates"]} candidates)')
+        else:
+            user = self.seed(options['seed'], options['candidates'], options['batch_size'])
+        seed_seconds = time.perf_counter() - started
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        context = {
+            'candidate_id': Candidate.objects.order_by('-id').values_list('id', flat=True).first(),
+            'session_id': ChatSession.objects.filter(user=user).values_list('id', flat=True).first(),
+            'last_page': max(1, Candidate.objects.count() // settings.REST_FRAMEWORK.get('PAGE_SIZE', 15)),
+        }
+        results = {}
+        for name, path, params in ENDPOINTS:
+            if options['only'] and name not in options['only']:
+                continue
+            n = options['slow_requests'] if name in SLOW_ENDPOINTS else options['requests']
+            results[name] = self.measure(client, name, path, params, context, n, options['warmup'] if n > 3 else 1)
+            r = results[name]
+            self.stdout.write(f"{name:28} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+                              f"p99 {r['p99_ms']:9.2f} ms  {r['rps']:8.1f} req/s  {r['queries_median']:4} queries")
+            if r['errors']:
+                self.stdout.write(self.style.ERROR(f"{'':28} {r['errors']} of {n} responses were not 2xx: {r['status_codes']}"))
+            for suspect in r['n_plus_one']:
+                self.stdout.write(self.style.WARNING(f"{'':28} possible N+1: {suspect['count']} x {suspect['sql'][:120]}"))
+        return {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'git_commit': self.git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'test_database': str(test_name),
+                'seed': options['seed'],
+                'requests_per_endpoint': options['requests'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'dataset': {
+                'candidates': Candidate.objects.count(),
+                'notes': Note.objects.count(),
+                'job_posts': JobPost.objects.count(),
+                'notifications': Notification.objects.count(),
+                'chat_sessions': ChatSession.objects.count(),
+                'chat_messages': ChatMessage.objects.count(),
+            },
+            'endpoints': results,
+        }
+
+    def measure(self, client, name, path, params, context, n, warmup):
+        path = path.format(**context)
+        params = {k: str(v).format(**context) for k, v in params.items()}
+        if params.get('page') == 'deep':
+            params['page'] = context['last_page']
+        timings, queries, statuses, sizes = [], [], {}, []
+        errors = 0
+        repeated = {}
+        for i in range(warmup + n):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                response = client.get(path, params)
+                # Streaming responses are only done once fully consumed
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(counter.count)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if not 200 <= response.status_code < 300:
+                errors += 1
+            for sql, count in counter.repeated().items():
+                repeated[sql] = max(count, repeated.get(sql, 0))
+            sizes.append(len(body))
+        total_seconds = sum(timings) / 1000
+        return {
+            'path': path,
+            'params': params,
+            'requests': n,
+            'status_codes': statuses,
+            'errors': errors,
+            'n_plus_one': [{'sql': sql, 'count': count} for sql, count in sorted(repeated.items(), key=lambda item: -item[1])],
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'rps': round(n / total_seconds, 2) if total_seconds else None,
+            'queries_median': int(statistics.median(queries)),
+            'queries_max': max(queries),
+            'response_bytes': int(statistics.median(sizes)),
+        }
+
+    def seed(self, seed, n_candidates, batch_size):
+        self.stdout.write(f'Seeding {n_candidates} candidates ...')
+        user = User.objects.create_user('benchmark', 'benchmark@example.com', 'benchmark', role='admin')
+        generator = FakeDataGenerator(seed=seed, batch_size=batch_size)
+        generator.candidates(n_candidates)
+        generator.notes(0.5)
+        generator.job_posts(max(10, n_candidates // 100), posted_by=user)
+        # Everything user-scoped belongs to the benchmark user so its endpoints return real pages
+        generator.notifications(min(5000, max(100, n_candidates // 10)), [user])
+        generator.chat_sessions(50, 40, [user])
+        return user
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
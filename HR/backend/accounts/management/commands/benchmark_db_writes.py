@@ -0,0 +1,180 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.backends.signals import connection_created
+
+from accounts.models import ChatMessage, ChatSession, Notification, User, create_notification
+
+from .benchmark_api import percentile
+
+PROFILES = ('sqlite', 'sqlite-wal', 'postgres')
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent writes under the configured database profile (DJANGO_DB_PROFILE): '
+            'threads posting chat turns and notifications while others read, each operation '
+            'opening and closing its connection the way a request does. Runs in a scratch test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Writer threads')
+        parser.add_argument('--readers', type=int, default=2, help='Threads listing notifications while the writers run')
+        parser.add_argument('--ops', type=int, default=200, help='Writes per writer thread')
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                            help='Run once per profile, each in a fresh process, and compare them')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON only')
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            self.compare(options)
+            return
+        creation = connection.creation
+        old_name = settings.DATABASES['default']['NAME']
+        if connection.vendor == 'sqlite':
+            # Django's SQLite test database is in memory by default, where there is no file locking to measure
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), f'hr-db-bench-{os.getpid()}.sqlite3')
+        creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            result = self.run(options)
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.write_header()
+            self.write_row(result)
+
+    def run(self, options):
+        user = User.objects.create_user('db-benchmark', 'db-benchmark@example.com', 'benchmark')
+        sessions = [ChatSession.objects.create(user=user, session_name=f'bench {i}').pk for i in range(options['writers'])]
+        journal_mode = None
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+        connection.close()
+
+        opened = []
+        errors = Counter()
+        write_ms, read_ms = [], []
+        start = threading.Barrier(options['writers'] + options['readers'] + 1)
+        writers_done = threading.Event()
+
+        def on_connect(**kwargs):
+            opened.append(1)
+
+        def timed(op, samples):
+            close_old_connections()
+            began = time.perf_counter()
+            try:
+                op()
+                samples.append((time.perf_counter() - began) * 1000)
+            except DatabaseError as e:
+                errors[str(e)] += 1
+            finally:
+                # Request finished: closes the connection unless CONN_MAX_AGE keeps it
+                close_old_connections()
+
+        def writer(session_id):
+            def chat_turn():
+                # Read, then write in the same transaction, as ChatMessageViewSet.create does
+                with transaction.atomic():
+                    session = ChatSession.objects.get(pk=session_id)
+                    ChatMessage.objects.create(session=session, role='user', content='How many candidates were hired this month?')
+                    session.save(update_fields=['updated_at'])
+
+            def notify():
+                create_notification(user, 'Candidate stage changed to Interview.')
+
+            start.wait()
+            try:
+                for i in range(options['ops']):
+                    timed(chat_turn if i % 2 == 0 else notify, write_ms)
+            finally:
+                connection.close()
+
+        def reader():
+            def latest():
+                list(Notification.objects.filter(user=user).order_by('-created_at')[:15])
+
+            start.wait()
+            try:
+                while not writers_done.is_set():
+                    timed(latest, read_ms)
+            finally:
+                connection.close()
+
+        connection_created.connect(on_connect, dispatch_uid='benchmark-db-writes')
+        try:
+            writer_threads = [threading.Thread(target=writer, args=(sessions[i],)) for i in range(options['writers'])]
+            reader_threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+            for thread in writer_threads + reader_threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in writer_threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+            writers_done.set()
+            for thread in reader_threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(dispatch_uid='benchmark-db-writes')
+
+        attempted = options['writers'] * options['ops']
+        return {
+            'profile': settings.DB_PROFILE,
+            'vendor': connection.vendor,
+            'journal_mode': journal_mode,
+            'conn_max_age': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'writes_attempted': attempted,
+            'writes_ok': len(write_ms),
+            'writes_per_s': round(len(write_ms) / elapsed, 1),
+            'write_p50_ms': round(percentile(write_ms, 0.50), 2) if write_ms else None,
+            'write_p95_ms': round(percentile(write_ms, 0.95), 2) if write_ms else None,
+            'write_p99_ms': round(percentile(write_ms, 0.99), 2) if write_ms else None,
+            'write_mean_ms': round(statistics.fmean(write_ms), 2) if write_ms else None,
+            'reads': len(read_ms),
+            'read_p95_ms': round(percentile(read_ms, 0.95), 2) if read_ms else None,
+            'errors': dict(errors),
+            'connections_opened': len(opened),
+            'seconds': round(elapsed, 2),
+        }
+
+    def compare(self, options):
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        args = [sys.executable, manage, 'benchmark_db_writes', '--json', '--writers', str(options['writers']),
+                '--readers', str(options['readers']), '--ops', str(options['ops'])]
+        self.write_header()
+        for profile in options['profiles']:
+            child = subprocess.run(args, capture_output=True, text=True, env=dict(os.environ, DJANGO_DB_PROFILE=profile))
+            lines = [line for line in child.stdout.splitlines() if line.startswith('{')]
+            if child.returncode or not lines:
+                error = (child.stderr.strip().splitlines() or ['no output'])[-1]
+                self.stdout.write(self.style.ERROR(f'{profile:12} failed: {error}'))
+                continue
+            self.write_row(json.loads(lines[-1]))
+
+    def write_header(self):
+        self.stdout.write(f"{'profile':12} {'journal':8} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'failed':>7} {'reads':>7} {'read p95':>9} {'conns':>6}")
+
+    def write_row(self, r):
+        failed = r['writes_attempted'] - r['writes_ok']
+        self.stdout.write(
+            f"{r['profile']:12} {r['journal_mode'] or '-':8} {r['writes_per_s']:9.1f} {r['write_p50_ms'] or 0:8.2f} "
+            f"{r['write_p95_ms'] or 0:8.2f} {r['write_p99_ms'] or 0:8.2f} {failed:7} {r['reads']:7} "
+            f"{r['read_p95_ms'] or 0:9.2f} {r['connections_opened']:6}")
+        for message, count in r['errors'].items():
+            self.stdout.write(f"{'':12} {count} x {message}")
@@ -0,0 +1,111 @@
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.fake_data import (
+    DEFAULT_EXPERIENCE_RANGE, DEFAULT_RAISE_RANGE, DEFAULT_SALARY_RANGE, DEFAULT_STAGE_MIX, FakeDataGenerator,
+    deferred_indexes, parse_mix, parse_range, sqlite_pragmas,
+)
+from accounts.models import Candidate, ChatMessage, ChatSession, JobPost, Note, Notification
+from core.profiling import MODES, PROFILE_DIR, profiled
+
+
+def _mix(value):
+    return ','.join(f'{k}={v:g}' for k, v in value.items())
+
+
+def _range(value):
+    return f'{value[0]:g}:{value[1]:g}'
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic candidates, notes, job posts, notifications and chat sessions in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=100000)
+        parser.add_argument('--notes-per-candidate', type=float, default=0.5, help='Mean notes per candidate')
+        parser.add_argument('--job-posts', type=int, default=None, help='Default: 1 per 100 candidates')
+        parser.add_argument('--notifications', type=int, default=None, help='Default: 1 per 10 candidates')
+        parser.add_argument('--chat-sessions', type=int, default=100)
+        parser.add_argument('--messages-per-session', type=int, default=20)
+        parser.add_argument('--users', type=int, default=10, help='Users owning the notifications and chat sessions')
+        parser.add_argument('--stage-mix', default=_mix(DEFAULT_STAGE_MIX), help='Relative weights by stage key, e.g. "applied=60,technical=10,hired=5"')
+        parser.add_argument('--salary-range', default=_range(DEFAULT_SALARY_RANGE), help='Current salary min:max')
+        parser.add_argument('--raise-range', default=_range(DEFAULT_RAISE_RANGE), help='Expected/current salary ratio min:max')
+        parser.add_argument('--experience-range', default=_range(DEFAULT_EXPERIENCE_RANGE), help='Years of experience min:max')
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many past days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows generated and written per transaction')
+        parser.add_argument('--unsafe-fast', action='store_true',
+                            help='Scratch databases only: no fsyncs, an in-memory rollback journal, and secondary '
+                                 'indexes dropped for the load and rebuilt once at the end. A crash mid-load can '
+                                 'corrupt the database or leave it without those indexes.')
+        parser.add_argument('--clear', action='store_true', help='Delete existing candidates, job posts, notifications and chats first')
+        parser.add_argument('--profile', choices=MODES, default=None,
+                            help='Profile the load (memory: tracemalloc snapshots) and write the result to PROFILE_DIR')
+
+    def handle(self, *args, **options):
+        try:
+            generator = FakeDataGenerator(
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                stage_mix=parse_mix(options['stage_mix']),
+                salary_range=parse_range(options['salary_range']),
+                raise_range=parse_range(options['raise_range']),
+                experience_range=parse_range(options['experience_range']),
+                days=options['days'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['clear']:
+            for model in (ChatMessage, ChatSession, Notification, Note, JobPost, Candidate):
+                model.objects.all().delete()
+            self.stdout.write('Cleared existing data.')
+
+        # This connection only, and restored afterwards. A bigger page cache is always safe; with
+        # --unsafe-fast the rollback journal and fsyncs, which cost more than the inserts, go too
+        pragmas = {'temp_store': 'MEMORY', 'cache_size': -200000}
+        if options['unsafe_fast']:
+            pragmas.update(synchronous='OFF', journal_mode='MEMORY')
+        with sqlite_pragmas(**pragmas):
+            self.generate(generator, options)
+
+    def generate(self, generator, options):
+        n = options['candidates']
+        users = generator.users(options['users'])
+        steps = [
+            ('candidates', lambda: self.load(Candidate, generator.candidates, n, **options)),
+            ('notes', lambda: self.load(Note, generator.notes, options['notes_per_candidate'], **options)),
+            ('job posts', lambda: generator.job_posts(n // 100 if options['job_posts'] is None else options['job_posts'], users[0])),
+            ('notifications', lambda: generator.notifications(n // 10 if options['notifications'] is None else options['notifications'], users)),
+            ('chat sessions', lambda: generator.chat_sessions(options['chat_sessions'], options['messages_per_session'], users)),
+        ]
+        total_rows, total_seconds = 0, 0.0
+        profile = profiled(options['profile'], 'generate_fake_data') if options['profile'] else nullcontext()
+        with profile as profiler:
+            for label, step in steps:
+                started = time.perf_counter()
+                result = step()
+                elapsed = time.perf_counter() - started
+                rows = sum(result) if isinstance(result, tuple) else result
+                total_rows += rows
+                total_seconds += elapsed
+                rate = rows / elapsed if elapsed else 0
+                self.stdout.write(f'{label:14} {rows:>10} rows in {elapsed:7.2f}s ({rate:,.0f} rows/s)')
+        if profiler is not None:
+            self.stdout.write(f'Profile written to {PROFILE_DIR}/{profiler.filename}')
+        if connection.vendor == 'sqlite':
+            # Planner statistics for the new table sizes
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        rate = total_rows / total_seconds if total_seconds else 0
+        self.stdout.write(self.style.SUCCESS(f'Generated {total_rows} rows in {total_seconds:.2f}s ({rate:,.0f} rows/s).'))
+
+    def load(self, model, step, *args, unsafe_fast=False, **options):
+        if not unsafe_fast:
+            return step(*args)
+        with deferred_indexes(model):
+            return step(*args)
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Frozen copies of accounts.models.normalise_search_text / normalise_phone as of this migration,
+# so later changes to the live helpers cannot change what the backfill writes
+
+def normalise_search_text(value):
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.casefold().split())
+
+
+def normalise_phone(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def backfill_search_fields(apps, schema_editor):
+    Candidate = apps.get_model('accounts', 'Candidate')
+    fields = ['search_name', 'search_last_name', 'search_email', 'search_phone']
+    batch = []
+    for candidate in Candidate.objects.only('id', 'first_name', 'last_name', 'email', 'phone_number').iterator(chunk_size=2000):
+        candidate.search_name = normalise_search_text(f"{candidate.first_name} {candidate.last_name}")
+        candidate.search_last_name = normalise_search_text(candidate.last_name)
+        candidate.search_email = normalise_search_text(candidate.email)
+        candidate.search_phone = normalise_phone(candidate.phone_number)
+        batch.append(candidate)
+        if len(batch) >= 2000:
+            Candidate.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Candidate.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_chatsession_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='search_email',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='search_last_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='search_phone',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_search_fields, migrations.RunPython.noop),
+    ]
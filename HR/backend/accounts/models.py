@@ -1,5 +1,8 @@
+import re
+import unicodedata
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 
@@ -16,6 +19,33 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+def normalise_search_text(value):
+    # Lower-cased, accent-free, single-spaced form used by the candidate lookup columns
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.casefold().split())
+
+def normalise_phone(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+class CandidateQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # Candidate.save() keeps the search_* columns in step; a bulk update of a field they are
+        # derived from (including bulk_update()) has to recompute them for the rows it touched
+        if not Candidate.SEARCH_SOURCES.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list('pk', flat=True))
+            count = super().update(**kwargs)
+            for start in range(0, len(ids), 2000):
+                rows = list(self.model._base_manager.using(self.db).filter(pk__in=ids[start:start + 2000])
+                            .only('pk', *Candidate.SEARCH_SOURCES))
+                for row in rows:
+                    row.update_search_fields()
+                self.model._base_manager.using(self.db).bulk_update(rows, Candidate.SEARCH_FIELDS)
+        return count
+
 class Candidate(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -31,12 +61,32 @@ class Candidate(models.Model):
     source = models.ForeignKey('Source', on_delete=models.SET_NULL, null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    # Normalised copies of the lookup fields, indexed for prefix search (see candidate_lookup)
+    search_name = models.CharField(max_length=201, blank=True, default='', editable=False, db_index=True)
+    search_last_name = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
+    search_email = models.CharField(max_length=254, blank=True, default='', editable=False, db_index=True)
+    search_phone = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+
+    SEARCH_FIELDS = ['search_name', 'search_last_name', 'search_email', 'search_phone']
+    SEARCH_SOURCES = {'first_name', 'last_name', 'email', 'phone_number'}
+
+    objects = CandidateQuerySet.as_manager()
+
+    def update_search_fields(self):
+        self.search_name = normalise_search_text(f"{self.first_name} {self.last_name}")
+        self.search_last_name = normalise_search_text(self.last_name)
+        self.search_email = normalise_search_text(self.email)
+        self.search_phone = normalise_phone(self.phone_number)
 
     def save(self, *args, **kwargs):
         if self.first_name:
             self.first_name = self.first_name.strip().capitalize()
         if self.last_name:
             self.last_name = self.last_name.strip().capitalize()
+        self.update_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.SEARCH_FIELDS)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -111,6 +161,10 @@ class ChatSession(models.Model):
     session_name = models.CharField(max_length=100, blank=True, null=True)  # Optional, for user to name sessions
     role = models.CharField(max_length=50, blank=True, null=True)  # e.g., 'admin', 'hr', 'manager', etc.
     model = models.CharField(max_length=100, blank=True, null=True)  # Selected AI model for this session
+    # Rolling summary of older turns, maintained by the MCP server so every worker can load it
+    summary = models.TextField(blank=True, default='')
+    summarized_message_count = models.PositiveIntegerField(default=0)  # Conversation turns covered by summary
+    summary_updated_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     # Optionally: is_active, etc.
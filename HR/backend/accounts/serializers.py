@@ -48,7 +48,7 @@ class CandidateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Candidate
-        fields = '__all__'
+        exclude = Candidate.SEARCH_FIELDS
         read_only_fields = ['notes']
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -77,4 +77,13 @@ class ChatSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatSession
         fields = ['id', 'user', 'session_name', 'role', 'model', 'created_at', 'updated_at', 'messages']
-        read_only_fields = ['id', 'created_at', 'updated_at', 'messages', 'user'] 
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at', 'messages', 'user'] 
+
+
+class ChatSessionSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatSession
+        fields = ['id', 'summary', 'summarized_message_count', 'summary_updated_at']
+        read_only_fields = ['id', 'summary_updated_at']
+        # The stale-write check compares against it, so a writer must always say which turns it covers
+        extra_kwargs = {'summarized_message_count': {'required': True}}
@@ -0,0 +1,373 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.authentication import token_cache
+from accounts.fake_data import STAGES
+from accounts import tool_backend
+from accounts.models import Candidate, ChatMessage, ChatSession, User
+from accounts.views import LOOKUP_MAX_LIMIT
+from core import metrics, querylog
+from mcphub.catalogue import ModelCatalogue, catalogue, metric_label
+
+
+class ChatSessionSummaryTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('summary', 'summary@example.com', 'pw')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.session = ChatSession.objects.create(user=self.user)
+        self.url = f'/api/chatsessions/{self.session.pk}/summary/'
+
+    def test_newer_summary_is_saved(self):
+        response = self.client.put(self.url, {'summary': 'Asked about hires.', 'summarized_message_count': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, 'Asked about hires.')
+        self.assertEqual(self.session.summarized_message_count, 4)
+        self.assertIsNotNone(self.session.summary_updated_at)
+
+    def test_older_summary_is_rejected(self):
+        self.client.put(self.url, {'summary': 'newer', 'summarized_message_count': 6}, format='json')
+        response = self.client.put(self.url, {'summary': 'older', 'summarized_message_count': 2}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['summary'], 'newer')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, 'newer')
+
+    def test_count_is_required(self):
+        response = self.client.put(self.url, {'summary': 'no count'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('summarized_message_count', response.data)
+
+
+class RoutingTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('routes', 'routes@example.com', 'pw', role='admin')
+        self.client.force_authenticate(self.user)
+
+    def test_explicit_paths_win_over_router_detail_routes(self):
+        self.assertEqual(self.client.get('/api/candidates/metrics/').status_code, 200)
+        self.assertEqual(self.client.get('/api/jobposts/job-title-choices/').status_code, 200)
+
+    def test_chat_session_list_fetches_messages_in_one_query(self):
+        for i in range(5):
+            session = ChatSession.objects.create(user=self.user, session_name=f's{i}')
+            ChatMessage.objects.create(session=session, role='user', content='hi')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/chatsessions/')
+        self.assertEqual(response.status_code, 200)
+
+
+class TokenCacheTests(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'pw')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_the_auth_queries(self):
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        with self.assertNumQueries(1):  # the (empty) page's count; no token or user lookup
+            self.assertEqual(self.client.get('/api/notifications/').status_code, 200)
+
+    def test_deleted_token_is_rejected_at_once(self):
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 200)
+        self.token.delete()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+
+    def test_deactivated_user_is_rejected_at_once(self):
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+
+
+def make_candidate(first, last, email, phone='+92 300 0000000'):
+    return Candidate.objects.create(first_name=first, last_name=last, email=email, phone_number=phone,
+                                    candidate_stage='applied', current_salary=1000, expected_salary=1200,
+                                    years_of_experience=2)
+
+
+class CandidateLookupTests(APITestCase):
+    url = '/api/candidates/lookup/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('lookup', 'lookup@example.com', 'pw')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.jose = make_candidate('José', 'Álvarez', 'jose.alvarez@example.com', '+92 (321) 555-0101')
+        self.alva = make_candidate('Alva', 'Noto', 'alva@example.com', '0300 1234567')
+        self.noah = make_candidate('Noah', 'Alvarado', 'noah@example.com', '0300 7654321')
+
+    def names(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [r['first_name'] for r in response.data['results']]
+
+    def test_ranks_exact_email_then_full_name_last_name_and_email_prefix(self):
+        self.assertEqual(self.names('alva@example.com'), ['Alva'])
+        # Full name "alva noto" first, then last names "alvarado", "alvarez"
+        self.assertEqual(self.names('alva'), ['Alva', 'Noah', 'José'])
+
+    def test_name_prefix_ignores_case_and_accents(self):
+        self.assertEqual(self.names('JOSE ALV'), ['José'])
+        self.assertEqual(self.names('álvarez'), ['José'])
+
+    def test_email_prefix(self):
+        self.assertEqual(self.names('noah@'), ['Noah'])
+
+    def test_phone_prefix_ignores_formatting(self):
+        self.assertEqual(self.names('+92 321-555'), ['José'])
+        self.assertEqual(self.names('0300'), ['Alva', 'Noah'])
+
+    def test_prefix_range_does_not_match_past_the_prefix(self):
+        # The range is [value, value + U+FFFF): "alvb" sorts after every "alva..." and before nothing here
+        self.assertEqual(self.names('alvb'), [])
+
+    def test_limit_is_clamped(self):
+        for i in range(LOOKUP_MAX_LIMIT + 2):
+            make_candidate('Sam', f'Lee{i:03d}', f'sam{i}@example.com')
+        self.assertEqual(len(self.names('sam', limit=0)), 1)
+        self.assertEqual(len(self.names('sam', limit=1000)), LOOKUP_MAX_LIMIT)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': '  '}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'alva', 'limit': 'ten'}).status_code, 400)
+
+    def test_tool_backend_matches_the_api(self):
+        result = tool_backend.find_candidates('alva', auth_token=self.token.key)
+        self.assertEqual([r['first_name'] for r in result['results']], self.names('alva'))
+        self.assertFalse(tool_backend.find_candidates('alva', auth_token='not-a-token')['success'])
+        self.assertFalse(tool_backend.find_candidates(' ', auth_token=self.token.key)['success'])
+
+    def test_queryset_update_refreshes_search_columns(self):
+        Candidate.objects.filter(pk=self.noah.pk).update(last_name='Zimmer', phone_number='0311 999')
+        self.assertEqual(self.names('noah zim'), ['Noah'])
+        self.assertEqual(self.names('0311'), ['Noah'])
+        self.noah.refresh_from_db()
+        self.noah.email = 'n.zimmer@example.com'
+        Candidate.objects.bulk_update([self.noah], ['email'])
+        self.assertEqual(self.names('n.zim'), ['Noah'])
+        self.assertEqual(self.names('noah@'), [])
+
+
+class ToolBackendPermissionTests(APITestCase):
+    # The MCP server's in-process tools must refuse exactly what the REST API refuses
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.candidate = make_candidate('Ada', 'Lovelace', 'ada@example.com')
+        self.url = f'/api/candidates/{self.candidate.pk}/'
+
+    def token_for(self, role, **fields):
+        user = User.objects.create_user(f'{role}-user', f'{role}@example.com', 'pw', role=role, **fields)
+        return Token.objects.create(user=user).key
+
+    def api(self, method, key, **data):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return getattr(self.client, method)(self.url, data, format='json').status_code
+
+    def test_plain_user_cannot_update_or_delete(self):
+        key = self.token_for('user')
+        self.assertEqual(self.api('patch', key, candidate_stage='hired'), 403)
+        self.assertEqual(self.api('delete', key), 403)
+        self.assertFalse(tool_backend.update_candidate(self.candidate.pk, 'candidate_stage', 'hired', auth_token=key)['success'])
+        self.assertFalse(tool_backend.delete_candidate(self.candidate.pk, auth_token=key)['success'])
+        self.candidate.refresh_from_db()
+        self.assertEqual(self.candidate.candidate_stage, 'applied')
+
+    def test_admin_can_update_and_delete(self):
+        key = self.token_for('admin')
+        self.assertTrue(tool_backend.update_candidate(self.candidate.pk, 'candidate_stage', 'offer', auth_token=key)['success'])
+        self.candidate.refresh_from_db()
+        self.assertEqual(self.candidate.candidate_stage, 'offer')
+        self.assertTrue(tool_backend.delete_candidate(self.candidate.pk, auth_token=key)['success'])
+        self.assertFalse(Candidate.objects.filter(pk=self.candidate.pk).exists())
+
+    def test_invalid_and_inactive_tokens_are_rejected(self):
+        inactive = self.token_for('admin', is_active=False)
+        for key in ('not-a-token', inactive):
+            self.assertEqual(self.api('get', key), 401)
+            self.assertEqual(self.api('delete', key), 401)
+            self.assertFalse(tool_backend.get_candidate(self.candidate.pk, auth_token=key).get('id'))
+            self.assertFalse(tool_backend.list_candidates(auth_token=key).get('results'))
+            self.assertFalse(tool_backend.update_candidate(self.candidate.pk, 'candidate_stage', 'hired', auth_token=key)['success'])
+            self.assertFalse(tool_backend.delete_candidate(self.candidate.pk, auth_token=key)['success'])
+        self.assertTrue(Candidate.objects.filter(pk=self.candidate.pk, candidate_stage='applied').exists())
+
+
+class SearchFieldsMigrationTests(TransactionTestCase):
+    before = [('accounts', '0006_chatsession_summary')]
+    after = [('accounts', '0007_candidate_search_fields')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_fills_the_search_columns(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldCandidate = executor.loader.project_state(self.before).apps.get_model('accounts', 'Candidate')
+        OldCandidate.objects.create(first_name='Zoë', last_name='Brontë', email='Zoe.B@Example.com',
+                                    phone_number='+92 (300) 111-2222', candidate_stage='applied',
+                                    current_salary=1, expected_salary=1, years_of_experience=1)
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        NewCandidate = executor.loader.project_state(self.after).apps.get_model('accounts', 'Candidate')
+        row = NewCandidate.objects.values('search_name', 'search_last_name', 'search_email', 'search_phone').get()
+        self.assertEqual(row, {'search_name': 'zoe bronte', 'search_last_name': 'bronte',
+                               'search_email': 'zoe.b@example.com', 'search_phone': '923001112222'})
+
+
+class QueryLogTests(TestCase):
+
+    def setUp(self):
+        querylog.query_log.clear()
+        self.addCleanup(querylog.query_log.clear)
+        self.queries = querylog.RequestQueries(RequestFactory().get('/api/candidates/'))
+
+    def test_slow_query_is_recorded_with_its_plan_and_own_stack(self):
+        with mock.patch.object(querylog, 'SLOW_QUERY_MS', 0), connection.execute_wrapper(self.queries):
+            Candidate.objects.filter(email='a@example.com').first()
+            Candidate.objects.filter(email='b@example.com').first()  # second call site
+        first, second = reversed(querylog.query_log.records('slow'))
+        self.assertIn('SELECT', first['sql'])
+        self.assertTrue(first['plan'])
+        if connection.vendor == 'sqlite':
+            self.assertTrue(any('accounts_candidate' in step for step in first['plan']))
+        self.assertEqual(first['path'], '/api/candidates/')
+        self.assertTrue(first['stack'][0].startswith('accounts/tests.py:'))
+        self.assertNotEqual(first['stack'][0], second['stack'][0])
+        self.assertNotEqual(first['fingerprint'], second['fingerprint'])
+
+    def test_repeated_statement_is_recorded_as_n_plus_one(self):
+        with mock.patch.object(querylog, 'N_PLUS_ONE_THRESHOLD', 3), connection.execute_wrapper(self.queries):
+            for pk in range(3):
+                Candidate.objects.filter(pk=pk).first()
+            Candidate.objects.count()
+            self.queries.finish()
+        [record] = querylog.query_log.records('n_plus_one')
+        self.assertEqual(record['count'], 3)
+        self.assertIn('"accounts_candidate"."id" = %s', record['sql'])
+        self.assertTrue(record['stack'][0].startswith('accounts/tests.py:'))
+        self.assertEqual(querylog.query_log.records('slow'), [])
+
+
+class GenerateFakeDataTests(TransactionTestCase):
+    # Transactions: the command commits per chunk and PRAGMAs cannot change inside one
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'accounts_candidate'")
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def test_unsafe_fast_restores_settings_and_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite PRAGMAs')
+        before = {name: self.pragma(name) for name in ('synchronous', 'journal_mode', 'cache_size')}
+        indexes = self.indexes()
+        call_command('generate_fake_data', candidates=200, chat_sessions=2, messages_per_session=2, users=2,
+                     unsafe_fast=True, stdout=StringIO())
+        self.assertEqual({name: self.pragma(name) for name in before}, before)
+        self.assertEqual(self.indexes(), indexes)
+        self.assertEqual(Candidate.objects.count(), 200)
+        self.assertLessEqual(set(Candidate.objects.values_list('candidate_stage', flat=True)), set(STAGES))
+
+    def test_stage_mix_takes_the_app_stage_keys(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown stage(s) technical interview'):
+            call_command('generate_fake_data', candidates=10, stage_mix='Applied=5,Technical Interview=1', stdout=StringIO())
+
+
+class MetricsEndpointTests(SimpleTestCase):
+
+    def setUp(self):
+        token = metrics.METRICS_TOKEN
+        self.addCleanup(setattr, metrics, 'METRICS_TOKEN', token)
+        metrics.METRICS_TOKEN = None
+
+    def test_without_token_only_direct_loopback_clients_are_allowed(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.9').status_code, 403)
+
+    def test_token_is_required_when_set(self):
+        metrics.METRICS_TOKEN = 's3cret'
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    def test_uncatalogued_models_share_one_label(self):
+        self.addCleanup(setattr, catalogue, '_snapshot', catalogue._snapshot)
+        catalogue._snapshot = {'model_ids': {'openai/gpt-4o'}}
+        self.assertEqual(metric_label('openai/gpt-4o'), 'openai/gpt-4o')
+        self.assertEqual(metric_label('made-up/model-123'), 'other')
+
+
+class ModelCatalogueTests(SimpleTestCase):
+
+    def upstream(self, status_code=200, data=(), etag=None):
+        response = mock.Mock(status_code=status_code, headers={'ETag': etag} if etag else {})
+        response.json.return_value = {'data': list(data)}
+        response.raise_for_status.side_effect = Exception(status_code) if status_code >= 400 else None
+        return response
+
+    def stale(self, **snapshot):
+        cat = ModelCatalogue(ttl=60, stale_ttl=3600)
+        cat._snapshot = {'data': [{'id': 'old'}], 'etag': '"old"', 'fetched_at': time.time() - 120,
+                         'upstream_etag': None, 'model_ids': {'old'}, **snapshot}
+        return cat
+
+    def test_stale_copy_is_served_while_one_refresh_runs(self):
+        cat = self.stale()
+        release = threading.Event()
+
+        def slow_get(*args, **kwargs):
+            release.wait(5)
+            return self.upstream(data=[{'id': 'new'}])
+
+        with mock.patch('mcphub.catalogue.requests.get', side_effect=slow_get) as get:
+            started = time.monotonic()
+            for _ in range(5):
+                self.assertEqual(cat.get()['data'], [{'id': 'old'}])
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertEqual(get.call_count, 1)
+            release.set()
+            deadline = time.monotonic() + 5
+            while cat.snapshot['data'] != [{'id': 'new'}] and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(cat.snapshot['model_ids'], {'new'})
+
+    def test_last_good_copy_is_kept_when_the_fetch_fails(self):
+        cat = self.stale(fetched_at=time.time() - 7200)
+        with mock.patch('mcphub.catalogue.requests.get', return_value=self.upstream(status_code=502)):
+            self.assertEqual(cat.get()['data'], [{'id': 'old'}])
+        with mock.patch('mcphub.catalogue.requests.get', side_effect=ConnectionError('down')):
+            self.assertIsNone(ModelCatalogue().get())
+
+    def test_not_modified_keeps_the_data_and_restarts_the_ttl(self):
+        cat = self.stale(fetched_at=time.time() - 7200, upstream_etag='"up-1"')
+        with mock.patch('mcphub.catalogue.requests.get', return_value=self.upstream(status_code=304)) as get:
+            snapshot = cat.get()
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"up-1"')
+        self.assertEqual(snapshot['etag'], '"old"')
+        self.assertLess(time.time() - snapshot['fetched_at'], 5)
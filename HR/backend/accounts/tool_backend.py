@@ -0,0 +1,109 @@
+# In-process implementations of the MCP server's candidate tools.
+#
+# Same signatures and return shapes as mcp_server/tools.py, and the same
+# permission rules as the API views (token auth, IsAuthenticated for reads,
+# IsAdminOrRecruiter for writes), but calling the ORM directly instead of
+# making an HTTP round-trip to /api.
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.http import QueryDict
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .models import Candidate, create_notification, normalise_search_text
+from .serializers import CandidateSerializer
+from .views import candidate_lookup, candidate_metrics, notify_candidate_updated
+
+WRITE_ROLES = ['admin', 'recruiter']
+PAGE_SIZE = settings.REST_FRAMEWORK.get('PAGE_SIZE', 15)
+
+
+def user_for_token(auth_token):
+    # Same check and token cache as the API: unknown tokens and inactive users are rejected
+    if not auth_token:
+        return None
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(auth_token)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def _can_write(user):
+    return user is not None and getattr(user, 'role', None) in WRITE_ROLES
+
+
+def _candidates():
+    return (Candidate.objects
+            .select_related('job_title', 'city', 'source', 'communication_skills')
+            .prefetch_related('notes_set'))
+
+
+def get_candidate(candidate_id, auth_token=None):
+    user = user_for_token(auth_token)
+    candidate = _candidates().filter(pk=candidate_id).first() if user else None
+    if candidate is None:
+        return {"success": False, "message": f'Candidate {candidate_id} not found.'}
+    return CandidateSerializer(candidate).data
+
+
+def delete_candidate(candidate_id, auth_token=None):
+    user = user_for_token(auth_token)
+    if user is None:
+        return {"success": False, "message": f'Failed to delete candidate {candidate_id}. Reason: Invalid token.'}
+    if not _can_write(user):
+        return {"success": False, "message": f'Failed to delete candidate {candidate_id}. Reason: You do not have permission to perform this action.'}
+    candidate = Candidate.objects.filter(pk=candidate_id).first()
+    if candidate is None:
+        return {"success": False, "message": f'Failed to delete candidate {candidate_id}. Reason: No Candidate matches the given query.'}
+    name = f"{candidate.first_name} {candidate.last_name}".strip()
+    candidate.delete()
+    create_notification(user, f"Candidate {name} was deleted.")
+    return {"success": True, "message": f'Candidate {candidate_id} deleted successfully.'}
+
+
+def update_candidate(candidate_id, field, value, auth_token=None):
+    failure = {"success": False, "message": f'Failed to update candidate {candidate_id}.'}
+    user = user_for_token(auth_token)
+    if not _can_write(user):
+        return failure
+    candidate = Candidate.objects.filter(pk=candidate_id).first()
+    if candidate is None:
+        return failure
+    old_stage = candidate.candidate_stage
+    serializer = CandidateSerializer(candidate, data={field: value}, partial=True)
+    if not serializer.is_valid():
+        return failure
+    serializer.save()
+    notify_candidate_updated(user, serializer.instance, old_stage)
+    return {"success": True, "message": f'Candidate {candidate_id} updated: {field} set to {value}.'}
+
+
+def get_candidate_metrics(params=None, auth_token=None):
+    if user_for_token(auth_token) is None:
+        return {"success": False, "message": 'Failed to fetch candidate metrics.'}
+    return candidate_metrics(params or QueryDict())
+
+
+def list_candidates(page=1, auth_token=None):
+    if user_for_token(auth_token) is None:
+        return {"success": False, "message": 'Failed to fetch candidates list.'}
+    # Same ordering and page size as CandidateViewSet + PageNumberPagination
+    paginator = Paginator(_candidates().order_by('-id'), PAGE_SIZE)
+    try:
+        page_obj = paginator.page(page)
+    except (EmptyPage, ValueError, TypeError):
+        return {"success": False, "message": 'Failed to fetch candidates list.'}
+    return {
+        'count': paginator.count,
+        'next': page_obj.next_page_number() if page_obj.has_next() else None,
+        'previous': page_obj.previous_page_number() if page_obj.has_previous() else None,
+        'results': CandidateSerializer(page_obj.object_list, many=True).data,
+    }
+
+
+def find_candidates(query, limit=10, auth_token=None):
+    if user_for_token(auth_token) is None or not normalise_search_text(query):
+        return {"success": False, "message": 'Failed to look up candidates.'}
+    candidates = candidate_lookup(query, limit)
+    return {'count': len(candidates), 'results': CandidateSerializer(candidates, many=True).data}
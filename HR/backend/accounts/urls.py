@@ -14,12 +14,11 @@ router.register(r'chatsessions', ChatSessionViewSet, basename='chatsession')
 router.register(r'chatmessages', ChatMessageViewSet, basename='chatmessage')
 router.register(r'notes', NoteViewSet)
 
+# Explicit paths come before the router: its '<prefix>/<pk>/' routes would otherwise swallow
+# 'candidates/metrics/' and 'jobposts/job-title-choices/' as detail lookups (and 404)
 urlpatterns = [
     path('notifications/unread/', unread_notifications_view, name='unread-notifications'),
-    path('', include(router.urls)),
     path('user-settings/', UserSettingsView.as_view(), name='user-settings'),
-]
-urlpatterns += [
     path('metrics/', metrics_view, name='metrics'),
     path('recent-activities/', recent_activities_view, name='recent-activities'),
     path('chat/', chat_view, name='chat'),
@@ -31,4 +30,5 @@ urlpatterns += [
     path('password-reset-confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
     path('email-verification/', EmailVerificationRequestView.as_view(), name='email-verification'),
     path('verify-email/<uidb64>/<token>/', EmailVerificationConfirmView.as_view(), name='verify-email'),
-] 
\ No newline at end of file
+    path('', include(router.urls)),
+]
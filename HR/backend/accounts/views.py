@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .serializers import UserSerializer
 from rest_framework import viewsets, mixins, filters
-from .models import Candidate
+from .models import Candidate, normalise_phone, normalise_search_text
 from .serializers import CandidateSerializer
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -39,12 +39,15 @@ from django.utils.dateparse import parse_date
 from collections import Counter
 from rest_framework import viewsets, permissions, filters
 from .models import ChatSession, ChatMessage
-from .serializers import ChatSessionSerializer, ChatMessageSerializer
+from .serializers import ChatSessionSerializer, ChatMessageSerializer, ChatSessionSummarySerializer
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from .models import Note
 from .serializers import NoteSerializer
 from rest_framework import viewsets, permissions
 from django.utils import timezone
+from mcphub.catalogue import catalogue, catalogue_response, metric_label
+from core.metrics import observe_llm
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +60,9 @@ class UserProfileView(APIView):
 
 class CandidateViewSet(viewsets.ModelViewSet):
     # type: ignore[attr-defined]
-    queryset = Candidate.objects.all().order_by('-id')  # Default: newest first
+    # The serializer nests all four lookups and the notes; fetch them with the page, not per row
+    queryset = (Candidate.objects.select_related('job_title', 'city', 'source', 'communication_skills')
+                .prefetch_related('notes_set').order_by('-id'))  # Default: newest first
     serializer_class = CandidateSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = CandidateFilter  # Use the custom filter
@@ -97,14 +102,64 @@ class CandidateViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        new_stage = serializer.instance.candidate_stage
-        name = f"{serializer.instance.first_name} {serializer.instance.last_name}".strip()
-        if old_stage != new_stage:
-            create_notification(request.user, f"Candidate {name} stage changed to '{new_stage}'.")
-        else:
-            create_notification(request.user, f"Candidate {name} was updated.")
+        notify_candidate_updated(request.user, serializer.instance, old_stage)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        # GET /candidates/lookup/?q=<name, email or phone prefix>&limit=<top k>
+        q = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', LOOKUP_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not normalise_search_text(q):
+            return Response({'detail': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        candidates = candidate_lookup(q, limit)
+        return Response({'count': len(candidates), 'results': self.get_serializer(candidates, many=True).data})
+
+LOOKUP_DEFAULT_LIMIT = 10
+LOOKUP_MAX_LIMIT = 50
+
+def candidate_lookup(q, limit=LOOKUP_DEFAULT_LIMIT):
+    # Prefix match on the normalised, indexed search columns. Each column is an index range
+    # scan capped at `limit` rows, so the cost depends on k, not on the size of the table.
+    # Matches are ranked exact email, then full name, last name, email and phone prefix.
+    limit = max(1, min(int(limit), LOOKUP_MAX_LIMIT))
+    text = normalise_search_text(q)
+    digits = normalise_phone(q)
+    lookups = [('search_email', text, True), ('search_name', text, False), ('search_last_name', text, False),
+               ('search_email', text, False)]
+    # Only treat the query as a phone number when it is mostly digits
+    if len(digits) >= 3 and len(digits) * 2 >= len(text.replace(' ', '')):
+        lookups.append(('search_phone', digits, False))
+    ids = []
+    for column, value, exact in lookups:
+        if not value:
+            continue
+        if exact:
+            query = {column: value}
+        else:
+            # Range rather than LIKE so every backend can use the plain b-tree index
+            query = {f'{column}__gte': value, f'{column}__lt': value + '\uffff'}
+        for pk in Candidate.objects.filter(**query).order_by(column, 'id').values_list('id', flat=True)[:limit]:
+            if pk not in ids:
+                ids.append(pk)
+        if len(ids) >= limit:
+            break
+    ids = ids[:limit]
+    by_id = (Candidate.objects.select_related('job_title', 'city', 'source', 'communication_skills')
+             .prefetch_related('notes_set').in_bulk(ids))
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+def notify_candidate_updated(user, candidate, old_stage):
+    new_stage = candidate.candidate_stage
+    name = f"{candidate.first_name} {candidate.last_name}".strip()
+    if old_stage != new_stage:
+        create_notification(user, f"Candidate {name} stage changed to '{new_stage}'.")
+    else:
+        create_notification(user, f"Candidate {name} was updated.")
+
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -146,7 +201,7 @@ def recent_activities_view(request):
         limit = int(request.GET.get('limit', 10))
     except (ValueError, TypeError):
         limit = 10
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:limit]
+    notifications = Notification.objects.filter(user=request.user).select_related('user').order_by('-created_at')[:limit]
     activities = [
         {
             "activity": n.message,
@@ -165,7 +220,6 @@ def recent_activities_view(request):
 @permission_classes([IsAuthenticated])
 def chat_view(request):
     try:
-        print("Received data:", request.data)  # Log incoming data
         user_message = request.data.get('message', '')
         model = request.data.get('model', 'openai/gpt-3.5-turbo')
         prompt = request.data.get('prompt', 'You are a helpful HR assistant. Answer questions about candidates, hiring, and HR best practices.')
@@ -191,42 +245,36 @@ def chat_view(request):
             "HTTP-Referer": "https://your-site.com",
             "X-Title": "Your Site Name"
         }
-        print("Sending payload to OpenRouter:", payload)  # Log outgoing payload
-        resp = requests.post(api_url, json=payload, headers=headers, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+        logger.debug('Sending chat request to OpenRouter', extra={'model': model, 'payload': payload})
+        with observe_llm(model, metric_label(model)) as call:
+            resp = requests.post(api_url, json=payload, headers=headers, timeout=15)
+            call['status'] = resp.status_code
+            resp.raise_for_status()
+            data = resp.json()
+            call['usage'] = data.get('usage')
         reply = data['choices'][0]['message']['content']
         return Response({"response": reply})
     except Exception as e:
-        import traceback
-        print("Error in chat_view:", str(e))
-        traceback.print_exc()
+        logger.exception('chat_view failed')
         return Response({"error": str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def openrouter_models_view(request):
-    api_url = 'https://openrouter.ai/api/v1/models'
     api_key = getattr(settings, 'OPENROUTER_API_KEY', None)
     if not api_key:
         return Response({'error': 'Openrouter API key not set.'}, status=500)
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    try:
-        resp = requests.get(api_url, headers=headers, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        return Response(data)
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
+    # Shared, TTL-cached catalogue (see mcphub.catalogue); serves the last good copy if OpenRouter fails
+    snapshot = catalogue.get(api_key)
+    if snapshot is None:
+        return Response({"error": "Model catalogue unavailable."}, status=502)
+    return catalogue_response(request, snapshot)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_candidates_csv(request):
     # type: ignore[attr-defined]
-    queryset = Candidate.objects.all()
+    queryset = Candidate.objects.select_related('job_title', 'city', 'source', 'communication_skills')
     # Apply filters
     for field in ['job_title', 'city', 'source', 'communication_skills', 'candidate_stage']:
         value = request.GET.get(field)
@@ -364,7 +412,8 @@ class JobPostViewSet(viewsets.ModelViewSet):
 class JobPostTitleChoices(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        return Response([{'value': v, 'label': l} for v, l in JobPost.JOB_TITLES])
+        # JobPost.title is free text; the known titles are the JobTitle lookup table
+        return Response([{'value': name, 'label': name} for name in JobTitle.objects.order_by('name').values_list('name', flat=True)])
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -377,9 +426,13 @@ def unread_notifications_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def candidate_metrics_view(request):
+    return Response(candidate_metrics(request.GET))
+
+# Shared by candidate_metrics_view and the in-process MCP tool backend
+def candidate_metrics(params):
     qs = Candidate.objects.all()
-    created_after = request.GET.get('created_after')
-    created_before = request.GET.get('created_before')
+    created_after = params.get('created_after')
+    created_before = params.get('created_before')
     if created_after:
         qs = qs.filter(created_at__gte=parse_date(created_after))
     if created_before:
@@ -399,7 +452,7 @@ def candidate_metrics_view(request):
         'most_common_stage': most_common_stage,
         'top_source': top_source,
     }
-    return Response(metrics)
+    return metrics
 
 UserModel = get_user_model()
 
@@ -496,11 +549,37 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
     ordering = ['-updated_at']
 
     def get_queryset(self):
-        return ChatSession.objects.filter(user=self.request.user)
+        # The serializer nests every session's messages: one query for all of them, not one per session
+        return ChatSession.objects.filter(user=self.request.user).prefetch_related('messages')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=['get', 'put'])
+    def summary(self, request, pk=None):
+        # Rolling conversation summary used by the MCP server to keep prompts bounded
+        session = self.get_object()
+        if request.method == 'GET':
+            return Response(ChatSessionSummarySerializer(session).data)
+        serializer = ChatSessionSummarySerializer(session, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Summaries are recomputed in the background by any worker; never let an
+        # older (shorter) summary overwrite a newer one. Check and write in one
+        # conditional UPDATE so two concurrent writers cannot both pass the check.
+        count = serializer.validated_data['summarized_message_count']
+        now = timezone.now()
+        updated = ChatSession.objects.filter(pk=session.pk, summarized_message_count__lte=count).update(
+            summary=serializer.validated_data.get('summary', session.summary),
+            summarized_message_count=count,
+            summary_updated_at=now,
+            updated_at=now,
+        )
+        session.refresh_from_db()
+        data = ChatSessionSummarySerializer(session).data
+        if not updated:
+            return Response(data, status=status.HTTP_409_CONFLICT)
+        return Response(data)
+
 class ChatMessageViewSet(viewsets.ModelViewSet):
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
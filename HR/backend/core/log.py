@@ -0,0 +1,175 @@
+# Structured logging for the Django API (core/log.py) and the MCP server (mcp_server/log.py).
+#
+# The two files are deliberate copies and must stay identical: the services are installed and
+# deployed separately, and neither can import the other's code. mcp_server/tests/test_shared_modules.py
+# fails when they drift, so change one and copy it over the other.
+#
+# StructuredFilter samples, redacts and size-caps each record on the calling thread (where the
+# trace context is); QueueHandler puts it on a bounded queue and a background thread formats
+# and writes it, so a request never waits on stdout. Warnings and errors are never sampled out.
+# Anything passed as extra={...} becomes a field of its own. Django builds the handler through
+# settings.LOGGING; the MCP server calls setup().
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+
+if __package__:
+    # core/log.py, next to core/tracing.py
+    from . import tracing
+else:
+    # mcp_server/ modules are imported flat
+    import tracing
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'json' (one object per line) or 'text'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+# Share of DEBUG and INFO records written
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+# Longest string kept in a message or field; the rest is replaced by a marker
+LOG_FIELD_MAX = int(os.environ.get('LOG_FIELD_MAX', '1000'))
+# Records waiting for the writer; when it falls behind, new ones are dropped and counted
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+REDACTED = '[redacted]'
+# Field names whose values are never written
+_SECRET_KEY = re.compile(r'auth|token|password|secret|api[_-]?key|cookie', re.I)
+# Credentials inside free text: "Token abc", "Bearer abc", OpenAI-style keys, token=abc
+_SECRET_TEXT = re.compile(r'\b(?:Token|Bearer)\s+[\w.~+/=-]{8,}|\bsk-[\w-]{8,}', re.I)
+_SECRET_PAIR = re.compile(r'''(\w*(?:token|password|secret|api[_-]?key)\w*['"]?\s*[:=]\s*['"]?)[^\s'",&}]+''', re.I)
+# Attributes every LogRecord has (plus uvicorn's ANSI copy of the message); the rest came from extra=
+_STANDARD = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName', 'color_message'}
+
+
+def _cut(text):
+    if len(text) <= LOG_FIELD_MAX:
+        return text
+    return f'{text[:LOG_FIELD_MAX]}...[{len(text) - LOG_FIELD_MAX} more chars]'
+
+
+def redact_text(text):
+    return _SECRET_PAIR.sub(rf'\1{REDACTED}', _SECRET_TEXT.sub(REDACTED, text))
+
+
+def scrub(value, depth=0):
+    # JSON-safe copy of a field value with secrets removed and long strings cut
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, bytes):
+        return f'<{len(value)} bytes>'
+    if depth < 4 and isinstance(value, dict):
+        return {str(k): REDACTED if _SECRET_KEY.search(str(k)) else scrub(v, depth + 1) for k, v in list(value.items())[:50]}
+    if depth < 4 and isinstance(value, (list, tuple, set)):
+        items = list(value)
+        scrubbed = [scrub(v, depth + 1) for v in items[:50]]
+        return scrubbed + ([f'...[{len(items) - 50} more items]'] if len(items) > 50 else [])
+    return _cut(redact_text(str(value)))
+
+
+def fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD}
+
+
+class StructuredFilter(logging.Filter):
+
+    def filter(self, record):
+        # Runs on the calling thread, where the trace context is
+        if record.levelno < logging.WARNING and LOG_SAMPLE_RATE < 1 and random.random() >= LOG_SAMPLE_RATE:
+            return False
+        record.msg = _cut(redact_text(record.getMessage()))
+        record.args = None
+        for key, value in fields(record).items():
+            # Django attaches the request (and runserver the socket) to some records
+            if key in ('request', 'server_time'):
+                continue
+            setattr(record, key, REDACTED if _SECRET_KEY.search(key) else scrub(value))
+        span = tracing.current_span()
+        if span is not None and not hasattr(record, 'trace_id'):
+            record.trace_id = span.trace.trace_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(fields(record))
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+
+    def format(self, record):
+        line = f'{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}'
+        extra = fields(record)
+        if extra:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in extra.items())
+        return line + (f'\n{record.exc_text}' if record.exc_text else '')
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the caller: drops (and counts) records when the queue is full.
+    # Owns its writer thread, so settings.LOGGING can build it like any other handler.
+
+    def __init__(self, fmt=LOG_FORMAT, maxsize=LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, out)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # The writer thread must not touch live objects: render the traceback here, drop the request
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if hasattr(record, 'request'):
+            request = record.request
+            record.request = redact_text(f'{request.method} {request.get_full_path()}' if hasattr(request, 'method') else str(request))
+        if hasattr(record, 'server_time'):
+            del record.server_time
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+
+
+def setup(loggers=()):
+    # For processes without settings.LOGGING: routes the root logger, and `loggers` (e.g.
+    # uvicorn's), through the queue. Safe to call more than once
+    global _handler
+    if _handler is None:
+        _handler = QueueHandler()
+        _handler.addFilter(StructuredFilter())
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(LOG_LEVEL)
+    for name in loggers:
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+    return _handler
@@ -0,0 +1,154 @@
+# In-process Prometheus metrics for the Django API, served at /metrics. The metric types live in
+# core/prometheus.py, shared with the MCP server; this module defines what the API measures.
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core import tracing
+from core.prometheus import CONTENT_TYPE, Counter, Histogram, Registry, allowed
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+# When set, /metrics requires "Authorization: Bearer <token>"; when not, it only answers clients
+# on this host
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route and status.', ['method', 'route', 'status']))
+http_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to serve a request, streaming bodies included.', ['method', 'route']))
+db_queries = registry.register(Counter(
+    'db_queries_total', 'SQL statements executed while serving requests.', ['route']))
+db_query_seconds = registry.register(Counter(
+    'db_query_duration_seconds_total', 'Time spent in SQL while serving requests.', ['route']))
+db_queries_per_request = registry.register(Histogram(
+    'db_queries_per_request', 'SQL statements per request.', ['route'], buckets=QUERY_COUNT_BUCKETS))
+upstream_duration = registry.register(Histogram(
+    'upstream_request_duration_seconds', 'Outgoing HTTP calls by service and outcome.', ['service', 'outcome']))
+llm_duration = registry.register(Histogram(
+    'llm_request_duration_seconds', 'LLM completions by model and outcome.', ['model', 'outcome']))
+llm_tokens = registry.register(Counter(
+    'llm_tokens_total', 'LLM tokens reported by the provider.', ['model', 'kind']))
+auth_token_cache = registry.register(Counter(
+    'auth_token_cache_total', 'API token lookups served from the cache (hit) or the database (miss).', ['result']))
+
+
+class _QueryTimer:
+    # connection.execute_wrapper hook: counts statements and their time for one request
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    # Outermost middleware: per-route latency, status codes and SQL count/time
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+        start = time.perf_counter()
+        queries = _QueryTimer()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self._stream(response.streaming_content, request, response, start, queries)
+        else:
+            self._record(request, response, start, queries)
+        return response
+
+    def _stream(self, content, request, response, start, queries):
+        try:
+            with connection.execute_wrapper(queries):
+                yield from content
+        finally:
+            self._record(request, response, start, queries)
+
+    def _record(self, request, response, start, queries):
+        route = _route(request)
+        http_requests.inc(request.method, route, str(response.status_code))
+        http_duration.observe(time.perf_counter() - start, request.method, route)
+        db_queries.inc(route, amount=queries.count)
+        db_query_seconds.inc(route, amount=queries.seconds)
+        db_queries_per_request.observe(queries.count, route)
+
+
+@contextmanager
+def observe_upstream(service):
+    # Times (and traces) an outgoing call; the caller may set outcome['status'] to label it by status class
+    outcome = {}
+    start = time.perf_counter()
+    try:
+        with tracing.span(service) as span:
+            yield outcome
+            span.set(status=outcome.get('status'))
+    except Exception:
+        outcome.setdefault('outcome', 'error')
+        raise
+    finally:
+        status = outcome.get('status')
+        label = outcome.get('outcome') or (f'{str(status)[0]}xx' if status else 'ok')
+        upstream_duration.observe(time.perf_counter() - start, service, label)
+
+
+@contextmanager
+def observe_llm(model, label):
+    # Times an LLM completion; the caller sets call['status'] and call['usage'] (the OpenAI-style
+    # usage block) as they become known. `label` is the bounded metric label for `model`
+    # (mcphub.catalogue.metric_label); the span keeps the model as requested
+    call = {}
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        with tracing.span('llm', model=model) as span:
+            yield call
+            span.set(status=call.get('status'))
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        status = call.get('status') or 0
+        if status == 429:
+            outcome = 'rate_limited'
+        elif status >= 400:
+            outcome = 'error'
+        llm_duration.observe(time.perf_counter() - start, label, outcome)
+        usage = call.get('usage') or {}
+        for kind in ('prompt', 'completion'):
+            if usage.get(f'{kind}_tokens'):
+                llm_tokens.inc(label, kind, amount=usage[f'{kind}_tokens'])
+
+
+def authorized(request):
+    forwarded = 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers
+    return allowed(METRICS_TOKEN, request.headers.get('Authorization'), request.META.get('REMOTE_ADDR'), forwarded)
+
+
+def metrics_view(request):
+    if not authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
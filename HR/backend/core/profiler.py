@@ -0,0 +1,244 @@
+# Request profiling for the Django API (core/profiler.py) and the MCP server (mcp_server/profiler.py).
+#
+# The two files are deliberate copies and must stay identical: the services are installed and
+# deployed separately, and neither can import the other's code. mcp_server/tests/test_shared_modules.py
+# fails when they drift, so change one and copy it over the other. Each service's middleware,
+# endpoints and choice of modes live next to its copy (core/profiling.py, mcp_server/profiling.py).
+#
+#   sampling       stack samples every PROFILE_INTERVAL_MS -> .folded (flamegraph.pl, speedscope)
+#   deterministic  cProfile -> .prof (snakeviz, flameprof, gprof2dot); sees only the thread that starts it
+#   memory         tracemalloc diff across the run -> .folded weighted by bytes, plus a .txt summary
+# Result files go to the service's PROFILE_DIR, which keeps the newest PROFILE_KEEP runs.
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+# Required for the X-Profile header
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+# Frames kept per allocation traceback in memory mode
+PROFILE_MEMORY_FRAMES = int(os.environ.get('PROFILE_MEMORY_FRAMES', '10'))
+
+MODES = ('sampling', 'deterministic', 'memory')
+NAME_PATTERN = re.compile(r'^[\w.-]+$')
+
+
+def _frame_label(code):
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    # Samples stacks from a background thread; cheap enough for production requests. With a
+    # thread_id it follows that thread, otherwise every other thread (tagged with its name)
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames.get(self.thread_id)}
+            for thread_id, frame in frames.items():
+                if thread_id == self._thread.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                if self.thread_id is None:
+                    # Idle pool threads and the loop's selector wait are noise in a request profile
+                    if stack[0].startswith(('wait (', 'select (', '_worker (')):
+                        continue
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(f'thread {names.get(thread_id, thread_id)}')
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    # One profiling run. Sampling follows the thread that calls start(), or every thread with
+    # every_thread; deterministic mode only ever sees the thread that calls start()
+
+    def __init__(self, mode, label, directory, every_thread=False):
+        self.mode = mode
+        self.label = label
+        self.directory = directory
+        self.every_thread = every_thread
+        slug = re.sub(r'[^\w]+', '-', label).strip('-')[:60] or 'request'
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{mode}-{uuid.uuid4().hex[:6]}"
+        # Known up front, so a streamed response can name it in its headers
+        self.filename = self.name + ('.prof' if mode == 'deterministic' else '.folded')
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == 'sampling':
+            self._sampler = StackSampler(None if self.every_thread else threading.get_ident())
+            self._sampler.start()
+        elif self.mode == 'deterministic':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._own_tracing = not tracemalloc.is_tracing()
+            if self._own_tracing:
+                tracemalloc.start(PROFILE_MEMORY_FRAMES)
+            tracemalloc.reset_peak()
+            self._before = tracemalloc.take_snapshot()
+
+    def stop(self):
+        # Writes the result file(s) and returns the name of the main one
+        elapsed = time.perf_counter() - self._started
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.name)
+        if self.mode == 'sampling':
+            self._sampler.stop()
+            with open(base + '.folded', 'w') as f:
+                f.write(self._sampler.folded())
+        elif self.mode == 'deterministic':
+            self._profile.disable()
+            self._profile.dump_stats(base + '.prof')
+        else:
+            self._write_memory(base, elapsed)
+        prune(self.directory)
+        return self.filename
+
+    def _write_memory(self, base, elapsed):
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._own_tracing:
+            tracemalloc.stop()
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        before, after = self._before.filter_traces(ignore), after.filter_traces(ignore)
+        folded = Counter()
+        for stat in after.compare_to(before, 'traceback'):
+            if stat.size_diff > 0:
+                # Tracebacks run from the oldest frame to the newest, as folded stacks expect
+                folded[';'.join(f"{'/'.join(frame.filename.split('/')[-2:])}:{frame.lineno}" for frame in stat.traceback)] += stat.size_diff
+        with open(base + '.folded', 'w') as f:
+            f.write(''.join(f'{stack} {size}\n' for stack, size in folded.most_common()))
+        lines = after.compare_to(before, 'lineno')
+        with open(base + '.txt', 'w') as f:
+            f.write(f'{self.label}\nelapsed {elapsed:.3f}s  peak {peak / 1024:.1f} KiB  '
+                    f'net {sum(s.size_diff for s in lines) / 1024:+.1f} KiB\n\n')
+            for stat in lines[:25]:
+                f.write(f'{stat}\n')
+
+
+def prune(directory):
+    try:
+        names = sorted(os.listdir(directory), key=lambda n: os.path.getmtime(os.path.join(directory, n)))
+    except OSError:
+        return
+    # A memory profile is two files; keep whole runs by counting distinct stems
+    stems = list(dict.fromkeys(n.rsplit('.', 1)[0] for n in names))
+    for stem in stems[:-PROFILE_KEEP] if PROFILE_KEEP else []:
+        for name in names:
+            if name.rsplit('.', 1)[0] == stem:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+
+def list_profiles(directory):
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        names = []
+    profiles = []
+    for name in names:
+        stat = os.stat(os.path.join(directory, name))
+        profiles.append({'name': name, 'size': stat.st_size, 'created_at': stat.st_mtime})
+    return sorted(profiles, key=lambda p: p['created_at'], reverse=True)
+
+
+def profile_path(directory, name):
+    path = os.path.join(directory, name)
+    return path if NAME_PATTERN.match(name) and os.path.isfile(path) else None
+
+
+class Switch:
+    # Which requests to profile: those asking with X-Profile and the token, or a share of all
+    # requests once an admin has switched it on (runtime state, per worker process). `busy` is held
+    # while a profile runs; requests arriving meanwhile are served unprofiled
+
+    def __init__(self, modes=MODES):
+        self.modes = modes
+        self.config = {'mode': None, 'sample_rate': 0.0, 'path_prefix': '', 'remaining': None}
+        self.busy = threading.Lock()
+        self._lock = threading.Lock()
+
+    def configure(self, changes):
+        # Validates and applies {"mode", "sample_rate", "path_prefix", "remaining"}; raises
+        # ValueError with a message for the client
+        config = self.config
+        mode = changes.get('mode', config['mode'])
+        if mode is not None and mode not in self.modes:
+            raise ValueError(f"mode must be one of {', '.join(self.modes)} or null.")
+        try:
+            sample_rate = float(changes.get('sample_rate', config['sample_rate']))
+            remaining = changes.get('remaining', config['remaining'])
+            remaining = None if remaining is None else int(remaining)
+        except (TypeError, ValueError):
+            raise ValueError('sample_rate must be a number and remaining an integer.')
+        if not 0 <= sample_rate <= 1:
+            raise ValueError('sample_rate must be between 0 and 1.')
+        with self._lock:
+            config.update(mode=mode, sample_rate=sample_rate, remaining=remaining,
+                          path_prefix=str(changes.get('path_prefix', config['path_prefix']) or ''))
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            return dict(self.config, busy=self.busy.locked())
+
+    def requested_mode(self, path, header_mode, header_token):
+        # The mode to profile this request in, or None
+        if header_mode:
+            if header_mode in self.modes and PROFILING_TOKEN and hmac.compare_digest(header_token or '', PROFILING_TOKEN):
+                return header_mode
+            return None
+        config = self.config
+        with self._lock:
+            if not config['mode'] or config['sample_rate'] <= 0:
+                return None
+            if not path.startswith(config['path_prefix']) or random.random() >= config['sample_rate']:
+                return None
+            if config['remaining'] is not None:
+                if config['remaining'] <= 0:
+                    return None
+                config['remaining'] -= 1
+            return config['mode']
+
+
+def authorized(authorization):
+    # Bearer-token check for services without their own user roles
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(authorization or '', f'Bearer {PROFILING_TOKEN}')
@@ -0,0 +1,110 @@
+# On-demand profiling of single requests.
+#
+# A request is profiled when it sends "X-Profile: <mode>" with "X-Profile-Token: <PROFILING_TOKEN>",
+# or when an admin has switched profiling on through /api/profiling/ (a share of requests,
+# optionally only those under a path prefix, optionally for a limited number of requests).
+# The modes and the result files are described in core/profiler.py, shared with the MCP server.
+# One profile runs at a time per process; requests arriving meanwhile are served unprofiled.
+# Files are listed and downloaded through /api/profiling/profiles/.
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.http import FileResponse, Http404
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+
+from core.profiler import MODES, Profiler, Switch, list_profiles, profile_path
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'hr-profiles', 'django'))
+
+# Runtime toggle, per process (PUT /api/profiling/)
+_switch = Switch(MODES)
+
+
+@contextmanager
+def profiled(mode, label):
+    # Profiles a block of code outside the request cycle (e.g. a management command); yields the Profiler
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}; expected one of {', '.join(MODES)}")
+    profiler = Profiler(mode, label, PROFILE_DIR)
+    with _switch.busy:
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+
+
+class ProfilingMiddleware:
+    # Profiles the selected requests, streamed bodies included; X-Profile-Id names the result file
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = _switch.requested_mode(request.path, request.headers.get('X-Profile'),
+                                      request.headers.get('X-Profile-Token'))
+        if mode is None or not _switch.busy.acquire(blocking=False):
+            return self.get_response(request)
+        profiler = Profiler(mode, f'{request.method} {request.path}', PROFILE_DIR)
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            profiler.stop()
+            _switch.busy.release()
+            raise
+        if response.streaming:
+            response.streaming_content = self._stream(response.streaming_content, profiler)
+            response['X-Profile-Id'] = profiler.filename
+        else:
+            response['X-Profile-Id'] = self._finish(profiler)
+        return response
+
+    def _finish(self, profiler):
+        try:
+            return profiler.stop()
+        finally:
+            _switch.busy.release()
+
+    def _stream(self, content, profiler):
+        try:
+            yield from content
+        finally:
+            self._finish(profiler)
+
+
+class IsAdminRole(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and getattr(request.user, 'role', None) == 'admin'
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAdminRole])
+def profiling_config_view(request):
+    # PUT {"mode": "sampling", "sample_rate": 0.05, "path_prefix": "/api/candidates/", "remaining": 20}
+    if request.method == 'PUT':
+        try:
+            return Response(_switch.configure(request.data))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_switch.status())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def profiles_view(request):
+    profiles = list_profiles(PROFILE_DIR)
+    return Response({'count': len(profiles), 'results': profiles})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def profile_download_view(request, name):
+    path = profile_path(PROFILE_DIR, name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
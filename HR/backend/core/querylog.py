@@ -0,0 +1,206 @@
+# Slow-query log and N+1 detector.
+#
+# Every request runs under a connection.execute_wrapper that times each statement. Statements
+# slower than SLOW_QUERY_MS are recorded with their query plan (EXPLAIN QUERY PLAN on SQLite,
+# EXPLAIN on PostgreSQL; SELECTs only), the view that issued them and a fingerprint of the
+# application frames that led there. Statements repeated N_PLUS_ONE_THRESHOLD times or more in
+# one request (same SQL, different parameters) are recorded as N+1 suspects. Records go to a
+# per-process ring buffer of QUERY_LOG_SIZE entries, read by admins at /api/querylog/.
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from core.profiling import IsAdminRole
+
+logger = logging.getLogger(__name__)
+
+QUERYLOG_ENABLED = os.environ.get('QUERYLOG_ENABLED', 'True') == 'True'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+QUERY_LOG_SIZE = int(os.environ.get('QUERY_LOG_SIZE', '200'))
+# Application frames kept with each record
+STACK_DEPTH = 6
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_APP_ROOT = str(settings.BASE_DIR)
+# The instrumentation middlewares and wrappers (metrics, tracing, profiling, this module) live here
+_CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryLog:
+    # Ring buffer of slow-query and N+1 records
+
+    def __init__(self, size=QUERY_LOG_SIZE):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        record['at'] = time.time()
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, kind=None):
+        with self._lock:
+            records = list(self._records)
+        return [r for r in reversed(records) if kind is None or r['kind'] == kind]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+query_log = QueryLog()
+
+
+def normalise(sql):
+    # Same statement shape regardless of IN-list length
+    return _IN_LIST.sub('IN (...)', ' '.join(sql.split()))
+
+
+def app_stack():
+    # (file:line function) of the innermost project frames, skipping libraries and the middlewares
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT) and not filename.startswith(_CORE_DIR) \
+                and 'site-packages' not in filename and not filename.endswith('manage.py'):
+            frames.append(f'{os.path.relpath(filename, _APP_ROOT)}:{frame.f_lineno} {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def fingerprint(sql, stack):
+    return hashlib.sha1('\n'.join([sql] + stack).encode()).hexdigest()[:12]
+
+
+def explain(cursor_connection, sql, params):
+    # Plan of a slow SELECT, run on the same connection (and transaction) as the statement
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    vendor = cursor_connection.vendor
+    if vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return None
+    try:
+        with cursor_connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    if vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+class RequestQueries:
+    # execute_wrapper for one request: times statements, logs slow ones, counts repeats
+
+    def __init__(self, request):
+        self.request = request
+        self.seen = {}  # normalised sql -> [count, total seconds, stack of the first run]
+        self._explaining = False
+
+    def view(self):
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name or match._func_path
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            key = normalise(sql)
+            entry = self.seen.get(key)
+            if entry is None:
+                entry = self.seen[key] = [0, 0.0, app_stack()]
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                # This run's stack: a repeated statement may be slow at a different call site
+                self.slow(sql, params, many, elapsed, context['connection'], app_stack())
+
+    def slow(self, sql, params, many, elapsed, cursor_connection, stack):
+        plan = None
+        if not many:
+            self._explaining = True
+            try:
+                plan = explain(cursor_connection, sql, params)
+            finally:
+                self._explaining = False
+        record = {
+            'kind': 'slow', 'sql': sql, 'duration_ms': round(elapsed * 1000, 2), 'plan': plan,
+            'view': self.view(), 'path': self.request.path, 'stack': stack, 'fingerprint': fingerprint(normalise(sql), stack),
+        }
+        query_log.add(record)
+        logger.warning('Slow query (%.1f ms) in %s [%s]: %s', record['duration_ms'], record['view'], record['fingerprint'], sql[:300])
+
+    def finish(self):
+        for sql, (count, seconds, stack) in self.seen.items():
+            if count >= N_PLUS_ONE_THRESHOLD:
+                record = {
+                    'kind': 'n_plus_one', 'sql': sql, 'count': count, 'total_ms': round(seconds * 1000, 2),
+                    'view': self.view(), 'path': self.request.path, 'stack': stack, 'fingerprint': fingerprint(sql, stack),
+                }
+                query_log.add(record)
+                logger.warning('Possible N+1 in %s: %d x %s [%s]', record['view'], count, sql[:200], record['fingerprint'])
+
+
+class QueryLogMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not QUERYLOG_ENABLED:
+            return self.get_response(request)
+        queries = RequestQueries(request)
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self._stream(response.streaming_content, queries)
+        else:
+            queries.finish()
+        return response
+
+    def _stream(self, content, queries):
+        try:
+            with connection.execute_wrapper(queries):
+                yield from content
+        finally:
+            queries.finish()
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminRole])
+def querylog_view(request):
+    # GET ?kind=slow|n_plus_one, newest first; DELETE empties the buffer
+    if request.method == 'DELETE':
+        query_log.clear()
+        return Response(status=204)
+    records = query_log.records(request.query_params.get('kind') or None)
+    return Response({
+        'slow_query_ms': SLOW_QUERY_MS,
+        'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+        'count': len(records),
+        'results': records,
+    })
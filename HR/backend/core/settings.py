@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,7 +51,18 @@ INSTALLED_APPS = [
     'mcphub',
 ]
 
+# The instrumentation middlewares below finish their measurement when a streamed body (e.g. the
+# CSV export) is exhausted rather than when they return: the body, and its queries, are produced
+# after the middleware chain has handed the response back.
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware (see core/metrics.py, served at /metrics)
+    'core.metrics.MetricsMiddleware',
+    # Root span per request plus a span per SQL statement (see core/tracing_middleware.py; off unless TRACING_ENABLED)
+    'core.tracing_middleware.TracingMiddleware',
+    # Profiles single requests on demand (X-Profile header or /api/profiling/; see core/profiling.py)
+    'core.profiling.ProfilingMiddleware',
+    # Slow queries with their plans and per-request N+1 suspects (see core/querylog.py, /api/querylog/)
+    'core.querylog.QueryLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,12 +96,73 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Chosen with DJANGO_DB_PROFILE (compare them with `manage.py benchmark_db_writes --profiles ...`):
+#   sqlite-wal (default)  SQLite in WAL mode: readers don't block the writer, commits skip most
+#                         fsyncs, writers queue for the lock instead of failing with "database is
+#                         locked", and connections are kept for DB_CONN_MAX_AGE seconds
+#   sqlite                SQLite as Django ships it (rollback journal, 5 s busy timeout, a new
+#                         connection per request), as a baseline
+#   postgres              PostgreSQL from the POSTGRES_* variables, pooled per process by psycopg_pool
+#                         (DB_POOL_MAX=0 keeps persistent connections instead), with health checks
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'sqlite-wal')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+if DB_PROFILE == 'sqlite-wal':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before giving up
+                'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', '20')),
+                # Take the write lock at BEGIN: a deferred transaction that reads and then writes
+                # fails at once, busy timeout or not, if another writer got in between
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))};"
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                ),
+            },
+        }
     }
-}
+elif DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+elif DB_PROFILE == 'postgres':
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'hr'),
+            'USER': os.environ.get('POSTGRES_USER', 'hr'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # The pool owns the connections; Django refuses to also keep them (CONN_MAX_AGE must be 0)
+            'CONN_MAX_AGE': 0 if DB_POOL_MAX else DB_CONN_MAX_AGE,
+            # Pooled connections are checked when handed out, persistent ones before each request
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+                    'max_size': DB_POOL_MAX,
+                    # Seconds a request waits for a free connection
+                    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL_MAX else {},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DJANGO_DB_PROFILE must be 'sqlite-wal', 'sqlite' or 'postgres', not {DB_PROFILE!r}")
 
 
 # Password validation
@@ -137,7 +210,8 @@ AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with a short-lived token -> user cache (see accounts/authentication.py)
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 15,
@@ -153,5 +227,27 @@ CORS_ALLOWED_ORIGINS = [
 # Openrouter.ai API key (set your actual key here or via environment variable)
 OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
 
+# OpenRouter model catalogue cache (seconds): fresh TTL, then served stale while refreshing in the background
+MODEL_CATALOGUE_TTL = int(os.environ.get('MODEL_CATALOGUE_TTL', '600'))
+MODEL_CATALOGUE_STALE_TTL = int(os.environ.get('MODEL_CATALOGUE_STALE_TTL', '86400'))
+
+# Structured logs through a queue and a background writer (see core/log.py); LOG_FORMAT is 'json' or 'text'
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'structured': {'()': 'core.log.StructuredFilter'},
+    },
+    'handlers': {
+        'queue': {'()': 'core.log.QueueHandler', 'fmt': os.environ.get('LOG_FORMAT', 'json'), 'filters': ['structured']},
+    },
+    'root': {'handlers': ['queue'], 'level': os.environ.get('LOG_LEVEL', 'INFO').upper()},
+    'loggers': {
+        # Replace Django's own console handlers rather than writing twice
+        'django': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+        'django.server': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
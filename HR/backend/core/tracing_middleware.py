@@ -0,0 +1,54 @@
+# Django side of request tracing (the span and export code is core/tracing.py, shared with the
+# MCP server). Continues traces started by the MCP server or starts new ones, with a span for
+# the request and for every SQL statement or executemany batch.
+import os
+
+from django.db import connection
+
+from core import tracing
+from core.tracing import sql_wrapper
+
+SERVICE_NAME = 'django'
+# Unsampled requests slower than this are exported anyway (0 turns it off)
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', '1000'))
+
+
+class TracingMiddleware:
+    # Root span per request with SQL spans beneath it; X-Trace-Id on the response finds the trace
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracing.TRACING_ENABLED:
+            return self.get_response(request)
+        root = tracing.begin_trace(f'{request.method} {request.path}', SERVICE_NAME, request.headers.get('traceparent'))
+        token = tracing.activate(root)
+        try:
+            with connection.execute_wrapper(sql_wrapper):
+                response = self.get_response(request)
+        except BaseException as e:
+            root.fail(e)
+            tracing.end_trace(root, TRACE_SLOW_MS)
+            raise
+        finally:
+            tracing.restore(token)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            root.name = f'{request.method} {match.route}'
+        root.set(status=response.status_code)
+        response['X-Trace-Id'] = root.trace.trace_id
+        if response.streaming:
+            response.streaming_content = self._stream(response.streaming_content, root)
+        else:
+            tracing.end_trace(root, TRACE_SLOW_MS)
+        return response
+
+    def _stream(self, content, root):
+        token = tracing.activate(root)
+        try:
+            with connection.execute_wrapper(sql_wrapper):
+                yield from content
+        finally:
+            tracing.restore(token)
+            tracing.end_trace(root, TRACE_SLOW_MS)
@@ -19,11 +19,19 @@ from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 from django.conf import settings
 from django.conf.urls.static import static
+from core.metrics import metrics_view
+from core.profiling import profiling_config_view, profiles_view, profile_download_view
+from core.querylog import querylog_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
     path('api/token/', obtain_auth_token, name='api-token'),
     path('api/', include('mcphub.urls')),
+    path('metrics', metrics_view, name='prometheus-metrics'),
+    path('api/profiling/', profiling_config_view, name='profiling-config'),
+    path('api/profiling/profiles/', profiles_view, name='profiling-profiles'),
+    path('api/profiling/profiles/<str:name>/', profile_download_view, name='profiling-download'),
+    path('api/querylog/', querylog_view, name='querylog'),
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
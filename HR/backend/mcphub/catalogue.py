@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.metrics import observe_upstream
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_MODELS_URL = 'https://openrouter.ai/api/v1/models'
+
+
+# Process-wide cache of the OpenRouter model list. Fresh copies are served for `ttl`
+# seconds; after that the stale copy is still served (up to `stale_ttl`) while a
+# background thread revalidates it, and the last good copy is kept if OpenRouter fails.
+class ModelCatalogue:
+    def __init__(self, url=OPENROUTER_MODELS_URL, ttl=600, stale_ttl=86400, timeout=10):
+        self.url = url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self._snapshot = None  # {'data', 'etag', 'fetched_at', 'upstream_etag', 'model_ids'}
+        # Held only by callers with nothing to serve (first load or past stale_ttl), so they share one fetch
+        self._fetch_lock = threading.Lock()
+        # Guards _refreshing only; never held across the HTTP call
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def get(self, api_key=None):
+        snapshot = self._snapshot
+        age = time.time() - snapshot['fetched_at'] if snapshot else None
+        if snapshot and age < self.ttl:
+            return snapshot
+        if snapshot and age < self.stale_ttl:
+            self._refresh_in_background(api_key)
+            return snapshot
+        with self._fetch_lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._snapshot is not snapshot:
+                return self._snapshot
+            return self._refresh(api_key)
+
+    def _refresh_in_background(self, api_key):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh(api_key)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='model-catalogue-refresh', daemon=True).start()
+
+    def _refresh(self, api_key):
+        # Returns the (possibly unchanged) snapshot; at most one background refresh runs at a time
+        snapshot = self._snapshot
+        headers = {'Authorization': f'Bearer {api_key}'} if api_key else {}
+        if snapshot and snapshot.get('upstream_etag'):
+            headers['If-None-Match'] = snapshot['upstream_etag']
+        try:
+            with observe_upstream('openrouter_models') as call:
+                resp = requests.get(self.url, headers=headers, timeout=self.timeout)
+                call['status'] = resp.status_code
+            if resp.status_code == status.HTTP_304_NOT_MODIFIED and snapshot:
+                self._snapshot = dict(snapshot, fetched_at=time.time())
+                return self._snapshot
+            resp.raise_for_status()
+            data = resp.json().get('data', [])
+        except Exception as e:
+            # Keep serving the last good copy
+            logger.warning('OpenRouter model catalogue refresh failed: %s', e)
+            return snapshot
+        body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self._snapshot = {
+            'data': data,
+            'etag': '"%s"' % hashlib.sha1(body).hexdigest(),
+            'fetched_at': time.time(),
+            'upstream_etag': resp.headers.get('ETag'),
+            'model_ids': {m.get('id') for m in data},
+        }
+        return self._snapshot
+
+
+catalogue = ModelCatalogue(
+    ttl=getattr(settings, 'MODEL_CATALOGUE_TTL', 600),
+    stale_ttl=getattr(settings, 'MODEL_CATALOGUE_STALE_TTL', 86400),
+)
+
+
+def metric_label(model):
+    # Clients choose the model string, so only catalogued models become metric labels; the rest
+    # (and everything before the catalogue is first loaded) are counted as 'other'
+    snapshot = catalogue.snapshot
+    return model if snapshot and model in snapshot['model_ids'] else 'other'
+
+
+def catalogue_response(request, snapshot):
+    # Conditional GET for clients: the ETag changes only when the catalogue content does
+    if request.headers.get('If-None-Match') == snapshot['etag']:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response({'data': snapshot['data']})
+    response['ETag'] = snapshot['etag']
+    response['Cache-Control'] = f'private, max-age={catalogue.ttl}'
+    return response
@@ -3,10 +3,11 @@ import requests
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from core.metrics import observe_llm
+from .catalogue import catalogue, catalogue_response, metric_label
 
 OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
 OPENROUTER_API_URL = 'https://openrouter.ai/api/v1/chat/completions'
-OPENROUTER_MODELS_URL = 'https://openrouter.ai/api/v1/models'
 
 @api_view(['POST'])
 def chat_view(request):
@@ -23,9 +24,12 @@ def chat_view(request):
         'Content-Type': 'application/json',
     }
     try:
-        resp = requests.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
+        with observe_llm(model, metric_label(model)) as call:
+            resp = requests.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=20)
+            call['status'] = resp.status_code
+            resp.raise_for_status()
+            data = resp.json()
+            call['usage'] = data.get('usage')
         ai_response = data['choices'][0]['message']['content'] if data.get('choices') else 'No response.'
         return Response({'response': ai_response})
     except Exception as e:
@@ -38,17 +42,11 @@ def models_view(request):
             {"id": "gpt-3.5", "label": "GPT-3.5", "value": "gpt-3.5"},
             {"id": "gpt-4", "label": "GPT-4", "value": "gpt-4"}
         ]})
-    headers = {
-        'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-    }
-    try:
-        resp = requests.get(OPENROUTER_MODELS_URL, headers=headers, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        # OpenRouter returns models as a list under 'data'
-        return Response({'data': data.get('data', [])})
-    except Exception as e:
+    snapshot = catalogue.get(OPENROUTER_API_KEY)
+    if snapshot is None:
         return Response({'data': [
             {"id": "gpt-3.5", "label": "GPT-3.5", "value": "gpt-3.5"},
             {"id": "gpt-4", "label": "GPT-4", "value": "gpt-4"}
-        ], 'error': str(e)}) 
\ No newline at end of file
+        ], 'error': 'Model catalogue unavailable.'})
+    # OpenRouter returns models as a list under 'data'
+    return catalogue_response(request, snapshot)
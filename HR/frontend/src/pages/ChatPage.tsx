@@ -19,7 +19,7 @@ import { Card, CardContent } from '@/components/ui/card';
 import ReactMarkdown from 'react-markdown';
 import rehypeRaw from 'rehype-raw';
 import remarkGfm from 'remark-gfm';
-import { sendMessage, fetchModels, getChatSessions, createChatSession, deleteChatSession, getChatMessages, createChatMessage, updateChatSession } from '@/services/chatService';
+import { streamMessage, fetchModels, getChatSessions, createChatSession, deleteChatSession, getChatMessages, createChatMessage, updateChatSession } from '@/services/chatService';
 import { format } from 'date-fns';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useAuth } from '@/contexts/AuthContext';
@@ -761,23 +761,45 @@ const HRAssistantPro: React.FC = () => {
         ...history,
       ];
       const modelToUse = sessionModel || selectedModel;
-      const response = await sendMessage({
+      // Stream tokens into a bot message as they arrive; time-to-first-token is what the user waits for
+      const botId = `${Date.now()}_bot`;
+      let started = false;
+      const fullText = await streamMessage({
         model: modelToUse,
         messages: mcpMessages,
         prompt: customPrompt,
-      }, undefined, undefined, { signal: abortControllerRef.current.signal });
+        session_id: sessionId ? String(sessionId) : undefined,
+      }, (event) => {
+        if (event.event !== 'token') return;
+        if (!started) {
+          started = true;
+          setIsTyping(false);
+          setMessages((prev) => [...prev, {
+            id: botId,
+            type: 'bot',
+            content: '',
+            timestamp: new Date(),
+            model: selectedModel,
+            confidence: Math.round(85 + Math.random() * 15),
+          }]);
+        }
+        setMessages((prev) => prev.map((m) => m.id === botId ? { ...m, content: m.content + event.data.content } : m));
+      }, abortControllerRef.current.signal);
       setIsTyping(false);
 
+      const responseText = fullText || 'I apologize, but I was unable to generate a response. Please try rephrasing your question.';
       const botResponse: Message = {
-        id: `${Date.now()}_bot`,
+        id: botId,
         type: 'bot',
-        content: response.response || 'I apologize, but I was unable to generate a response. Please try rephrasing your question.',
+        content: responseText,
         timestamp: new Date(),
         model: selectedModel,
         confidence: Math.round(85 + Math.random() * 15),
-        tokens: Math.ceil((response.response || '').length / 4),
+        tokens: Math.ceil(fullText.length / 4),
       };
-      setMessages((prev) => [...prev, botResponse]);
+      setMessages((prev) => started
+        ? prev.map((m) => m.id === botId ? { ...m, content: responseText, tokens: botResponse.tokens } : m)
+        : [...prev, botResponse]);
       setIsLoading(false);
       playNotificationSound();
       setChatStats((prev) => ({
@@ -785,7 +807,7 @@ const HRAssistantPro: React.FC = () => {
         totalTokens: prev.totalTokens + (userMessage.tokens || 0) + (botResponse.tokens || 0),
         averageResponseTime: 1.2 + Math.random() * 0.8,
       }));
-      await createChatMessage({ session: sessionId, role: 'assistant', content: response.response || 'I apologize, but I was unable to generate a response. Please try rephrasing your question.' });
+      await createChatMessage({ session: sessionId, role: 'assistant', content: responseText });
       setPendingMessages(prev => prev.filter(m => m.id !== tempId));
     } catch (error: any) {
       setIsTyping(false);
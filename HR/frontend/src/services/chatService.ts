@@ -12,6 +12,7 @@ export const sendMessage = async (
     model: string,
     messages: any[],
     prompt?: string,
+    session_id?: string,
     extra_headers?: any,
     extra_body?: any
   },
@@ -40,6 +41,63 @@ export const sendMessage = async (
   return response.data;
 };
 
+export type ChatStreamEvent =
+  | { event: 'token'; data: { content: string } }
+  | { event: 'tool'; data: { name: string; status: 'start' | 'end'; input?: string } }
+  | { event: 'error'; data: { message: string } }
+  | { event: 'done'; data: { usage: any } };
+
+// Streams the MCP /chat/stream Server-Sent Events; resolves with the full response text
+export const streamMessage = async (
+  payload: {
+    model: string,
+    messages: any[],
+    prompt?: string,
+    session_id?: string,
+  },
+  onEvent: (event: ChatStreamEvent) => void,
+  signal?: AbortSignal
+) => {
+  const body: any = { ...payload };
+  const token = localStorage.getItem('authToken');
+  if (token) {
+    body.authToken = token;
+  }
+  const response = await fetch('http://127.0.0.1:8001/chat/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat stream failed with status ${response.status}`);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const frames = buffer.split('\n\n');
+    buffer = frames.pop() || '';
+    for (const frame of frames) {
+      const eventLine = frame.split('\n').find((line) => line.startsWith('event: '));
+      const dataLine = frame.split('\n').find((line) => line.startsWith('data: '));
+      if (!eventLine || !dataLine) continue;
+      const event = { event: eventLine.slice(7), data: JSON.parse(dataLine.slice(6)) } as ChatStreamEvent;
+      if (event.event === 'token') {
+        text += event.data.content;
+      } else if (event.event === 'error') {
+        throw new Error(event.data.message);
+      }
+      onEvent(event);
+    }
+  }
+  return text;
+};
+
 export const getChatSessions = async () => {
   const response = await api.get('/chatsessions/');
   return response.data;
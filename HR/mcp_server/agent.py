@@ -1,44 +1,55 @@
 from dotenv import load_dotenv
 import os
+import re
+import logging
 import sys
-import traceback
+import json
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import httpx
 load_dotenv()
-# Debug: Print the loaded OpenAI/OpenRouter API key (masked for security)
-api_key = os.getenv('OPENAI_API_KEY')
-if api_key:
-    print(f"Loaded OPENAI_API_KEY: {api_key[:6]}...{'*' * (len(api_key)-10)}...{api_key[-4:]}")
-else:
-    print("OPENAI_API_KEY not found or empty!")
-# Remove or comment out debug prints for API keys and tokens
-# openai_key = os.getenv('OPENAI_API_KEY')
-# openrouter_key = os.getenv('OPENROUTER_API_KEY')
-# if not openai_key:
-#     print('OPENAI_API_KEY not found in environment!', file=sys.stderr)
-# else:
-#     print(f'OPENAI_API_KEY loaded: {openai_key[:6]}... (length: {len(openai_key)})', file=sys.stderr)
-# if not openrouter_key:
-#     print('OPENROUTER_API_KEY not found in environment!', file=sys.stderr)
-# else:
-#     print(f'OPENROUTER_API_KEY loaded: {openrouter_key[:6]}... (length: {len(openrouter_key)})', file=sys.stderr)
-# hf_token = os.getenv('HUGGINGFACE_API_TOKEN')
-# if not hf_token:
-#     print('HUGGINGFACE_API_TOKEN not found in environment!', file=sys.stderr)
-# else:
-#     print(f'HUGGINGFACE_API_TOKEN loaded: {hf_token[:6]}... (length: {len(hf_token)})', file=sys.stderr)
+logger = logging.getLogger(__name__)
+if not os.getenv('OPENAI_API_KEY'):
+    logger.warning('OPENAI_API_KEY not found or empty')
 from langchain.agents import initialize_agent, Tool
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda
 from langchain_openai import ChatOpenAI  # Updated import for chat models
-from tools import get_candidate, delete_candidate, update_candidate, get_candidate_metrics, list_candidates
+from tools import get_candidate, delete_candidate, update_candidate, get_candidate_metrics, list_candidates, find_candidates
+from tools import aget_candidate, adelete_candidate, aupdate_candidate, aget_candidate_metrics, alist_candidates, afind_candidates
 from typing import List, Dict, Any
 from langgraph.graph import StateGraph, END
 from dataclasses import dataclass
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-
-# --- Memory and Summaries ---
-session_summaries = {}  # In-memory dict for session summaries (replace with DB for production)
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+from context import assemble_context
+from cache import response_cache, cache_key, is_cacheable, memo_session
+from catalogue import supports_function_calling
+from providers import providers
+from singleflight import SingleFlight, fingerprint
+import metrics
+import tracing
 
 # Set your OpenRouter API key as an environment variable or directly here
 OPENROUTER_API_KEY = os.getenv('OPENAI_API_KEY', 'sk-...')
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+DEFAULT_MODEL = "qwen/qwen3-235b-a22b-07-25:free"
+
+# --- Shared clients and compiled agents ---
+# Built once per model and reused by every request; per-request state (auth token,
+# page) is injected at invoke time through these context variables.
+request_auth_token = contextvars.ContextVar('request_auth_token', default=None)
+request_page = contextvars.ContextVar('request_page', default=None)
+
+_registry_lock = threading.RLock()
+_http_client = None
+_llm_clients = {}  # (model, streaming) -> ChatOpenAI
+_langgraph_agents = {}  # model -> compiled StateGraph
+_tool_agents = {}  # model -> AgentExecutor
+_tool_graphs = {}  # model -> compiled tool-calling StateGraph
+_streaming_tool_graphs = {}  # model -> same, on the streaming client
 
 try:
     from langgraph.graph import StateGraph, END
@@ -51,33 +62,6 @@ except ImportError:
 class AgentState:
     messages: list
 
-# Fallback: Call Hugging Face Inference API for a public model (e.g., GPT-2)
-def call_hf_fallback(prompt):
-    api_url = "https://api-inference.huggingface.co/models/gpt2"  # Public model for fallback
-    hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
-    headers = {"Authorization": f"Bearer {hf_token}"} if hf_token else {}
-    data = {"inputs": prompt}
-    try:
-        response = requests.post(api_url, headers=headers, json=data, timeout=30)
-        try:
-            result = response.json()
-        except Exception as json_err:
-            # print(f'HF raw response: {response.text}', file=sys.stderr)
-            return {"role": "assistant", "content": "Sorry, I couldn't get a valid response from the backup AI service. Please try again later or check your Hugging Face API token."}
-        # Extract text from result
-        if isinstance(result, dict) and "generated_text" in result:
-            return {"role": "assistant", "content": result["generated_text"]}
-        elif isinstance(result, list) and result and "generated_text" in result[0]:
-            return {"role": "assistant", "content": result[0]["generated_text"]}
-        elif isinstance(result, dict) and "error" in result:
-            # print(f'HF error: {result["error"]}', file=sys.stderr)
-            return {"role": "assistant", "content": f"Sorry, the backup AI service returned an error: {result['error']}"}
-        else:
-            return {"role": "assistant", "content": "Sorry, the backup AI service returned an unexpected response. Please try again later."}
-    except Exception as e:
-        # print(f'HF fallback exception: {e}', file=sys.stderr)
-        return {"role": "assistant", "content": "Sorry, there was a problem contacting the backup AI service. Please try again later."}
-
 def convert_to_lc_messages(messages):
     lc_messages = []
     for msg in messages:
@@ -98,78 +82,298 @@ def convert_to_lc_messages(messages):
             lc_messages.append(msg)
     return lc_messages
 
+def get_http_client():
+    # One keep-alive connection pool to OpenRouter shared by all models
+    global _http_client
+    if _http_client is None:
+        with _registry_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    transport=metrics.InstrumentedTransport(
+                        'openrouter', limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60)),
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                )
+    return _http_client
+
+def get_llm(model=None, streaming=False):
+    model = model or DEFAULT_MODEL
+    key = (model, streaming)
+    llm = _llm_clients.get(key)
+    if llm is None:
+        with _registry_lock:
+            llm = _llm_clients.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    temperature=0,
+                    streaming=streaming,
+                    default_headers={"X-Title": "HR Assistant Pro MCP"},
+                    base_url=OPENROUTER_BASE_URL,
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=get_http_client(),
+                )
+                _llm_clients[key] = llm
+    return llm
+
+def _registered(registry, model, build):
+    model = model or DEFAULT_MODEL
+    agent = registry.get(model)
+    if agent is None:
+        with _registry_lock:
+            agent = registry.get(model)
+        if agent is None:
+            # Build outside the lock (it may create the LLM client); first one stored wins
+            agent = build(model)
+            with _registry_lock:
+                agent = registry.setdefault(model, agent)
+    return agent
+
+def _llm_error_message(e):
+    # Error handling shared by the graph nodes: log and surface error details
+    logger.warning('Primary LLM failed: %s', e)
+    msg = str(e).lower()
+    if "rate limit" in msg or "429" in msg or "quota" in msg or "limit exceeded" in msg:
+        return {
+            "role": "assistant",
+            "content": "⚠️ Sorry, our AI service is temporarily unavailable due to usage limits. Please try again later or contact support if this issue persists.",
+            "error": True,
+        }
+    # Return the actual error message for other issues
+    return {
+        "role": "assistant",
+        "content": f"Sorry, there was an error with the primary AI service: {str(e)}",
+        "error": True,
+    }
+
 # --- LangGraph agent setup ---
-def get_langgraph_agent(model=None, auth_token=None, page=None, user_profile=None):
-    llm = ChatOpenAI(
-        model=model or "qwen/qwen3-235b-a22b-07-25:free",
-        temperature=0,
-        streaming=False,
-        default_headers={"X-Title": "HR Assistant Pro MCP"},
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+def _build_langgraph_agent(model):
     def llm_node(state: AgentState):
         try:
             # Convert messages to LangChain message objects
             lc_messages = convert_to_lc_messages(state.messages)
-            response = llm.invoke(lc_messages)
+            # Circuit-broken fallback (and optional hedging) across providers
+            response = providers.invoke(lc_messages, model, get_llm)
             return AgentState(messages=state.messages + [response])
         except Exception as e:
-            # Improved error handling: log and surface error details
-            print("Primary LLM failed:", str(e))
-            msg = str(e).lower()
-            if "rate limit" in msg or "429" in msg or "quota" in msg or "limit exceeded" in msg:
-                return AgentState(messages=state.messages + [{
-                    "role": "assistant",
-                    "content": "⚠️ Sorry, our AI service is temporarily unavailable due to usage limits. Please try again later or contact support if this issue persists."
-                }])
-            else:
-                # Return the actual error message for other issues
-                return AgentState(messages=state.messages + [{
-                    "role": "assistant",
-                    "content": f"Sorry, there was an error with the primary AI service: {str(e)}"
-                }])
+            return AgentState(messages=state.messages + [_llm_error_message(e)])
     graph = StateGraph(AgentState)
     graph.add_node("llm", llm_node)
     graph.set_entry_point("llm")
     graph.set_finish_point("llm")
     return graph.compile()
 
-def get_agent(model=None, auth_token=None, page=None, user_profile=None):
-    llm = ChatOpenAI(
-        model=model or "qwen/qwen3-235b-a22b-07-25:free",
-        default_headers={"X-Title": "HR Assistant Pro MCP"},
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+def get_langgraph_agent(model=None):
+    return _registered(_langgraph_agents, model, _build_langgraph_agent)
+
+# --- Tool-calling LangGraph agent (models with function calling) ---
+# The model may ask for several tools in one turn. Read-only calls run concurrently (at most
+# TOOL_CONCURRENCY at a time), writes run alone in the order requested, and the results are
+# handed back in call order, so N lookups cost one round-trip of wall time instead of N.
+TOOL_CONCURRENCY = int(os.getenv('TOOL_CONCURRENCY', '4'))
+# After this many tool rounds the model must answer with what it has
+MAX_TOOL_ROUNDS = int(os.getenv('MAX_TOOL_ROUNDS', '4'))
+READ_ONLY_TOOLS = {'get_candidate', 'find_candidates', 'list_candidates', 'get_candidate_metrics'}
+
+def _structured_tools():
+    # Same tools as the classic agent, with typed arguments the model can fill directly
+    def get_candidate_fn(candidate_id: int):
+        return get_candidate(candidate_id, auth_token=request_auth_token.get())
+    async def aget_candidate_fn(candidate_id: int):
+        return await aget_candidate(candidate_id, auth_token=request_auth_token.get())
+    def find_candidates_fn(query: str):
+        return find_candidates(query, auth_token=request_auth_token.get())
+    async def afind_candidates_fn(query: str):
+        return await afind_candidates(query, auth_token=request_auth_token.get())
+    def list_candidates_fn(page: int = 0):
+        return list_candidates(page=page or request_page.get() or 1, auth_token=request_auth_token.get())
+    async def alist_candidates_fn(page: int = 0):
+        return await alist_candidates(page=page or request_page.get() or 1, auth_token=request_auth_token.get())
+    def get_candidate_metrics_fn():
+        return get_candidate_metrics(auth_token=request_auth_token.get())
+    async def aget_candidate_metrics_fn():
+        return await aget_candidate_metrics(auth_token=request_auth_token.get())
+    def update_candidate_fn(candidate_id: int, field: str, value: str):
+        return update_candidate(candidate_id, field, value, auth_token=request_auth_token.get())
+    async def aupdate_candidate_fn(candidate_id: int, field: str, value: str):
+        return await aupdate_candidate(candidate_id, field, value, auth_token=request_auth_token.get())
+    def delete_candidate_fn(candidate_id: int):
+        return delete_candidate(candidate_id, auth_token=request_auth_token.get())
+    async def adelete_candidate_fn(candidate_id: int):
+        return await adelete_candidate(candidate_id, auth_token=request_auth_token.get())
+    return [
+        StructuredTool.from_function(func=get_candidate_fn, coroutine=aget_candidate_fn, name='get_candidate',
+                                     description='Get candidate details by ID. For several candidates, call it once per ID in the same turn.'),
+        StructuredTool.from_function(func=find_candidates_fn, coroutine=afind_candidates_fn, name='find_candidates',
+                                     description='Find candidates by name, email or phone number prefix.'),
+        StructuredTool.from_function(func=list_candidates_fn, coroutine=alist_candidates_fn, name='list_candidates',
+                                     description='List all candidates, newest first, one page at a time (page 1 by default).'),
+        StructuredTool.from_function(func=get_candidate_metrics_fn, coroutine=aget_candidate_metrics_fn, name='get_candidate_metrics',
+                                     description='Get candidate analytics/metrics: totals, hires, rejections, counts by stage and source.'),
+        StructuredTool.from_function(func=update_candidate_fn, coroutine=aupdate_candidate_fn, name='update_candidate',
+                                     description="Update one field of a candidate, e.g. field 'candidate_stage' or 'email'."),
+        StructuredTool.from_function(func=delete_candidate_fn, coroutine=adelete_candidate_fn, name='delete_candidate',
+                                     description='Delete a candidate by ID.'),
+    ]
+
+def _tool_batches(tool_calls):
+    # Consecutive read-only calls form one concurrent batch; each write is a batch of its own
+    batches = []
+    for call in tool_calls:
+        if call['name'] in READ_ONLY_TOOLS and batches and batches[-1][0]['name'] in READ_ONLY_TOOLS:
+            batches[-1].append(call)
+        else:
+            batches.append([call])
+    return batches
+
+def _tool_message(call, result):
+    content = result if isinstance(result, str) else json.dumps(result, default=str)
+    return ToolMessage(content=content, tool_call_id=call['id'], name=call['name'])
+
+def _run_tool_call(tools_by_name, call):
+    tool = tools_by_name.get(call['name'])
+    if tool is None:
+        return _tool_message(call, {"success": False, "message": f"Unknown tool {call['name']}."})
+    with tracing.span(f"tool {call['name']}") as span:
+        try:
+            return _tool_message(call, tool.invoke(call['args']))
+        except Exception as e:
+            span.fail(e)
+            return _tool_message(call, {"success": False, "message": f"Tool {call['name']} failed: {e}"})
+
+async def _arun_tool_call(tools_by_name, call):
+    tool = tools_by_name.get(call['name'])
+    if tool is None:
+        return _tool_message(call, {"success": False, "message": f"Unknown tool {call['name']}."})
+    with tracing.span(f"tool {call['name']}") as span:
+        try:
+            return _tool_message(call, await tool.ainvoke(call['args']))
+        except Exception as e:
+            span.fail(e)
+            return _tool_message(call, {"success": False, "message": f"Tool {call['name']} failed: {e}"})
+
+def execute_tool_calls(tools_by_name, tool_calls):
+    results = []
+    for batch in _tool_batches(tool_calls):
+        if len(batch) == 1:
+            results.append(_run_tool_call(tools_by_name, batch[0]))
+            continue
+        with ThreadPoolExecutor(max_workers=min(len(batch), TOOL_CONCURRENCY)) as pool:
+            # A fresh copy of the context per call, so every worker sees this request's auth token
+            futures = [pool.submit(contextvars.copy_context().run, _run_tool_call, tools_by_name, call) for call in batch]
+            results.extend(future.result() for future in futures)
+    return results
+
+async def aexecute_tool_calls(tools_by_name, tool_calls):
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+    async def run(call):
+        async with semaphore:
+            return await _arun_tool_call(tools_by_name, call)
+    results = []
+    for batch in _tool_batches(tool_calls):
+        results.extend(await asyncio.gather(*(run(call) for call in batch)))
+    return results
+
+def _build_tool_graph(model, streaming=False):
+    tools = _structured_tools()
+    tools_by_name = {tool.name: tool for tool in tools}
+    bound = {}  # (model, final round) -> LLM bound to the tools; fallback models are bound on first use
+    def bind(m, final):
+        if (m, final) not in bound:
+            llm = get_llm(m, streaming=streaming)
+            bound[(m, final)] = llm.bind_tools(tools, tool_choice='none') if final else llm.bind_tools(tools)
+        return bound[(m, final)]
+    def builder(state):
+        final = sum(1 for m in state.messages if getattr(m, 'tool_calls', None)) >= MAX_TOOL_ROUNDS
+        return lambda m: bind(m, final)
+    # Hedging would interleave two models' tokens in a stream
+    hedge = False if streaming else None
+    def llm_node(state: AgentState):
+        try:
+            response = providers.invoke(convert_to_lc_messages(state.messages), model, builder(state), tools=True, hedge=hedge)
+        except Exception as e:
+            return AgentState(messages=state.messages + [_llm_error_message(e)])
+        return AgentState(messages=state.messages + [response])
+    async def allm_node(state: AgentState):
+        try:
+            response = await providers.ainvoke(convert_to_lc_messages(state.messages), model, builder(state), tools=True, hedge=hedge)
+        except Exception as e:
+            return AgentState(messages=state.messages + [_llm_error_message(e)])
+        return AgentState(messages=state.messages + [response])
+    def tools_node(state: AgentState):
+        return AgentState(messages=state.messages + execute_tool_calls(tools_by_name, state.messages[-1].tool_calls))
+    async def atools_node(state: AgentState):
+        return AgentState(messages=state.messages + await aexecute_tool_calls(tools_by_name, state.messages[-1].tool_calls))
+    def next_step(state: AgentState):
+        return 'tools' if getattr(state.messages[-1], 'tool_calls', None) else END
+    graph = StateGraph(AgentState)
+    graph.add_node('llm', RunnableLambda(llm_node, afunc=allm_node))
+    graph.add_node('tools', RunnableLambda(tools_node, afunc=atools_node))
+    graph.set_entry_point('llm')
+    graph.add_conditional_edges('llm', next_step, {'tools': 'tools', END: END})
+    graph.add_edge('tools', 'llm')
+    return graph.compile()
+
+def get_tool_graph(model=None, streaming=False):
+    if streaming:
+        return _registered(_streaming_tool_graphs, model, lambda m: _build_tool_graph(m, streaming=True))
+    return _registered(_tool_graphs, model, _build_tool_graph)
+
+def _build_agent(model):
+    llm = get_llm(model)
+    # Tools read the caller's auth token and page at call time, so one agent serves every user
     def get_candidate_tool(cid):
-        return get_candidate(cid, auth_token=auth_token)
+        return get_candidate(cid, auth_token=request_auth_token.get())
     def delete_candidate_tool(cid):
-        return delete_candidate(cid, auth_token=auth_token)
+        return delete_candidate(cid, auth_token=request_auth_token.get())
     def update_candidate_tool(args):
-        return update_candidate(args[0], args[1], args[2], auth_token=auth_token)
+        return update_candidate(args[0], args[1], args[2], auth_token=request_auth_token.get())
     def get_candidate_metrics_tool(params=None):
-        return get_candidate_metrics(params, auth_token=auth_token)
+        return get_candidate_metrics(params, auth_token=request_auth_token.get())
     def list_candidates_tool(page_arg=None):
-        return list_candidates(page=page_arg or page or 1, auth_token=auth_token)
+        return list_candidates(page=page_arg or request_page.get() or 1, auth_token=request_auth_token.get())
+    def find_candidates_tool(query):
+        return find_candidates(query, auth_token=request_auth_token.get())
+    # Async twins used when the agent is streamed from the event loop
+    async def aget_candidate_tool(cid):
+        return await aget_candidate(cid, auth_token=request_auth_token.get())
+    async def adelete_candidate_tool(cid):
+        return await adelete_candidate(cid, auth_token=request_auth_token.get())
+    async def aupdate_candidate_tool(args):
+        return await aupdate_candidate(args[0], args[1], args[2], auth_token=request_auth_token.get())
+    async def aget_candidate_metrics_tool(params=None):
+        return await aget_candidate_metrics(params, auth_token=request_auth_token.get())
+    async def alist_candidates_tool(page_arg=None):
+        return await alist_candidates(page=page_arg or request_page.get() or 1, auth_token=request_auth_token.get())
+    async def afind_candidates_tool(query):
+        return await afind_candidates(query, auth_token=request_auth_token.get())
     tools = [
-        Tool(name='get_candidate', func=get_candidate_tool, description='Get candidate details by ID'),
-        Tool(name='delete_candidate', func=delete_candidate_tool, description='Delete candidate by ID'),
-        Tool(name='update_candidate', func=update_candidate_tool, description='Update candidate field by ID'),
-        Tool(name='get_candidate_metrics', func=get_candidate_metrics_tool, description='Get candidate analytics/metrics'),
+        Tool(name='get_candidate', func=get_candidate_tool, coroutine=aget_candidate_tool, description='Get candidate details by ID'),
+        Tool(name='delete_candidate', func=delete_candidate_tool, coroutine=adelete_candidate_tool, description='Delete candidate by ID'),
+        Tool(name='update_candidate', func=update_candidate_tool, coroutine=aupdate_candidate_tool, description='Update candidate field by ID'),
+        Tool(name='get_candidate_metrics', func=get_candidate_metrics_tool, coroutine=aget_candidate_metrics_tool, description='Get candidate analytics/metrics'),
         Tool(
             name='list_candidates',
             func=list_candidates_tool,
+            coroutine=alist_candidates_tool,
             description='Show all candidates, list all candidates, display all candidates, or get a paginated list of all candidates (page=1 by default). Use this tool for queries like "show me all candidates", "list all candidates", "display all candidates".'
         ),
+        Tool(
+            name='find_candidates',
+            func=find_candidates_tool,
+            coroutine=afind_candidates_tool,
+            description='Find candidates by name, email or phone number (prefix match, e.g. "Jane Smith", "jane@", "0300"). Use this instead of list_candidates when the user names a specific candidate.'
+        ),
     ]
     # --- Dynamic tool registration example (future):
     # if user_profile and user_profile.get('role') == 'admin':
-    #     tools.append(Tool(...))
+    #     tools.append(Tool(...))  (register a separate agent per role rather than per request)
     return initialize_agent(
         tools, llm, agent_type='openai-functions',
     )
 
+def get_agent(model=None):
+    return _registered(_tool_agents, model, _build_agent)
+
 def format_candidate(candidate):
     # Format a single candidate dict as markdown
     return f"""
@@ -204,20 +408,170 @@ def format_candidate_list(candidates):
         md += '| ' + ' | '.join(row) + ' |\n'
     return md
 
-def run_agent(messages: List[Dict[str, Any]], session_id=None, model=None, auth_token=None, page=None, prompt=None, user_profile=None):
-    # --- Memory: keep only the last 10 messages ---
-    short_history = messages[-10:] if messages else []
-    # --- Summarization: prepend a session summary if available ---
-    summary = session_summaries.get(session_id) if session_id else None
-    if summary:
-        short_history = [{"role": "system", "content": summary}] + short_history
+def reaches_tools(model):
+    # The legacy agent always has tools; under LangGraph only function-calling models get them
+    return not LANGGRAPH_AVAILABLE or supports_function_calling(model)
+
+# Shared by run_agent and stream_agent: token-budgeted context plus the cache key (None if not cacheable)
+def _prepare_context(messages, model=None, prompt=None, summary=None, usage=None, auth_token=None):
+    # --- Context: system prompt, session summary and recent turns packed into the model's token budget ---
+    with tracing.span('context.assemble') as span:
+        short_history, context_usage = assemble_context(messages, model=model, prompt=prompt, summary=summary)
+        span.set(prompt_tokens=context_usage.get('prompt_tokens'), turns=context_usage.get('turns_included'))
+    if usage is not None:
+        usage.update(context_usage)
+    # --- Response cache: repeat general questions skip the LLM entirely ---
+    if is_cacheable(short_history):
+        # A model with tools can answer from data only this caller may see, so its entries are per user
+        owner = auth_token if reaches_tools(model) else None
+        return short_history, cache_key(model, short_history, owner)
+    response_cache.skip()
+    if usage is not None:
+        usage['cache'] = 'skip'
+    return short_history, None
+
+def _cached_response(key, usage=None):
+    if not key:
+        return None
+    cached = response_cache.get(key)
+    if usage is not None:
+        usage['cache'] = 'hit' if cached is not None else 'miss'
+    return cached
+
+llm_flights = SingleFlight('agent')
+
+def run_agent(messages: List[Dict[str, Any]], session_id=None, model=None, auth_token=None, page=None, prompt=None, user_profile=None, summary=None, usage=None):
+    short_history, key = _prepare_context(messages, model=model, prompt=prompt, summary=summary, usage=usage, auth_token=auth_token)
+    cached = _cached_response(key, usage)
+    if cached is not None:
+        return cached
+    # Identical concurrent turns share one agent run. A model without tools answers from the context
+    # alone, so general questions share its cache key; a turn that may reach the tools is always keyed
+    # on the user and page as well, since what the tools return depends on who is asking.
+    if key and not reaches_tools(model):
+        flight_key = key
+    else:
+        flight_key = fingerprint(model, short_history, auth_token, page)
+    # Tool reads are memoised per chat session
+    session_ctx = memo_session.set(session_id)
+    try:
+        with tracing.span('agent', model=model):
+            response, ok = llm_flights.do(flight_key, _invoke_agent, short_history, model, auth_token=auth_token, page=page, user_profile=user_profile)
+    finally:
+        memo_session.reset(session_ctx)
+    if key and ok:
+        response_cache.set(key, response)
+    return response
+
+_CHUNK_PATTERN = re.compile(r'\S+\s*|\s+')
+
+def text_chunks(text, words_per_chunk=3):
+    # Split a complete response into small word groups so canned/cached answers stream like tokens
+    words = _CHUNK_PATTERN.findall(text or '')
+    for i in range(0, len(words), words_per_chunk):
+        yield ''.join(words[i:i + words_per_chunk])
+
+def _trailing_tool_messages(messages):
+    # The ToolMessages appended by the last tools step, in call order
+    tail = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        tail.append(message)
+    return tail[::-1]
+
+def _token_event(content):
+    return {'event': 'token', 'data': {'content': content}}
+
+async def stream_agent(messages: List[Dict[str, Any]], session_id=None, model=None, auth_token=None, page=None, prompt=None, user_profile=None, summary=None, usage=None):
+    # Async generator of SSE-style events: token, tool (start/end) and error
+    short_history, key = _prepare_context(messages, model=model, prompt=prompt, summary=summary, usage=usage, auth_token=auth_token)
+    cached = _cached_response(key, usage)
+    if cached is not None:
+        for chunk in text_chunks(cached):
+            yield _token_event(chunk)
+        return
+    parts = []
+    ok = True
+    token_ctx = request_auth_token.set(auth_token)
+    page_ctx = request_page.set(page)
+    session_ctx = memo_session.set(session_id)
+    # Spans the whole stream, so the waterfall shows generation time and not just time to first token
+    with tracing.span('agent', model=model, stream=True):
+        try:
+            if LANGGRAPH_AVAILABLE and supports_function_calling(model):
+                graph = get_tool_graph(model, streaming=True)
+                config = {"configurable": {"auth_token": auth_token, "page": page}}
+                async for mode, payload in graph.astream(AgentState(messages=short_history), config=config, stream_mode=['messages', 'updates']):
+                    if mode == 'messages':
+                        chunk, metadata = payload
+                        if metadata.get('langgraph_node') == 'llm' and isinstance(chunk, AIMessageChunk) and chunk.content:
+                            parts.append(chunk.content)
+                            yield _token_event(chunk.content)
+                        continue
+                    for node, update in payload.items():
+                        last = update['messages'][-1]
+                        if isinstance(last, dict) and last.get('error'):
+                            ok = False
+                            yield {'event': 'error', 'data': {'message': last.get('content', '')}}
+                        elif node == 'llm':
+                            for call in getattr(last, 'tool_calls', None) or []:
+                                yield {'event': 'tool', 'data': {'name': call['name'], 'status': 'start', 'input': str(call['args'])[:200]}}
+                        elif node == 'tools':
+                            ok = False  # built from live data: stream it, never cache it
+                            for message in _trailing_tool_messages(update['messages']):
+                                yield {'event': 'tool', 'data': {'name': message.name, 'status': 'end'}}
+            elif LANGGRAPH_AVAILABLE:
+                stream_llm = lambda m: get_llm(m, streaming=True)
+                async for chunk in providers.astream(convert_to_lc_messages(short_history), model or DEFAULT_MODEL, stream_llm):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield _token_event(chunk.content)
+            else:
+                agent = get_agent(model)
+                config = {"configurable": {"auth_token": auth_token, "page": page}}
+                async for step in agent.astream({"messages": short_history}, config=config):
+                    for action in step.get('actions', []):
+                        yield {'event': 'tool', 'data': {'name': action.tool, 'status': 'start', 'input': str(action.tool_input)[:200]}}
+                    for tool_step in step.get('steps', []):
+                        yield {'event': 'tool', 'data': {'name': tool_step.action.tool, 'status': 'end'}}
+                    if 'output' in step:
+                        parts.append(step['output'])
+                        for chunk in text_chunks(step['output']):
+                            yield _token_event(chunk)
+        except Exception as e:
+            ok = False
+            logger.exception('Streaming agent failed for model %s', model)
+            msg = str(e)
+            if 'rate limit' in msg.lower() or '429' in msg or 'limit exceeded' in msg:
+                message = "⚠️ Sorry, our AI service is temporarily unavailable due to usage limits. Please try again later or contact support if this issue persists."
+            else:
+                message = "Sorry, I couldn't complete your request due to an internal error. Please try again or contact support if the issue persists."
+            yield {'event': 'error', 'data': {'message': message}}
+        finally:
+            request_auth_token.reset(token_ctx)
+            request_page.reset(page_ctx)
+            memo_session.reset(session_ctx)
+    if key and ok and parts:
+        response_cache.set(key, ''.join(parts))
+
+# Returns (response_text, ok); ok is False for responses that must never be cached (errors, apologies, tool results)
+def _invoke_agent(short_history, model=None, auth_token=None, page=None, user_profile=None):
+    # Per-request state for the shared agents' tools
+    token_ctx = request_auth_token.set(auth_token)
+    page_ctx = request_page.set(page)
     try:
+        config = {"configurable": {"auth_token": auth_token, "page": page}}
         if LANGGRAPH_AVAILABLE:
-            agent = get_langgraph_agent(model, auth_token=auth_token, page=page, user_profile=user_profile)
-            result = agent.invoke(AgentState(messages=short_history))
+            # Function-calling models get the tool graph; the rest answer from the LLM alone
+            if supports_function_calling(model):
+                agent = get_tool_graph(model)
+            else:
+                agent = get_langgraph_agent(model)
+            result = agent.invoke(AgentState(messages=short_history), config=config)
         else:
-            agent = get_agent(model, auth_token=auth_token, page=page, user_profile=user_profile)
-            result = agent.invoke({"messages": short_history})
+            agent = get_agent(model)
+            result = agent.invoke({"messages": short_history}, config=config)
         # Post-process: always return only the latest assistant message's content
         messages = []
         if not isinstance(result, dict) and hasattr(result, 'messages'):
@@ -225,30 +579,34 @@ def run_agent(messages: List[Dict[str, Any]], session_id=None, model=None, auth_
         elif isinstance(result, dict) and 'messages' in result:
             messages = result['messages']
         if messages:
+            # Answers built from live tool results must not be cached
+            used_tools = any(isinstance(msg, ToolMessage) for msg in messages)
             # Find the last assistant message
             for msg in reversed(messages):
                 # If dict
                 if isinstance(msg, dict) and msg.get('role') == 'assistant':
-                    return msg.get('content', '')
+                    return msg.get('content', ''), not msg.get('error') and not used_tools
                 # If AIMessage or similar object
                 if hasattr(msg, 'content'):
-                    return msg.content
+                    return msg.content, not used_tools
         # Fallback: handle candidate dicts or lists as before
         if isinstance(result, dict):
             if 'content' in result:
-                return result['content']
+                return result['content'], True
             if 'output' in result:
-                return result['output']
+                return result['output'], True
             if 'email' in result and ('name' in result or 'first_name' in result):
-                return format_candidate(result)
-            return str(result)
+                return format_candidate(result), True
+            return str(result), True
         if isinstance(result, list) and result and ('email' in result[0] or 'first_name' in result[0]):
-            return format_candidate_list(result)
-        return "Sorry, I couldn't generate a response."
+            return format_candidate_list(result), True
+        return "Sorry, I couldn't generate a response.", False
     except Exception as e:
-        # print("Exception in run_agent:", file=sys.stderr)
-        traceback.print_exc()
+        logger.exception('Agent failed for model %s', model)
         msg = str(e)
         if 'rate limit' in msg.lower() or '429' in msg or 'limit exceeded' in msg:
-            return "⚠️ Sorry, our AI service is temporarily unavailable due to usage limits. Please try again later or contact support if this issue persists."
-        return "Sorry, I couldn't complete your request due to an internal error. Please try again or contact support if the issue persists." 
\ No newline at end of file
+            return "⚠️ Sorry, our AI service is temporarily unavailable due to usage limits. Please try again later or contact support if this issue persists.", False
+        return "Sorry, I couldn't complete your request due to an internal error. Please try again or contact support if the issue persists.", False
+    finally:
+        request_auth_token.reset(token_ctx)
+        request_page.reset(page_ctx)
@@ -0,0 +1,251 @@
+"""End-to-end load test of the MCP server's /chat pipeline against the local LLM stub.
+
+    python benchmarks/stub_llm.py --port 9100 &
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn main:app --port 8001 &
+    python benchmarks/chat_load.py --url http://127.0.0.1:8001 --stub http://127.0.0.1:9100 \\
+        --auth-token <django token> --sessions 20 --concurrency 8 --turns 3 --output chat-load.json
+
+Drives concurrent multi-turn sessions down each path in turn:
+  fast       messages the intent router answers straight from the tools (no LLM call)
+  langgraph  general questions to a model without tool calling (plain agent graph)
+  tools      questions to a tool-calling model that make it call a tool and answer
+and reports time to first byte (first token with --stream, the default), total latency,
+tokens per second and the stub's upstream call counts per path. Tool calls need the Django
+API (or MCP_TOOL_BACKEND=orm) behind the MCP server; the LLM is always the stub.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+from collections import Counter
+
+import httpx
+
+PATHS = {
+    'fast': {
+        'model': 'tool_model',
+        'messages': ['show candidate 1', 'list candidates', 'show me the hiring metrics', 'find candidate sara'],
+        # Identical messages are the point here: the router and the tool memo should absorb them
+        'unique': False,
+    },
+    'langgraph': {
+        'model': 'chat_model',
+        'messages': ['Write a short job description for a data analyst role',
+                     'What questions should I ask in a behavioural interview?',
+                     'How do I write a polite rejection email?'],
+        'unique': True,
+    },
+    'tools': {
+        'model': 'tool_model',
+        'messages': ['Which candidates look strongest for the open roles?',
+                     'Who should I interview first among the candidates?',
+                     'How is candidate 1 doing compared to the others?'],
+        'unique': True,
+    },
+}
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarise(samples):
+    if not samples:
+        return None
+    return {
+        'p50': round(percentile(samples, 0.50), 2),
+        'p95': round(percentile(samples, 0.95), 2),
+        'p99': round(percentile(samples, 0.99), 2),
+        'mean': round(statistics.fmean(samples), 2),
+        'max': round(max(samples), 2),
+    }
+
+
+async def send_stream(client, url, payload):
+    # POST /chat/stream; TTFB is the first token event, i.e. what the user sees
+    start = time.perf_counter()
+    ttfb, text, usage, error = None, [], {}, None
+    async with client.stream('POST', f'{url}/chat/stream', json=payload) as r:
+        if r.status_code != 200:
+            await r.aread()
+            return {'ok': False, 'status': r.status_code, 'total_ms': (time.perf_counter() - start) * 1000}
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                data = json.loads(line[6:])
+                if event == 'token':
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start
+                    text.append(data.get('content', ''))
+                elif event == 'error':
+                    error = data.get('message')
+                elif event == 'done':
+                    usage = data.get('usage') or {}
+    total = time.perf_counter() - start
+    return {'ok': error is None and ttfb is not None, 'status': 200, 'ttfb_ms': (ttfb or total) * 1000,
+            'total_ms': total * 1000, 'text': ''.join(text), 'usage': usage, 'error': error}
+
+
+async def send_plain(client, url, payload):
+    # POST /chat; TTFB is the arrival of the response headers
+    start = time.perf_counter()
+    async with client.stream('POST', f'{url}/chat', json=payload) as r:
+        ttfb = time.perf_counter() - start
+        body = await r.aread()
+    total = time.perf_counter() - start
+    if r.status_code != 200:
+        return {'ok': False, 'status': r.status_code, 'total_ms': total * 1000}
+    data = json.loads(body)
+    text = data.get('response')
+    ok = isinstance(text, str)
+    return {'ok': ok, 'status': 200, 'ttfb_ms': ttfb * 1000, 'total_ms': total * 1000,
+            'text': text if ok else '', 'usage': data.get('usage') or {}, 'error': None if ok else str(text)}
+
+
+async def run_session(client, args, path, spec, number, results):
+    model = getattr(args, spec['model'])
+    history = []
+    for turn in range(args.turns):
+        message = spec['messages'][(number + turn) % len(spec['messages'])]
+        if spec['unique']:
+            # Keeps the response cache from answering repeat questions
+            message = f'{message} (session {number}, turn {turn})'
+        history.append({'role': 'user', 'content': message})
+        payload = {'message': message, 'messages': history, 'model': model, 'authToken': args.auth_token}
+        send = send_stream if args.stream else send_plain
+        try:
+            result = await send(client, args.url, payload)
+        except httpx.HTTPError as e:
+            result = {'ok': False, 'status': None, 'error': f'{e.__class__.__name__}: {e}'}
+        results.append(result)
+        if result.get('ok'):
+            history.append({'role': 'assistant', 'content': result['text']})
+
+
+async def run_path(client, args, path):
+    spec = PATHS[path]
+    if args.stub:
+        await client.post(f'{args.stub}/stats/reset')
+    # Unmeasured: builds graphs and LLM clients, warms the catalogue and connection pools
+    await run_session(client, args, path, dict(spec, unique=True), -1, [])
+    if args.stub:
+        await client.post(f'{args.stub}/stats/reset')
+
+    results = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(number):
+        async with semaphore:
+            await run_session(client, args, path, spec, number, results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(n) for n in range(args.sessions)))
+    wall = time.perf_counter() - started
+
+    upstream = {}
+    if args.stub:
+        upstream = (await client.get(f'{args.stub}/stats')).json().get('total', {})
+    ok = [r for r in results if r.get('ok')]
+    rates = []
+    for r in ok:
+        if r['usage'].get('fast_path'):
+            # Canned answers are chunked locally; there is no generation rate to measure
+            continue
+        # Streamed: rate after the first token; otherwise the whole request is generation time
+        generating = (r['total_ms'] - r['ttfb_ms'] if args.stream else r['total_ms']) / 1000
+        # The stub emits one word per token
+        tokens = len(r['text'].split())
+        if generating > 0 and tokens > 1:
+            rates.append(tokens / generating)
+    statuses = Counter(str(r.get('status')) for r in results)
+    return {
+        'model': getattr(args, spec['model']),
+        'requests': len(results),
+        'ok': len(ok),
+        'errors': len(results) - len(ok),
+        'status_codes': dict(sorted(statuses.items())),
+        'sample_errors': sorted({str(r.get('error')) for r in results if not r.get('ok')})[:3],
+        'fast_path_hits': sum(1 for r in ok if r['usage'].get('fast_path')),
+        'throughput_rps': round(len(results) / wall, 2) if wall else None,
+        'ttfb_ms': summarise([r['ttfb_ms'] for r in ok]),
+        'total_ms': summarise([r['total_ms'] for r in ok]),
+        'tokens_per_second': summarise(rates),
+        'upstream': {
+            'calls': upstream.get('calls', 0),
+            'calls_per_request': round(upstream.get('calls', 0) / len(results), 2) if results else None,
+            'with_tools': upstream.get('with_tools', 0),
+            'tool_calls': upstream.get('tool_calls', 0),
+            'streamed': upstream.get('streamed', 0),
+            'errors': upstream.get('errors', 0),
+            'completion_tokens': upstream.get('completion_tokens', 0),
+        },
+    }
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+        report = {
+            'meta': {
+                'url': args.url,
+                'stub': args.stub,
+                'stream': args.stream,
+                'sessions': args.sessions,
+                'turns': args.turns,
+                'concurrency': args.concurrency,
+                'python': platform.python_version(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            'paths': {},
+        }
+        if args.stub:
+            report['meta']['stub_config'] = (await client.get(f'{args.stub}/stats')).json().get('config')
+        for path in args.paths:
+            report['paths'][path] = await run_path(client, args, path)
+            r = report['paths'][path]
+            ttfb, total, tps = r['ttfb_ms'] or {}, r['total_ms'] or {}, r['tokens_per_second'] or {}
+            print(f"{path:10} {r['ok']:4}/{r['requests']:<4} ttfb p50 {ttfb.get('p50', 0):8.1f} p95 {ttfb.get('p95', 0):8.1f} ms  "
+                  f"total p50 {total.get('p50', 0):8.1f} p95 {total.get('p95', 0):8.1f} ms  "
+                  f"{tps.get('p50', 0):6.1f} tok/s  upstream {r['upstream']['calls_per_request']} calls/req",
+                  file=sys.stderr)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8001', help='MCP server')
+    parser.add_argument('--stub', default='http://127.0.0.1:9100', help="LLM stub for upstream call counts ('' to skip)")
+    parser.add_argument('--auth-token', default=None, help='Django API token used for the tools')
+    parser.add_argument('--paths', nargs='+', choices=list(PATHS), default=list(PATHS))
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=3, help='Messages per session, sent one after another')
+    parser.add_argument('--concurrency', type=int, default=8, help='Sessions running at once')
+    parser.add_argument('--tool-model', default='openai/gpt-4o')
+    parser.add_argument('--chat-model', default='stub/chat')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help='Use /chat instead of /chat/stream')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--output', default='-', help="JSON report path ('-' for stdout)")
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+    args.stub = args.stub.rstrip('/')
+
+    report = asyncio.run(run(args))
+    payload = json.dumps(report, indent=2, sort_keys=True)
+    if args.output == '-':
+        print(payload)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(payload + '\n')
+    return 0 if all(p['errors'] == 0 for p in report['paths'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
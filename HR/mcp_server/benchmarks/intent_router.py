@@ -0,0 +1,84 @@
+"""Accuracy and latency of the fast-path intent router (intents.py).
+
+    python benchmarks/intent_router.py [--corpus FILE] [--iterations N] [--fail-under 1.0]
+
+Each corpus line is {"message", "intent", "direct", "args"}: the expected best intent
+(null when the message should go to the LLM), whether a function-calling model should
+answer it straight from the tools, and the expected arguments (null to skip the check).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import route, accepts  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_corpus.jsonl')
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(case):
+    intent = route(case['message'])
+    errors = []
+    name = intent.name if intent else None
+    if name != case['intent']:
+        errors.append(f"intent {name!r} != {case['intent']!r}")
+    if accepts(intent, function_calling=True) != case['direct']:
+        errors.append(f"direct {not case['direct']} != {case['direct']}")
+    if case.get('args') is not None and intent is not None and intent.args != case['args']:
+        errors.append(f"args {intent.args} != {case['args']}")
+    return intent, errors
+
+
+def time_route(messages, iterations):
+    # Per-message latency of route(), in microseconds
+    samples = []
+    for _ in range(iterations):
+        for message in messages:
+            start = time.perf_counter()
+            route(message)
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'mean_us': statistics.fmean(samples),
+        'p50_us': samples[len(samples) // 2],
+        'p99_us': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--fail-under', type=float, default=None, help='exit non-zero if accuracy is below this')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    failures = 0
+    for case in corpus:
+        intent, errors = check(case)
+        if errors:
+            failures += 1
+            print(f"FAIL {case['message']!r}: {'; '.join(errors)} (got {intent})")
+    accuracy = (len(corpus) - failures) / len(corpus) if corpus else 0.0
+    direct = sum(1 for case in corpus if case['direct'])
+    print(f"accuracy: {accuracy:.1%} ({len(corpus) - failures}/{len(corpus)}), answered without the LLM: {direct}")
+
+    timing = time_route([case['message'] for case in corpus], args.iterations)
+    print("route(): {calls} calls, mean {mean_us:.1f} us, p50 {p50_us:.1f} us, p99 {p99_us:.1f} us".format(**timing))
+
+    if args.fail_under is not None and accuracy < args.fail_under:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Local OpenAI-compatible LLM stub for benchmarking the MCP server offline.
+
+    python benchmarks/stub_llm.py [--port 9100] [--latency 0.3] [--tokens-per-second 50] ...
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn main:app --port 8001
+
+Serves /v1/models and /v1/chat/completions (plain and streamed). Each completion waits
+`latency` (+/- `jitter`) before its first token, then produces `response_tokens` words at
+`tokens_per_second`. A share of calls (`error_rate`) fails with `error_status`. When a
+request offers tools and has no tool results yet, the stub calls the tool that best
+matches the last user message; once tool results are present it answers in text.
+
+GET /stats returns call counters per model; POST /stats/reset clears them; POST /config
+changes any setting at runtime, e.g. {"latency": 1.0, "error_rate": 0.1}.
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter, defaultdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_CONFIG = {
+    'latency': 0.3,
+    'jitter': 0.1,
+    'tokens_per_second': 50.0,
+    'response_tokens': 60,
+    'error_rate': 0.0,
+    'error_status': 500,
+    # Listed in /v1/models with 'tools' in supported_parameters; every other model is chat-only
+    'tool_models': ['openai/gpt-4o', 'stub/tools'],
+    'chat_models': ['stub/chat', 'meta-llama/llama-3.3-70b-instruct:free'],
+}
+WORDS = ('the candidate pipeline looks healthy with several strong profiles in screening and a few '
+         'offers pending so focus on interviews this week and follow up with recruiters').split()
+
+app = FastAPI()
+config = dict(DEFAULT_CONFIG)
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def count(model, **increments):
+    with _stats_lock:
+        _stats[model].update(increments)
+
+
+def pick_tool(tools, messages):
+    # Tool whose name shares the most words with the last user message; list_candidates otherwise
+    names = [t.get('function', {}).get('name') for t in tools]
+    names = [n for n in names if n]
+    text = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '').lower()
+    words = set(re.findall(r'[a-z]+', text))
+    def score(name):
+        return len(set(name.split('_')) & words)
+    name = max(names, key=score) if names else None
+    if name and score(name) == 0 and 'list_candidates' in names:
+        name = 'list_candidates'
+    args = {}
+    digits = re.findall(r'\d+', text)
+    if name in ('get_candidate', 'delete_candidate', 'update_candidate') and digits:
+        args['candidate_id'] = digits[0]
+    elif name == 'find_candidates':
+        args['query'] = text.split()[-1] if text.split() else ''
+    elif name == 'list_candidates':
+        args['page'] = 1
+    return name, args
+
+
+def response_words(n):
+    return [WORDS[i % len(WORDS)] for i in range(n)]
+
+
+def completion_id():
+    return 'chatcmpl-' + uuid.uuid4().hex[:24]
+
+
+async def first_token_delay():
+    delay = max(0.0, config['latency'] + random.uniform(-config['jitter'], config['jitter']))
+    await asyncio.sleep(delay)
+
+
+def chunk(cid, model, delta, finish_reason=None):
+    payload = {
+        'id': cid, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }
+    return f'data: {json.dumps(payload)}\n\n'
+
+
+@app.get('/v1/models')
+async def models():
+    data = [{'id': m, 'name': m, 'supported_parameters': ['tools', 'tool_choice', 'temperature']} for m in config['tool_models']]
+    data += [{'id': m, 'name': m, 'supported_parameters': ['temperature']} for m in config['chat_models']]
+    return {'data': data}
+
+
+@app.post('/v1/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get('model', 'unknown')
+    messages = body.get('messages', [])
+    tools = body.get('tools') or []
+    stream = bool(body.get('stream'))
+    count(model, calls=1, streamed=int(stream), with_tools=int(bool(tools)))
+
+    await first_token_delay()
+    if random.random() < config['error_rate']:
+        count(model, errors=1)
+        status = int(config['error_status'])
+        return JSONResponse({'error': {'message': f'Injected stub error ({status})', 'code': status}}, status_code=status)
+
+    tool_call = None
+    if tools and not any(m.get('role') == 'tool' for m in messages):
+        name, args = pick_tool(tools, messages)
+        if name:
+            tool_call = {'id': 'call_' + uuid.uuid4().hex[:12], 'type': 'function',
+                         'function': {'name': name, 'arguments': json.dumps(args)}}
+    words = [] if tool_call else response_words(int(config['response_tokens']))
+    prompt_tokens = sum(len(str(m.get('content') or '').split()) for m in messages)
+    count(model, tool_calls=int(tool_call is not None), completion_tokens=len(words), prompt_tokens=prompt_tokens)
+    cid = completion_id()
+
+    if not stream:
+        # The whole generation time is spent before answering
+        await asyncio.sleep(len(words) / config['tokens_per_second'] if config['tokens_per_second'] else 0)
+        message = {'role': 'assistant', 'content': ' '.join(words) if words else None}
+        if tool_call:
+            message['tool_calls'] = [tool_call]
+        return {
+            'id': cid, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': message, 'finish_reason': 'tool_calls' if tool_call else 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(words), 'total_tokens': prompt_tokens + len(words)},
+        }
+
+    async def events():
+        yield chunk(cid, model, {'role': 'assistant', 'content': ''})
+        if tool_call:
+            yield chunk(cid, model, {'tool_calls': [dict(tool_call, index=0)]})
+            yield chunk(cid, model, {}, 'tool_calls')
+        else:
+            interval = 1 / config['tokens_per_second'] if config['tokens_per_second'] else 0
+            for i, word in enumerate(words):
+                yield chunk(cid, model, {'content': word if i == 0 else ' ' + word})
+                await asyncio.sleep(interval)
+            yield chunk(cid, model, {}, 'stop')
+        yield 'data: [DONE]\n\n'
+
+    return StreamingResponse(events(), media_type='text/event-stream')
+
+
+@app.get('/stats')
+async def stats():
+    with _stats_lock:
+        per_model = {m: dict(c) for m, c in _stats.items()}
+    total = Counter()
+    for c in per_model.values():
+        total.update(c)
+    return {'models': per_model, 'total': dict(total), 'config': config}
+
+
+@app.post('/stats/reset')
+async def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+    return {'ok': True}
+
+
+@app.post('/config')
+async def update_config(request: Request):
+    changes = await request.json()
+    unknown = set(changes) - set(config)
+    if unknown:
+        return JSONResponse({'error': f'Unknown settings: {sorted(unknown)}'}, status_code=400)
+    config.update(changes)
+    return config
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=DEFAULT_CONFIG['latency'], help='Seconds before the first token')
+    parser.add_argument('--jitter', type=float, default=DEFAULT_CONFIG['jitter'])
+    parser.add_argument('--tokens-per-second', type=float, default=DEFAULT_CONFIG['tokens_per_second'])
+    parser.add_argument('--response-tokens', type=int, default=DEFAULT_CONFIG['response_tokens'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_CONFIG['error_rate'], help='Share of calls that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=DEFAULT_CONFIG['error_status'], help='e.g. 429 to trip circuit breakers')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    for key in ('latency', 'jitter', 'tokens_per_second', 'response_tokens', 'error_rate', 'error_status'):
+        config[key] = getattr(args, key)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Waterfall view of traces exported by the MCP server and the Django API.
+
+    TRACING_ENABLED=True TRACE_EXPORT=/tmp/mcp-traces.jsonl uvicorn main:app --port 8001
+    TRACING_ENABLED=True TRACE_EXPORT=/tmp/django-traces.jsonl python manage.py runserver
+    python benchmarks/trace_waterfall.py /tmp/mcp-traces.jsonl /tmp/django-traces.jsonl --slowest 3
+
+Spans from every file are merged by trace id, so a chat turn shows its Django calls (and their
+SQL) under the MCP spans that made them. Runs of identical leaf spans, typically SQL statements
+issued in a loop, are folded into one line with a count unless --no-fold is given.
+"""
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+ATTRS_SHOWN = ('model', 'intent', 'status', 'path', 'statement', 'first_token_ms', 'error')
+
+
+def load(paths):
+    traces = defaultdict(lambda: {'spans': [], 'records': []})
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                trace = traces[record['trace_id']]
+                trace['spans'].extend(record['spans'])
+                trace['records'].append(record)
+    return traces
+
+
+def duration(trace):
+    # The outermost service's root covers the rest
+    spans = trace['spans']
+    start = min(s['start'] for s in spans)
+    end = max(s['start'] + s['duration_ms'] / 1000 for s in spans)
+    return (end - start) * 1000
+
+
+def describe(span):
+    attrs = span.get('attrs') or {}
+    shown = [f'{key}={attrs[key]}' for key in ATTRS_SHOWN if attrs.get(key) not in (None, '')]
+    text = span['name'] + (f" [{', '.join(shown)}]" if shown else '')
+    return text.replace('\n', ' ')
+
+
+def rows(trace, fold=True):
+    spans = trace['spans']
+    ids = {s['span_id'] for s in spans}
+    children = defaultdict(list)
+    for s in spans:
+        children[s['parent_id'] if s['parent_id'] in ids else None].append(s)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s['start'])
+
+    def walk(parent_id, depth):
+        siblings = children.get(parent_id, [])
+        i = 0
+        while i < len(siblings):
+            s = siblings[i]
+            j = i + 1
+            if fold and not children.get(s['span_id']):
+                while (j < len(siblings) and siblings[j]['name'] == s['name']
+                       and not children.get(siblings[j]['span_id'])):
+                    j += 1
+            if j - i > 1:
+                run = siblings[i:j]
+                end = max(r['start'] + r['duration_ms'] / 1000 for r in run)
+                yield depth, {
+                    'name': f"{s['name']} x{len(run)}", 'service': s['service'], 'start': s['start'],
+                    'duration_ms': (end - s['start']) * 1000, 'status': 'error' if any(r['status'] == 'error' for r in run) else 'ok',
+                    'attrs': {'busy_ms': round(sum(r['duration_ms'] for r in run), 1)},
+                }
+            else:
+                yield depth, s
+                yield from walk(s['span_id'], depth + 1)
+            i = j
+
+    yield from walk(None, 0)
+
+
+def render(trace_id, trace, width=50, fold=True):
+    spans = trace['spans']
+    origin = min(s['start'] for s in spans)
+    total = duration(trace) or 1
+    services = sorted({r['service'] for r in trace['records']})
+    dropped = sum(r.get('dropped_spans', 0) for r in trace['records'])
+    lines = [f"trace {trace_id}  {total:.1f} ms  services: {', '.join(services)}"
+             + (f'  ({dropped} spans dropped)' if dropped else '')]
+    for depth, s in rows(trace, fold=fold):
+        offset = (s['start'] - origin) * 1000
+        left = int(offset / total * width)
+        bar = max(1, int(s['duration_ms'] / total * width))
+        busy = s['attrs'].get('busy_ms') if s.get('attrs') else None
+        label = ('  ' * depth + describe(s))[:70]
+        mark = '!' if s['status'] == 'error' else ' '
+        lines.append(f"{label:70} {s['service']:10} {offset:9.1f} {s['duration_ms']:9.1f}{mark}"
+                     + (f' busy {busy:.1f}' if busy is not None else '')
+                     + f"\n{'':70} |{' ' * left}{'#' * min(bar, width - left)}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', help='JSON-lines trace exports (TRACE_EXPORT) from either service')
+    parser.add_argument('--trace', help='Show this trace id (e.g. from an X-Trace-Id response header)')
+    parser.add_argument('--slowest', type=int, default=5, help='Otherwise show the N slowest traces')
+    parser.add_argument('--width', type=int, default=50)
+    parser.add_argument('--no-fold', dest='fold', action='store_false', help='Show every span of a repeated run')
+    args = parser.parse_args()
+
+    traces = load(args.files)
+    if args.trace:
+        if args.trace not in traces:
+            print(f'Trace {args.trace} not found', file=sys.stderr)
+            return 1
+        selected = [args.trace]
+    else:
+        selected = sorted(traces, key=lambda t: duration(traces[t]), reverse=True)[:args.slowest]
+    print(f"{'span':70} {'service':10} {'start ms':>9} {'dur ms':>9}")
+    for trace_id in selected:
+        print()
+        print(render(trace_id, traces[trace_id], width=args.width, fold=args.fold))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '512'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '3600'))
+TOOL_MEMO_ENABLED = os.getenv('TOOL_MEMO_ENABLED', 'True') == 'True'
+TOOL_MEMO_SIZE = int(os.getenv('TOOL_MEMO_SIZE', '2048'))
+TOOL_MEMO_TTL = float(os.getenv('TOOL_MEMO_TTL', '60'))
+
+# Turns whose answer depends on live HR data (or on "now") must always reach the model/tools
+DATA_DEPENDENT_PATTERN = re.compile(
+    r'\b(candidates?|applicants?|metrics|analytics|statistics|dashboard|pipeline|hired|rejected|stages?|'
+    r'job ?posts?|openings?|update|delete|remove|today|yesterday|latest|recent|this (?:week|month|year))\b'
+    r'|\d|@',
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ResponseCache:
+    # Exact-match cache with a TTL per entry and LRU eviction once maxsize is reached
+
+    def __init__(self, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def skip(self):
+        with self._lock:
+            self.skips += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': LLM_CACHE_ENABLED,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'skips': self.skips,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def normalise_text(text):
+    return _WHITESPACE.sub(' ', str(text or '')).strip().lower()
+
+
+def cache_key(model, messages, auth_token=None):
+    # messages is the assembled context, so the system prompt and summary are part of the key;
+    # auth_token (only ever hashed) scopes an entry to one caller
+    payload = [model or '', auth_token or '', [(m.get('role', ''), normalise_text(m.get('content'))) for m in messages]]
+    return hashlib.sha256(json.dumps(payload, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def is_cacheable(messages):
+    if not LLM_CACHE_ENABLED:
+        return False
+    last_user = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    if not last_user:
+        return False
+    return not DATA_DEPENDENT_PATTERN.search(last_user)
+
+
+# --- Conversation-scoped memo of read-tool results ---
+# Set per request to the chat session id; reads outside a session are never memoised
+memo_session = contextvars.ContextVar('memo_session', default=None)
+
+# Read tools whose results describe one candidate; everything else memoised is an aggregate
+# (lists, lookups, metrics) that any write can change
+CANDIDATE_TOOLS = {'get_candidate'}
+
+
+class ToolMemo:
+    # Results of read tools per (session, user), with a short TTL. A write to a candidate drops
+    # that candidate's entries and every aggregate entry across all sessions, and a read that was
+    # in flight while any write completed is not stored, so a write never leaves stale data behind.
+
+    def __init__(self, maxsize=TOOL_MEMO_SIZE, ttl=TOOL_MEMO_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.generation = 0  # bumped by every write
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def scope(auth_token):
+        session_id = memo_session.get()
+        if not TOOL_MEMO_ENABLED or not session_id:
+            return None
+        user = hashlib.sha256(str(auth_token or '').encode('utf-8')).hexdigest()[:16]
+        return f'{session_id}:{user}'
+
+    @staticmethod
+    def key(scope, tool, args):
+        return (scope, tool, json.dumps(args, sort_keys=True, default=str))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_candidate(self, candidate_id):
+        candidate_args = json.dumps({'candidate_id': str(candidate_id)}, sort_keys=True)
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries
+                     if key[1] not in CANDIDATE_TOOLS or key[2] == candidate_args]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': TOOL_MEMO_ENABLED,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+tool_memo = ToolMemo()
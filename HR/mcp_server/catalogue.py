@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import httpx
+from singleflight import AsyncSingleFlight
+from metrics import AsyncInstrumentedTransport
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_MODELS_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1').rstrip('/') + '/models'
+MODEL_CATALOGUE_TTL = float(os.getenv('MODEL_CATALOGUE_TTL', '600'))
+MODEL_CATALOGUE_STALE_TTL = float(os.getenv('MODEL_CATALOGUE_STALE_TTL', '86400'))
+MODEL_CATALOGUE_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# Known tool-capable models; used until the catalogue has been fetched and for models it does not list
+FUNCTION_CALLING_MODELS = {
+    # OpenAI
+    "openai/gpt-3.5-turbo",
+    "openai/gpt-3.5-turbo-0125",
+    "openai/gpt-3.5-turbo-1106",
+    "openai/gpt-4-turbo",
+    "openai/gpt-4-0125-preview",
+    "openai/gpt-4-1106-preview",
+    "openai/gpt-4o",
+    "openai/gpt-4",
+    # Qwen
+    "qwen/qwen1.5-110b-chat",
+    "qwen/qwen1.5-72b-chat",
+    "qwen/qwen1.5-32b-chat",
+    "qwen/qwen1.5-14b-chat",
+    "qwen/qwen1.5-7b-chat",
+    # Claude (Anthropic)
+    "anthropic/claude-3-opus-20240229",
+    "anthropic/claude-3-sonnet-20240229",
+    "anthropic/claude-3-haiku-20240307",
+    "anthropic/claude-2.1",
+    "anthropic/claude-2.0",
+    # Mistral (some variants)
+    "mistralai/mistral-large-latest",
+    "mistralai/mistral-medium",
+    "mistralai/mistral-small",
+    # Google Gemini (if available)
+    "google/gemini-pro",
+    # Cohere (if available)
+    "cohere/command-r",
+}
+
+
+# Process-wide cache of the OpenRouter model list. Fresh copies are served for `ttl`
+# seconds; after that the stale copy is still served (up to `stale_ttl`) while a
+# background task revalidates it, and the last good copy is kept if OpenRouter fails.
+class ModelCatalogue:
+    def __init__(self, url=OPENROUTER_MODELS_URL, ttl=MODEL_CATALOGUE_TTL, stale_ttl=MODEL_CATALOGUE_STALE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._snapshot = None  # {'data', 'etag', 'fetched_at', 'upstream_etag', 'model_ids', 'tool_models'}
+        # Every caller that needs a refresh (blocking or background) joins the one in flight
+        self._flight = AsyncSingleFlight('catalogue')
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    async def get(self):
+        snapshot = self._snapshot
+        age = time.time() - snapshot['fetched_at'] if snapshot else None
+        if snapshot and age < self.ttl:
+            return snapshot
+        if snapshot and age < self.stale_ttl:
+            self.refresh_in_background()
+            return snapshot
+        return await self._flight.do('refresh', self._refresh)
+
+    def refresh_in_background(self):
+        asyncio.ensure_future(self._flight.do('refresh', self._refresh))
+
+    async def _refresh(self):
+        # Runs at most once at a time (single-flight); returns the (possibly unchanged) snapshot
+        snapshot = self._snapshot
+        headers = {}
+        if snapshot and snapshot.get('upstream_etag'):
+            headers['If-None-Match'] = snapshot['upstream_etag']
+        try:
+            async with httpx.AsyncClient(timeout=MODEL_CATALOGUE_TIMEOUT,
+                                         transport=AsyncInstrumentedTransport('openrouter_models')) as client:
+                r = await client.get(self.url, headers=headers)
+            if r.status_code == 304 and snapshot:
+                self._snapshot = dict(snapshot, fetched_at=time.time())
+                return self._snapshot
+            r.raise_for_status()
+            data = r.json().get('data', [])
+        except Exception as e:
+            # Keep serving the last good copy
+            logger.warning('OpenRouter model catalogue refresh failed: %s', e)
+            return snapshot
+        body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self._snapshot = {
+            'data': data,
+            'etag': '"%s"' % hashlib.sha1(body).hexdigest(),
+            'fetched_at': time.time(),
+            'upstream_etag': r.headers.get('ETag'),
+            'model_ids': {m.get('id') for m in data},
+            'tool_models': {m.get('id') for m in data if 'tools' in (m.get('supported_parameters') or [])},
+        }
+        return self._snapshot
+
+
+catalogue = ModelCatalogue()
+
+
+def supports_function_calling(model):
+    # Driven by the cached catalogue's supported_parameters, never fetched on the request path
+    if not model:
+        return False
+    snapshot = catalogue.snapshot
+    if snapshot and model in snapshot['tool_models']:
+        return True
+    return model in FUNCTION_CALLING_MODELS
+
+
+def is_known_model(model):
+    # The model names a client can pick are arbitrary strings; only catalogued ones are trusted as labels
+    snapshot = catalogue.snapshot
+    if snapshot and model in snapshot['model_ids']:
+        return True
+    return model in FUNCTION_CALLING_MODELS
@@ -0,0 +1,191 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Prompt-side token budgets per model. These are deliberately below the models'
+# context windows: they bound cost and latency per request, not just what fits.
+MODEL_CONTEXT_BUDGETS = {
+    "openai/gpt-4o": 12000,
+    "openai/gpt-4-turbo": 12000,
+    "openai/gpt-4": 6000,
+    "openai/gpt-3.5-turbo": 8000,
+    "anthropic/claude-3": 16000,
+    "anthropic/claude-2": 12000,
+    "google/gemini": 16000,
+    "qwen/": 12000,
+    "mistralai/": 8000,
+    "cohere/": 8000,
+}
+DEFAULT_CONTEXT_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '6000'))
+# Tokens kept free for the model's reply
+RESPONSE_TOKEN_RESERVE = int(os.getenv('CONTEXT_RESPONSE_RESERVE', '1024'))
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+TRUNCATION_MARKER = '\n[... truncated to fit the context budget ...]'
+# Texts whose token counts are remembered
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv('TOKEN_COUNT_CACHE_SIZE', '4096'))
+
+
+def context_budget(model=None):
+    model = model or ''
+    if model in MODEL_CONTEXT_BUDGETS:
+        return MODEL_CONTEXT_BUDGETS[model]
+    # Longest matching prefix wins, so 'openai/gpt-4o-mini' uses the gpt-4o budget
+    matches = [prefix for prefix in MODEL_CONTEXT_BUDGETS if model.startswith(prefix)]
+    if matches:
+        return MODEL_CONTEXT_BUDGETS[max(matches, key=len)]
+    return DEFAULT_CONTEXT_BUDGET
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # OpenRouter models use many tokenizers; cl100k_base is a close enough local estimate for all of them
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # Encoding files could not be loaded (e.g. offline); fall back to the estimator
+        return None
+
+
+def tokenizer_name():
+    return 'tiktoken:cl100k_base' if _encoding() else 'estimate'
+
+
+_token_counts = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+def _count(text):
+    encoding = _encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def count_tokens(text):
+    # The same history is re-counted on every turn of a conversation, so counts are remembered,
+    # keyed on a digest of the text rather than the text so large pastes are not kept alive
+    if not text:
+        return 0
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+    count = _count(text)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        while len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+
+def message_tokens(message):
+    return count_tokens(message.get('content') or '') + MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text, max_tokens):
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_tokens = max(max_tokens - count_tokens(TRUNCATION_MARKER), 0)
+    encoding = _encoding()
+    if encoding:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        head = text[:max_tokens * 4]
+    return head + TRUNCATION_MARKER
+
+
+def conversation_turns(messages):
+    # User/assistant turns only; system prompts are re-sent every request
+    return [m for m in messages if m.get('role') != 'system']
+
+
+# Pack system prompts, session summary and the newest turns into the model's token budget.
+# The latest turn is always kept: older turns go first, then the summary, and the system
+# prompts are cut before the latest turn loses more than half the budget.
+# Returns (history, usage) where usage reports the token counts that were used.
+def assemble_context(messages, model=None, prompt=None, summary=None):
+    messages = messages or []
+    budget = context_budget(model) - RESPONSE_TOKEN_RESERVE
+    # Our own prompt first, then whatever the client sent; neither replaces the other
+    system_texts = [prompt] + [m.get('content') for m in messages if m.get('role') == 'system']
+    turns = conversation_turns(messages)
+    latest = turns[-1] if turns else None
+    truncated = False
+
+    history = []
+    system_tokens = 0
+    system_room = budget - min(message_tokens(latest), budget // 2) if latest else budget
+    for text in dict.fromkeys(system_texts):
+        if not text:
+            continue
+        content = truncate_to_tokens(text, system_room - system_tokens - MESSAGE_OVERHEAD)
+        if not content:
+            truncated = True
+            break
+        truncated = truncated or content != text
+        system_tokens += count_tokens(content) + MESSAGE_OVERHEAD
+        history.append({"role": "system", "content": content})
+
+    # The latest turn gets everything the system prompts left, and is cut only if that is not enough
+    latest_tokens = 0
+    if latest:
+        room = budget - system_tokens
+        if message_tokens(latest) > room:
+            latest = dict(latest, content=truncate_to_tokens(latest.get('content') or '', room - MESSAGE_OVERHEAD))
+            truncated = True
+        latest_tokens = message_tokens(latest)
+    earlier = turns[:-1]
+
+    # Turns already folded into the stored session summary are replaced by it
+    summary_tokens = 0
+    covered = summary.get('summarized_message_count', 0) if summary else 0
+    if summary and summary.get('summary') and covered <= len(turns):
+        earlier = earlier[covered:]
+        remaining = budget - system_tokens - latest_tokens - MESSAGE_OVERHEAD
+        summary_text = truncate_to_tokens(f"Summary of the earlier conversation:\n{summary['summary']}", remaining // 2)
+        if summary_text:
+            summary_tokens = count_tokens(summary_text) + MESSAGE_OVERHEAD
+            history.append({"role": "system", "content": summary_text})
+
+    # Older turns, newest first, stopping at the first one that no longer fits
+    remaining = budget - system_tokens - summary_tokens - latest_tokens
+    recent = []
+    for msg in reversed(earlier):
+        tokens = message_tokens(msg)
+        if tokens > remaining:
+            break
+        recent.append(msg)
+        remaining -= tokens
+    recent.reverse()
+    if latest:
+        recent.append(latest)
+    history.extend(recent)
+
+    history_tokens = sum(message_tokens(m) for m in recent)
+    usage = {
+        'model': model,
+        'budget': budget,
+        'system_tokens': system_tokens,
+        'summary_tokens': summary_tokens,
+        'history_tokens': history_tokens,
+        'prompt_tokens': system_tokens + summary_tokens + history_tokens,
+        'turns_included': len(recent),
+        'turns_dropped': len(earlier) + (1 if latest else 0) - len(recent),
+        'truncated': truncated,
+        'tokenizer': tokenizer_name(),
+    }
+    return history, usage
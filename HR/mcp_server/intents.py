@@ -0,0 +1,147 @@
+import os
+import re
+from collections import namedtuple
+
+# Intents at or above this confidence are answered straight from the tools, for every model
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '0.85'))
+# Models without tool calling cannot do better than the router, so they accept weaker matches
+INTENT_FALLBACK_THRESHOLD = float(os.getenv('INTENT_FALLBACK_THRESHOLD', '0.5'))
+
+Intent = namedtuple('Intent', 'name confidence args')
+# Changes data: only ever matched against the whole message, and left to the agent (which can ask
+# what was meant) whenever the model can call tools itself
+WRITE_INTENTS = {'update_stage', 'update_field', 'delete_candidate'}
+# The pipeline stages the frontend knows; anything else is not a stage the router will write
+STAGES = ('applied', 'screening', 'technical', 'interview', 'offer', 'hired', 'rejected')
+
+# Politeness and punctuation around a command do not make it less of a command
+_FILLER = re.compile(
+    r'^(?:(?:please|pls|kindly|ok(?:ay)?|so|now|can you|could you|would you|will you|i want to|i\'d like to)[\s,]+)*'
+    r'(.*?)(?:[\s,]+please)?[\s?.!]*$',
+    re.IGNORECASE | re.DOTALL,
+)
+_SPACES = re.compile(r'\s+')
+# How a write command starts; see route()
+_WRITE_VERB = re.compile(r'(?:update|set|change|move|delete|remove)\b', re.IGNORECASE)
+
+_VERB = r'(?:show|get|display|fetch|view|open|give|pull up|find|search(?: for)?|look ?up)(?: me)?(?: the)?'
+_CID = r'(?:id |number |no\.? ?|#)?(\d+)'
+# A few words of a name, email, phone or stage; stops at connectives so "jane smith and her cv" gives "jane smith"
+_WORD = r"(?!(?:and|or|with|who|that|for|in|on|from|to|about|is|has|his|her|their|details|profile|info|stage)\b)[\w.+\-@']+"
+_WORDS = '(' + _WORD + '(?: ' + _WORD + '){0,3})'
+_STAGE = '(' + '|'.join(STAGES) + ')'
+# What the dashboard metrics are about; "metrics" alone may be about anything
+_METRIC = r'(?:metrics|analytics|statistics|stats|overview|report|summary)'
+_SUBJECT = r'(?:candidates?|applicants?|pipeline|dashboard|recruitment|recruiting|hiring)'
+# Words that follow "candidate" without being a name ("candidate details", "candidate with ...")
+_NOT_A_NAME = {
+    'details', 'detail', 'info', 'information', 'profile', 'list', 'data', 'metrics', 'analytics', 'stats',
+    'statistics', 'stage', 'stages', 'status', 'pipeline', 'who', 'that', 'which', 'with', 'for', 'from',
+    'in', 'to', 'is', 'are', 'was', 'has', 'have', 'by', 'evaluation', 'interview', 'questions', 'experience',
+}
+
+
+def _stage(m):
+    return {'candidate_id': m.group(1), 'stage': m.group(2).lower()}
+
+
+def _field(m):
+    return {'candidate_id': m.group(1), 'field': m.group(2).lower(), 'value': m.group(3)}
+
+
+def _candidate_id(m):
+    return {'candidate_id': m.group(1)}
+
+
+def _query(m):
+    query = m.group(1).strip()
+    if query.endswith("'s"):
+        query = query[:-2]
+    # "candidate 42 a good fit" is about candidate 42: leave it to get_candidate
+    if not query or query.split()[0].lower() in _NOT_A_NAME or query.split()[0].isdigit():
+        return None
+    return {'query': query}
+
+
+def _none(m):
+    return {}
+
+
+# (intent, pattern, weight, builder, fullmatch_only). Patterns are compiled once at import; the most
+# specific rules come first so they win ties.
+_RULES = [
+    ('greeting', r'(?:hi|hello|hey|greetings|good (?:morning|afternoon|evening))(?: there)?', 1.0, _none, True),
+    ('update_stage',
+     r'(?:update|set|change|move) (?:the )?(?:stage|status) of candidate ' + _CID + r' (?:to|as) ' + _STAGE + '(?: stage)?',
+     0.95, _stage, True),
+    ('update_stage',
+     r'(?:update|set|change|move) candidate ' + _CID + r'(?:\'s)? (?:stage|status) (?:to|as) ' + _STAGE + '(?: stage)?',
+     0.95, _stage, True),
+    ('update_field',
+     r'(?:update|set|change) candidate ' + _CID + r'(?:\'s)? (email|phone)(?: number| address)? (?:to|as) (\S+)',
+     0.95, _field, True),
+    ('delete_candidate', r'(?:delete|remove) candidate ' + _CID, 0.9, _candidate_id, True),
+    ('get_candidate',
+     r'(?:' + _VERB + r' )?(?:(?:details|profile|info) (?:of|for|on) )?candidate ' + _CID + r'(?:\'s)?(?: details| profile| info)?',
+     0.97, _candidate_id, False),
+    ('list_candidates', r'(?:list|show|display|get|view|find)(?: me)?(?: all)?(?: the)? candidates', 0.95, _none, False),
+    ('metrics',
+     r'(?:' + _VERB + r' )?(?:candidate |hiring |recruitment |pipeline )?(?:metrics|analytics|statistics|stats)'
+     r'(?: overview| summary| report)?',
+     0.95, _none, True),
+    # Inside a longer question, only when it says what the metrics are of
+    ('metrics', r'\b' + _SUBJECT + ' ' + _METRIC + r'\b', 0.9, _none, False),
+    ('metrics', r'\b' + _METRIC + r' (?:of|for|on|from) (?:the |our |all )?(?:candidates?|applicants?|pipeline|dashboard)\b',
+     0.9, _none, False),
+    ('find_candidate',
+     r'(?:' + _VERB + r' )?candidate(?: named| called| with (?:the )?(?:name|email|phone(?: number)?))? '
+     + _WORDS + r"(?:'s)?(?: details| profile| info)?",
+     0.9, _query, False),
+]
+_COMPILED = [(name, re.compile(pattern, re.IGNORECASE), weight, build, full) for name, pattern, weight, build, full in _RULES]
+
+
+def route(message):
+    # Best-scoring intent for a chat message, or None. A rule matching the whole (de-filled)
+    # message scores its full weight; a match inside a longer message is scaled down by how
+    # much of the message it covers, so "candidate 42" buried in a question is a weak signal.
+    core = _SPACES.sub(' ', _FILLER.match(message or '').group(1))
+    if not core:
+        return None
+    best = None
+    for name, pattern, weight, build, full in _COMPILED:
+        if best is not None and weight <= best.confidence:
+            continue
+        m = pattern.fullmatch(core)
+        coverage = 1.0
+        if m is None:
+            if full:
+                continue
+            m = pattern.search(core)
+            if m is None:
+                continue
+            coverage = (m.end() - m.start()) / len(core)
+        args = build(m)
+        if args is None:
+            continue
+        confidence = round(weight * (0.5 + 0.5 * coverage), 3)
+        if best is None or confidence > best.confidence:
+            best = Intent(name, confidence, args)
+    # A write the rules cannot parse in full ("... to rejected because ...") is for the model, not
+    # for a read rule that happens to match part of it
+    if best is not None and best.name not in WRITE_INTENTS and _WRITE_VERB.match(core):
+        return None
+    return best
+
+
+def accepts(intent, function_calling):
+    # Whether the router's answer should be used instead of the LLM for this model
+    if intent is None:
+        return False
+    if intent.name in WRITE_INTENTS and function_calling:
+        return False
+    if function_calling or intent.name in WRITE_INTENTS:
+        threshold = INTENT_CONFIDENCE_THRESHOLD
+    else:
+        threshold = INTENT_FALLBACK_THRESHOLD
+    return intent.confidence >= threshold
@@ -1,12 +1,30 @@
-from fastapi import FastAPI, Request, APIRouter, Depends
+import log
+# First, so messages logged while the other modules load go through the queue too
+log.setup(loggers=('uvicorn', 'uvicorn.error', 'uvicorn.access'))
+from fastapi import FastAPI, Request, APIRouter, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from agent import run_agent
-import requests
-import os
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from agent import run_agent, stream_agent, text_chunks
+from memory import aload_session_summary, refresh_session_summary
+from cache import response_cache, tool_memo, memo_session
+from catalogue import catalogue, supports_function_calling
+from intents import route, accepts
+from providers import providers
+import singleflight
+import metrics
+import tracing
+from tracing_middleware import TracingMiddleware
+import profiling
+import httpx
+import json
+import logging
 from typing import List, Optional, Dict
-import re
-from tools import get_candidate, list_candidates, get_candidate_metrics, format_candidate, format_candidate_list
+from tools import DJANGO_API, aget_candidate, alist_candidates, afind_candidates, aget_candidate_metrics, aupdate_candidate, adelete_candidate, get_async_client, close_async_client, format_candidate, format_candidate_list
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -17,6 +35,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Profiles single requests on demand (X-Profile header or PUT /profiling)
+app.add_middleware(profiling.ProfilingMiddleware)
+# Root span per request; continues the caller's trace from its traceparent header
+app.add_middleware(TracingMiddleware)
+# Added last so it is the outermost layer: CORS preflights and streamed bodies are timed too
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event('startup')
+async def startup():
+    # Warm the model catalogue so function-calling detection is data-driven from the first request
+    catalogue.refresh_in_background()
+
+@app.on_event('shutdown')
+async def shutdown():
+    await close_async_client()
 
 class Message(BaseModel):
     role: str
@@ -31,185 +64,101 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     prompt: Optional[str] = None
 
-GREETINGS = {"hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening"}
-
-def is_greeting(message: str) -> bool:
-    return message.strip().lower() in GREETINGS
-
-# List of models that support OpenAI-style function calling
-FUNCTION_CALLING_MODELS = {
-    # OpenAI
-    "openai/gpt-3.5-turbo",
-    "openai/gpt-3.5-turbo-0125",
-    "openai/gpt-3.5-turbo-1106",
-    "openai/gpt-4-turbo",
-    "openai/gpt-4-0125-preview",
-    "openai/gpt-4-1106-preview",
-    "openai/gpt-4o",
-    "openai/gpt-4",
-    # Qwen
-    "qwen/qwen1.5-110b-chat",
-    "qwen/qwen1.5-72b-chat",
-    "qwen/qwen1.5-32b-chat",
-    "qwen/qwen1.5-14b-chat",
-    "qwen/qwen1.5-7b-chat",
-    # Claude (Anthropic)
-    "anthropic/claude-3-opus-20240229",
-    "anthropic/claude-3-sonnet-20240229",
-    "anthropic/claude-3-haiku-20240307",
-    "anthropic/claude-2.1",
-    "anthropic/claude-2.0",
-    # Mistral (some variants)
-    "mistralai/mistral-large-latest",
-    "mistralai/mistral-medium",
-    "mistralai/mistral-small",
-    # Google Gemini (if available)
-    "google/gemini-pro",
-    # Cohere (if available)
-    "cohere/command-r",
-    # Add more as OpenRouter adds support
-}
-
-def extract_candidate_id(message):
-    match = re.search(r'candidate\s*(\d+)', message.lower())
-    if match:
-        return match.group(1)
-    return None
-
-# Enhanced: extract candidate name or email from message
-def extract_candidate_name_or_email(message):
-    # Example: 'Show me candidate Jane Smith' or 'Find candidate janesmith@example.com'
-    match = re.search(r'candidate(?: named| called)? ([a-zA-Z ]+)', message.lower())
-    if match:
-        return match.group(1).strip()
-    email_match = re.search(r'candidate.*?([\w\.-]+@[\w\.-]+)', message)
-    if email_match:
-        return email_match.group(1)
-    return None
-
-# Detect list candidates queries
-def is_list_candidates_query(message):
-    return bool(re.search(r'list( all)? candidates|show( me)? candidates|display( all)? candidates|find( all)? candidates', message.lower()))
-
-# Detect analytics/metrics queries
-def is_analytics_query(message):
-    return bool(re.search(r'analytics|metrics|statistics|summary|report|overview', message.lower()))
-
-# Detect update candidate status queries
-UPDATE_STATUS_PATTERNS = [
-    r'update (?:the )?stage of candidate (\d+) to ([a-zA-Z ]+)',
-    r'update candidate (\d+) stage to ([a-zA-Z ]+)',
-    r'set candidate (\d+) stage as ([a-zA-Z ]+)',
-    r'change stage of candidate (\d+) to ([a-zA-Z ]+)',
-    r'update candidate (\d+) status to ([a-zA-Z ]+)',
-    r'set candidate (\d+) status as ([a-zA-Z ]+)',
-    r'change status of candidate (\d+) to ([a-zA-Z ]+)',
-]
-def extract_update_candidate_status(message):
-    for pat in UPDATE_STATUS_PATTERNS:
-        match = re.search(pat, message.lower())
-        if match:
-            return match.group(1), match.group(2).strip()
-    return None, None
-
-# Detect delete candidate queries
-def extract_delete_candidate(message):
-    match = re.search(r'delete candidate (\d+)', message.lower())
-    if match:
-        return match.group(1)
-    return None
-
-# Detect update candidate email/phone queries
-def extract_update_candidate_field(message):
-    # Example: 'update candidate 12 email to new@email.com'
-    match = re.search(r'update candidate (\d+) (email|phone) to ([^ ]+)', message.lower())
-    if match:
-        return match.group(1), match.group(2), match.group(3)
-    return None, None, None
-
 router = APIRouter()
 
-DJANGO_API = 'http://localhost:8000/api'
+# --- Async pass-through proxy for chat history ---
+# Bodies are streamed through the shared keep-alive pool; each upstream has its own timeout.
+PROXY_TIMEOUTS = {
+    'chatsessions': httpx.Timeout(5.0, connect=2.0),
+    'chatmessages': httpx.Timeout(10.0, connect=2.0),
+}
+# Content-Length is passed on so a streamed request body is not sent chunked (WSGI servers need the length)
+PROXY_REQUEST_HEADERS = {'authorization', 'content-type', 'content-length', 'accept', 'accept-encoding', 'if-none-match', 'if-modified-since'}
+PROXY_RESPONSE_HEADERS = {'content-type', 'content-encoding', 'content-length', 'cache-control', 'etag', 'last-modified', 'expires', 'vary'}
+
+async def proxy_to_django(request: Request, path: str, upstream: str):
+    headers = {k: v for k, v in request.headers.items() if k.lower() in PROXY_REQUEST_HEADERS}
+    has_body = 'content-length' in request.headers or 'transfer-encoding' in request.headers
+    client = get_async_client()
+    upstream_request = client.build_request(
+        request.method,
+        f'{DJANGO_API}/{path}',
+        params=request.query_params,
+        headers=headers,
+        content=request.stream() if has_body else None,
+        timeout=PROXY_TIMEOUTS[upstream],
+    )
+    try:
+        r = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        return JSONResponse({'detail': f'Upstream {upstream} timed out.'}, status_code=504)
+    except httpx.HTTPError as e:
+        return JSONResponse({'detail': f'Upstream {upstream} unavailable: {e.__class__.__name__}.'}, status_code=502)
+    response_headers = {k: v for k, v in r.headers.items() if k.lower() in PROXY_RESPONSE_HEADERS}
+    return StreamingResponse(
+        r.aiter_raw(),
+        status_code=r.status_code,
+        headers=response_headers,
+        background=BackgroundTask(r.aclose),
+    )
 
 @router.get('/chatsessions/')
-def proxy_get_chat_sessions(request: Request):
-    token = request.headers.get('Authorization')
-    r = requests.get(f'{DJANGO_API}/chatsessions/', headers={'Authorization': token} if token else {})
-    return r.json()
+async def proxy_get_chat_sessions(request: Request):
+    return await proxy_to_django(request, 'chatsessions/', 'chatsessions')
 
 @router.post('/chatsessions/')
 async def proxy_create_chat_session(request: Request):
-    token = request.headers.get('Authorization')
-    data = await request.json()
-    r = requests.post(f'{DJANGO_API}/chatsessions/', json=data, headers={'Authorization': token} if token else {})
-    return r.json()
+    return await proxy_to_django(request, 'chatsessions/', 'chatsessions')
 
 @router.delete('/chatsessions/{session_id}/')
-def proxy_delete_chat_session(session_id: int, request: Request):
-    token = request.headers.get('Authorization')
-    r = requests.delete(f'{DJANGO_API}/chatsessions/{session_id}/', headers={'Authorization': token} if token else {})
-    return r.json()
+async def proxy_delete_chat_session(session_id: int, request: Request):
+    return await proxy_to_django(request, f'chatsessions/{session_id}/', 'chatsessions')
 
 @router.get('/chatmessages/')
-def proxy_get_chat_messages(session: int, request: Request):
-    token = request.headers.get('Authorization')
-    r = requests.get(f'{DJANGO_API}/chatmessages/?session={session}', headers={'Authorization': token} if token else {})
-    return r.json()
+async def proxy_get_chat_messages(session: int, request: Request):
+    return await proxy_to_django(request, 'chatmessages/', 'chatmessages')
 
 @router.post('/chatmessages/')
 async def proxy_create_chat_message(request: Request):
-    token = request.headers.get('Authorization')
-    data = await request.json()
-    r = requests.post(f'{DJANGO_API}/chatmessages/', json=data, headers={'Authorization': token} if token else {})
-    return r.json()
+    return await proxy_to_django(request, 'chatmessages/', 'chatmessages')
 
 @router.delete('/chatmessages/{msg_id}/')
-def proxy_delete_chat_message(msg_id: int, request: Request):
-    token = request.headers.get('Authorization')
-    r = requests.delete(f'{DJANGO_API}/chatmessages/{msg_id}/', headers={'Authorization': token} if token else {})
-    return r.json()
+async def proxy_delete_chat_message(msg_id: int, request: Request):
+    return await proxy_to_django(request, f'chatmessages/{msg_id}/', 'chatmessages')
 
-# In your FastAPI app, include these routes:
-# app.include_router(router, prefix="/proxy")
+app.include_router(router, prefix="/proxy")
 
-@app.post('/chat')
-async def chat_endpoint(body: ChatRequest):
-    print("[MCP /chat] Full request body:", body)
+# Enhanced system prompt for strict tool use, greetings, and proactive behavior
+DEFAULT_PROMPT = (
+    "You are HR Assistant Pro, a friendly, proactive, and highly capable AI HR assistant.\n"
+    "- Absolutely never list example topics, bullet points, or suggestions in your greeting or first message. Only greet and offer help, nothing else.\n"
+    "- If the user greets you (e.g., says 'hi', 'hello', 'hey'), reply with a warm, simple greeting.\n"
+    "- When greeting the user, do NOT list example topics or suggestions (such as candidate evaluation frameworks, interview questions, job description templates, compliance, onboarding, etc.). Only greet and offer help.\n"
+    "- If the user asks for candidate details, analytics, or CRUD actions (e.g., 'Show me candidate 123', 'List all candidates', 'Update candidate status'), you MUST use your available tools to fetch or update data.\n"
+    "- NEVER make up candidate details or analytics.\n"
+    "- If the tool returns no result, say so clearly (e.g., 'No candidate found with that ID.').\n"
+    "- If the user asks for analytics or metrics, use your analytics tools.\n"
+    "- If the user asks a general HR question, answer conversationally and helpfully.\n"
+    "- If a tool fails or returns an error, explain the issue clearly and suggest next steps.\n"
+    "- Always be clear, concise, and supportive.\n"
+    "- If you need more information to complete a tool call, ask the user for clarification.\n"
+    "- Example: If the user says 'Show me candidate 123', call the get_candidate tool with ID 123 and return the result.\n"
+    "- Example: If the user says 'List all candidates', call the list_candidates tool and return the list.\n"
+    "- Example: If the user says 'Find Jane Smith', call the find_candidates tool with 'Jane Smith'.\n"
+    "- Example: If the user says 'hi', reply with 'Hello! How can I help you today?'\n"
+    "- If the user asks for something you cannot do, politely explain the limitation."
+)
+
+def get_user_message(body: ChatRequest) -> str:
     user_message = body.message or ''
     if body.messages:
         for m in reversed(body.messages):
             if m.role == 'user' and m.content:
                 user_message = m.content
                 break
-    if not user_message:
-        return {"response": {"success": False, "message": "No message provided."}}
-    # Rule-based greeting
-    if is_greeting(user_message):
-        return {'response': "Hello! How can I help you today?"}
-    session_id = body.session_id
-    model = body.model
-    auth_token = body.authToken
-    page = body.page
-    # Enhanced system prompt for strict tool use, greetings, and proactive behavior
-    prompt = body.prompt or (
-        "You are HR Assistant Pro, a friendly, proactive, and highly capable AI HR assistant.\n"
-        "- Absolutely never list example topics, bullet points, or suggestions in your greeting or first message. Only greet and offer help, nothing else.\n"
-        "- If the user greets you (e.g., says 'hi', 'hello', 'hey'), reply with a warm, simple greeting.\n"
-        "- When greeting the user, do NOT list example topics or suggestions (such as candidate evaluation frameworks, interview questions, job description templates, compliance, onboarding, etc.). Only greet and offer help.\n"
-        "- If the user asks for candidate details, analytics, or CRUD actions (e.g., 'Show me candidate 123', 'List all candidates', 'Update candidate status'), you MUST use your available tools to fetch or update data.\n"
-        "- NEVER make up candidate details or analytics.\n"
-        "- If the tool returns no result, say so clearly (e.g., 'No candidate found with that ID.').\n"
-        "- If the user asks for analytics or metrics, use your analytics tools.\n"
-        "- If the user asks a general HR question, answer conversationally and helpfully.\n"
-        "- If a tool fails or returns an error, explain the issue clearly and suggest next steps.\n"
-        "- Always be clear, concise, and supportive.\n"
-        "- If you need more information to complete a tool call, ask the user for clarification.\n"
-        "- Example: If the user says 'Show me candidate 123', call the get_candidate tool with ID 123 and return the result.\n"
-        "- Example: If the user says 'List all candidates', call the list_candidates tool and return the list.\n"
-        "- Example: If the user says 'hi', reply with 'Hello! How can I help you today?'\n"
-        "- If the user asks for something you cannot do, politely explain the limitation."
-    )
-    print("[MCP /chat] Auth token received:", auth_token)
+    return user_message
+
+def get_messages(body: ChatRequest) -> List[Dict]:
     # Convert Pydantic Message objects to dicts
     messages = []
     if body.messages:
@@ -218,68 +167,229 @@ async def chat_endpoint(body: ChatRequest):
                 messages.append(m.dict())
             else:
                 messages.append(m)
-    else:
-        messages = []
-    # Hybrid tool-calling logic for non-function-calling models
-    if model not in FUNCTION_CALLING_MODELS:
-        candidate_id = extract_candidate_id(user_message)
-        if candidate_id:
-            result = get_candidate(candidate_id, auth_token=auth_token)
-            if result:
-                return {'response': format_candidate(result)}
-            else:
-                return {'response': f'No candidate found with ID {candidate_id}.'}
-        candidate_name_or_email = extract_candidate_name_or_email(user_message)
-        if candidate_name_or_email:
-            all_candidates = list_candidates(page=1, auth_token=auth_token)
-            filtered = [c for c in all_candidates.get('results', []) if candidate_name_or_email.lower() in (c.get('first_name', '').lower() + ' ' + c.get('last_name', '').lower() + c.get('email', '').lower())]
-            if filtered:
-                return {'response': format_candidate_list(filtered)}
-            else:
-                return {'response': f'No candidate found matching "{candidate_name_or_email}".'}
-        if is_list_candidates_query(user_message):
-            result = list_candidates(page=1, auth_token=auth_token)
-            if result:
-                return {'response': format_candidate_list(result.get('results', []))}
-            else:
-                return {'response': 'No candidates found.'}
-        if is_analytics_query(user_message):
-            result = get_candidate_metrics(auth_token=auth_token)
-            if result:
-                return {'response': str(result)}
-            else:
-                return {'response': 'No analytics data found.'}
-        update_id, new_status = extract_update_candidate_status(user_message)
-        if update_id and new_status:
-            # Always update the 'candidate_stage' field for stage/status updates
-            from tools import update_candidate
-            update_result = update_candidate(update_id, 'candidate_stage', new_status, auth_token=auth_token)
-            if update_result.get('success'):
-                return {'response': f'Candidate {update_id} stage updated to {new_status}.'}
-            else:
-                return {'response': update_result.get('message', 'Failed to update candidate stage.')}
-        delete_id = extract_delete_candidate(user_message)
-        if delete_id:
-            from tools import delete_candidate
-            delete_result = delete_candidate(delete_id, auth_token=auth_token)
-            if delete_result.get('success'):
-                return {'response': f'Candidate {delete_id} deleted successfully.'}
-            else:
-                return {'response': delete_result.get('message', 'Failed to delete candidate.')}
-        update_id, field, value = extract_update_candidate_field(user_message)
-        if update_id and field and value:
-            from tools import update_candidate
-            update_result = update_candidate(update_id, field, value, auth_token=auth_token)
-            if update_result.get('success'):
-                return {'response': f'Candidate {update_id} {field} updated to {value}.'}
-            else:
-                return {'response': update_result.get('message', f'Failed to update candidate {field}.')}
+    return messages
+
+# Rule-based answers that skip the LLM; returns None when the agent should handle the message
+async def fast_path_response(user_message, model=None, auth_token=None, page=1, usage=None, session_id=None) -> Optional[str]:
+    # Deterministic intent router: confident data queries go straight to the tools for every
+    # model; models without tool calling also get the router's weaker guesses
+    with tracing.span('intent.route') as span:
+        intent = route(user_message)
+        if intent:
+            span.set(intent=intent.name, confidence=intent.confidence)
+    if not accepts(intent, supports_function_calling(model)):
+        return None
+    if usage is not None:
+        usage.update({'fast_path': True, 'intent': intent.name, 'confidence': intent.confidence})
+    # Tool reads are memoised per chat session
+    session_ctx = memo_session.set(session_id)
+    try:
+        with tracing.span('fast_path', intent=intent.name):
+            return await run_intent(intent, auth_token=auth_token, page=page)
+    finally:
+        memo_session.reset(session_ctx)
+
+async def run_intent(intent, auth_token=None, page=1) -> Optional[str]:
+    args = intent.args
+    if intent.name == 'greeting':
+        return "Hello! How can I help you today?"
+    if intent.name == 'get_candidate':
+        result = await aget_candidate(args['candidate_id'], auth_token=auth_token)
+        if result and result.get('success') is not False:
+            return format_candidate(result)
+        return f'No candidate found with ID {args["candidate_id"]}.'
+    if intent.name == 'find_candidate':
+        # Indexed server-side lookup: correct at any table size, unlike filtering one page of results
+        matches = await afind_candidates(args['query'], auth_token=auth_token)
+        if matches.get('results'):
+            return format_candidate_list(matches['results'])
+        return f'No candidate found matching "{args["query"]}".'
+    if intent.name == 'list_candidates':
+        result = await alist_candidates(page=page or 1, auth_token=auth_token)
+        if result.get('results'):
+            return format_candidate_list(result['results'])
+        return 'No candidates found.'
+    if intent.name == 'metrics':
+        result = await aget_candidate_metrics(auth_token=auth_token)
+        if result and result.get('success') is not False:
+            return str(result)
+        return 'No analytics data found.'
+    if intent.name == 'update_stage':
+        # Always update the 'candidate_stage' field for stage/status updates
+        update_result = await aupdate_candidate(args['candidate_id'], 'candidate_stage', args['stage'], auth_token=auth_token)
+        if update_result.get('success'):
+            return f'Candidate {args["candidate_id"]} stage updated to {args["stage"]}.'
+        return update_result.get('message', 'Failed to update candidate stage.')
+    if intent.name == 'delete_candidate':
+        delete_result = await adelete_candidate(args['candidate_id'], auth_token=auth_token)
+        if delete_result.get('success'):
+            return f'Candidate {args["candidate_id"]} deleted successfully.'
+        return delete_result.get('message', 'Failed to delete candidate.')
+    if intent.name == 'update_field':
+        update_result = await aupdate_candidate(args['candidate_id'], args['field'], args['value'], auth_token=auth_token)
+        if update_result.get('success'):
+            return f'Candidate {args["candidate_id"]} {args["field"]} updated to {args["value"]}.'
+        return update_result.get('message', f'Failed to update candidate {args["field"]}.')
+    return None
+
+@app.post('/chat')
+async def chat_endpoint(body: ChatRequest, background_tasks: BackgroundTasks):
+    user_message = get_user_message(body)
+    if not user_message:
+        return {"response": {"success": False, "message": "No message provided."}}
+    session_id = body.session_id
+    model = body.model
+    auth_token = body.authToken
+    page = body.page
+    prompt = body.prompt or DEFAULT_PROMPT
+    messages = get_messages(body)
+    logger.info('Chat request', extra={'session_id': session_id, 'model': model, 'page': page,
+                                       'messages': len(messages), 'signed_in': bool(auth_token)})
+    usage = {}
+    fast_response = await fast_path_response(user_message, model, auth_token=auth_token, page=page, usage=usage, session_id=session_id)
+    if fast_response is not None:
+        count_chat_path(usage)
+        return {'response': fast_response, 'usage': usage}
     # Otherwise, use the LLM agent as before
-    response = run_agent(messages, session_id, model, auth_token=auth_token, page=page, prompt=prompt)
-    return {'response': response}
+    summary = await aload_session_summary(session_id, auth_token=auth_token)
+    # The agent and its LLM client are synchronous; run them off the event loop so other chats keep flowing
+    response = await run_in_threadpool(
+        run_agent, messages, session_id, model, auth_token=auth_token, page=page, prompt=prompt, summary=summary, usage=usage,
+    )
+    # Fold older turns into the stored session summary after the response has been sent
+    if session_id:
+        background_tasks.add_task(
+            refresh_session_summary, session_id, messages + [{'role': 'assistant', 'content': response}],
+            model=model, auth_token=auth_token, state=summary,
+        )
+    count_chat_path(usage)
+    return {'response': response, 'usage': usage}
+
+def count_chat_path(usage):
+    # fast: intent router, cache: response cache hit, agent: the LLM answered
+    if usage.get('fast_path'):
+        path = 'fast'
+    elif usage.get('cache') == 'hit':
+        path = 'cache'
+    else:
+        path = 'agent'
+    metrics.chat_paths.inc(path)
+
+def sse_event(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post('/chat/stream')
+async def chat_stream_endpoint(body: ChatRequest):
+    # Same pipeline as /chat, but tokens are forwarded as Server-Sent Events as they arrive:
+    #   event: token  data: {"content": "..."}
+    #   event: tool   data: {"name": "...", "status": "start" | "end"}
+    #   event: error  data: {"message": "..."}
+    #   event: done   data: {"usage": {...}}
+    user_message = get_user_message(body)
+    session_id = body.session_id
+    model = body.model
+    auth_token = body.authToken
+    prompt = body.prompt or DEFAULT_PROMPT
+    messages = get_messages(body)
+    # Filled while streaming; read by the summary refresh once the response has been sent
+    streamed = {'summary': None, 'parts': []}
+
+    async def event_stream():
+        if not user_message:
+            yield sse_event('error', {'message': 'No message provided.'})
+            yield sse_event('done', {'usage': {}})
+            return
+        usage = {}
+        fast_response = await fast_path_response(user_message, model, auth_token=auth_token, page=body.page, usage=usage, session_id=session_id)
+        if fast_response is not None:
+            for chunk in text_chunks(fast_response):
+                yield sse_event('token', {'content': chunk})
+            count_chat_path(usage)
+            yield sse_event('done', {'usage': usage})
+            return
+        summary = await aload_session_summary(session_id, auth_token=auth_token)
+        streamed['summary'] = summary
+        async for event in stream_agent(messages, session_id, model, auth_token=auth_token, page=body.page, prompt=prompt, summary=summary, usage=usage):
+            if event['event'] == 'token':
+                streamed['parts'].append(event['data']['content'])
+            yield sse_event(event['event'], event['data'])
+        count_chat_path(usage)
+        yield sse_event('done', {'usage': usage})
+
+    def refresh_summary():
+        # Fold older turns into the stored session summary after the response has been sent
+        if session_id and streamed['parts']:
+            response = ''.join(streamed['parts'])
+            refresh_session_summary(
+                session_id, messages + [{'role': 'assistant', 'content': response}],
+                model=model, auth_token=auth_token, state=streamed['summary'],
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        background=BackgroundTask(refresh_summary),
+    )
 
 @app.get('/models')
-def get_models():
-    r = requests.get("https://openrouter.ai/api/v1/models")
+async def get_models(request: Request):
+    snapshot = await catalogue.get()
+    if snapshot is None:
+        return JSONResponse({'models': [], 'error': 'Model catalogue unavailable.'}, status_code=502)
+    headers = {'ETag': snapshot['etag'], 'Cache-Control': f'private, max-age={int(catalogue.ttl)}'}
+    # Conditional GET: model pickers revalidate without re-downloading the catalogue
+    if request.headers.get('if-none-match') == snapshot['etag']:
+        return Response(status_code=304, headers=headers)
     # OpenRouter returns models under the 'data' key
-    return {'models': r.json().get('data', [])} 
\ No newline at end of file
+    return JSONResponse({'models': snapshot['data']}, headers=headers)
+
+@app.get('/cache/stats')
+def cache_stats(request: Request):
+    if not metrics.authorized(request):
+        return Response(status_code=403)
+    return {**response_cache.stats(), 'tools': tool_memo.stats(), 'singleflight': singleflight.stats()}
+
+@app.get('/providers/stats')
+def provider_stats(request: Request):
+    if not metrics.authorized(request):
+        return Response(status_code=403)
+    return providers.stats()
+
+@app.get('/metrics')
+def metrics_endpoint(request: Request):
+    if not metrics.authorized(request):
+        return Response(status_code=403)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get('/profiling')
+def profiling_status(request: Request):
+    if not profiling.authorized(request.headers.get('authorization')):
+        return Response(status_code=403)
+    return profiling.status()
+
+@app.put('/profiling')
+async def profiling_configure(request: Request):
+    # {"mode": "sampling", "sample_rate": 0.05, "path_prefix": "/chat", "remaining": 20}
+    if not profiling.authorized(request.headers.get('authorization')):
+        return Response(status_code=403)
+    try:
+        return profiling.configure(await request.json())
+    except ValueError as e:
+        return JSONResponse({'detail': str(e)}, status_code=400)
+
+@app.get('/profiles')
+def profiles(request: Request):
+    if not profiling.authorized(request.headers.get('authorization')):
+        return Response(status_code=403)
+    results = profiling.list_profiles()
+    return {'count': len(results), 'results': results}
+
+@app.get('/profiles/{name}')
+def profile_download(name: str, request: Request):
+    if not profiling.authorized(request.headers.get('authorization')):
+        return Response(status_code=403)
+    path = profiling.profile_path(name)
+    if path is None:
+        return JSONResponse({'detail': 'Not found.'}, status_code=404)
+    return FileResponse(path, filename=name)
@@ -0,0 +1,114 @@
+import os
+import logging
+import requests
+import httpx
+from langchain_core.messages import SystemMessage, HumanMessage
+from context import count_tokens, conversation_turns
+from agent import get_llm, DEFAULT_MODEL
+from providers import providers
+from tools import DJANGO_API, django_session, get_async_client
+
+logger = logging.getLogger(__name__)
+
+# Summarise once the unsummarised part of a conversation grows past this many tokens
+SUMMARY_TOKEN_THRESHOLD = int(os.getenv('SUMMARY_TOKEN_THRESHOLD', '2000'))
+# Most recent turns that are always sent verbatim and never folded into the summary
+SUMMARY_KEEP_RECENT = int(os.getenv('SUMMARY_KEEP_RECENT', '6'))
+# Optional cheaper model for summarisation; defaults to the session's chat model
+SUMMARY_MODEL = os.getenv('SUMMARY_MODEL')
+
+EMPTY_SUMMARY = {'summary': '', 'summarized_message_count': 0}
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between an HR user and HR Assistant Pro.\n"
+    "Merge the existing summary with the new turns into a single concise summary.\n"
+    "- Keep names, candidate IDs, stages, decisions, open questions and user preferences.\n"
+    "- Drop greetings, filler and anything already resolved.\n"
+    "- Write plain prose, at most 200 words. Output only the summary."
+)
+
+
+def _headers(auth_token):
+    return {"Authorization": f"Token {auth_token}"} if auth_token else {}
+
+
+def load_session_summary(session_id, auth_token=None):
+    if not session_id:
+        return dict(EMPTY_SUMMARY)
+    try:
+        r = django_session.get(f'{DJANGO_API}/chatsessions/{session_id}/summary/', headers=_headers(auth_token), timeout=5)
+        if r.status_code == 200:
+            data = r.json()
+            return {
+                'summary': data.get('summary') or '',
+                'summarized_message_count': data.get('summarized_message_count') or 0,
+            }
+    except requests.RequestException as e:
+        logger.warning("Could not load summary for session %s: %s", session_id, e)
+    return dict(EMPTY_SUMMARY)
+
+
+async def aload_session_summary(session_id, auth_token=None):
+    # Same as load_session_summary, on the shared async pool so /chat never blocks the event loop
+    if not session_id:
+        return dict(EMPTY_SUMMARY)
+    try:
+        r = await get_async_client().get(f'{DJANGO_API}/chatsessions/{session_id}/summary/', headers=_headers(auth_token))
+        if r.status_code == 200:
+            data = r.json()
+            return {
+                'summary': data.get('summary') or '',
+                'summarized_message_count': data.get('summarized_message_count') or 0,
+            }
+    except httpx.HTTPError as e:
+        logger.warning("Could not load summary for session %s: %s", session_id, e)
+    return dict(EMPTY_SUMMARY)
+
+
+def save_session_summary(session_id, summary, summarized_message_count, auth_token=None):
+    try:
+        r = django_session.put(
+            f'{DJANGO_API}/chatsessions/{session_id}/summary/',
+            json={'summary': summary, 'summarized_message_count': summarized_message_count},
+            headers=_headers(auth_token),
+            timeout=5,
+        )
+        # 409 means another worker already stored a newer summary
+        return r.status_code == 200
+    except requests.RequestException as e:
+        logger.warning("Could not save summary for session %s: %s", session_id, e)
+        return False
+
+
+def summarise_turns(previous_summary, turns, model=None):
+    transcript = '\n'.join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in turns)
+    request = f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    messages = [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=request)]
+    # Background work: no hedging, but the same breakers and fallbacks as chat
+    response = providers.invoke(messages, SUMMARY_MODEL or model or DEFAULT_MODEL, get_llm, hedge=False)
+    return (response.content or '').strip()
+
+
+def refresh_session_summary(session_id, messages, model=None, auth_token=None, state=None):
+    # Runs as a background task after the chat response has been sent
+    if not session_id:
+        return
+    state = state or load_session_summary(session_id, auth_token)
+    turns = conversation_turns(messages)
+    covered = state['summarized_message_count']
+    if covered > len(turns):
+        # Client history is shorter than what the summary covers (e.g. cleared chat); start over
+        state, covered = dict(EMPTY_SUMMARY), 0
+    unsummarised = turns[covered:]
+    if sum(count_tokens(m.get('content', '')) for m in unsummarised) < SUMMARY_TOKEN_THRESHOLD:
+        return
+    to_fold = unsummarised[:-SUMMARY_KEEP_RECENT] if SUMMARY_KEEP_RECENT else unsummarised
+    if not to_fold:
+        return
+    try:
+        summary = summarise_turns(state['summary'], to_fold, model=model)
+    except Exception as e:
+        logger.warning("Summarisation failed for session %s: %s", session_id, e)
+        return
+    if summary:
+        save_session_summary(session_id, summary, covered + len(to_fold), auth_token=auth_token)
@@ -0,0 +1,146 @@
+import os
+import time
+import httpx
+from requests.adapters import HTTPAdapter
+import tracing
+from prometheus import CONTENT_TYPE, Counter, Histogram, Registry, allowed
+
+# In-process Prometheus metrics, rendered at /metrics. The metric types live in prometheus.py,
+# shared with the Django API; this module defines what the MCP server measures.
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# When set, /metrics and the stats endpoints require "Authorization: Bearer <token>"; when not,
+# they only answer clients on this host
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route and status.', ['method', 'route', 'status']))
+http_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to serve a request, streamed bodies included.', ['method', 'route']))
+upstream_duration = registry.register(Histogram(
+    'upstream_request_duration_seconds', 'Outgoing HTTP calls (to response headers) by service and outcome.',
+    ['service', 'outcome']))
+llm_duration = registry.register(Histogram(
+    'llm_request_duration_seconds', 'LLM calls through the provider router by model and outcome.', ['model', 'outcome']))
+llm_tokens = registry.register(Counter(
+    'llm_tokens_total', 'LLM tokens reported by the provider.', ['model', 'kind']))
+chat_paths = registry.register(Counter(
+    'chat_requests_total', 'Chat turns by the path that answered them.', ['path']))
+
+
+def _outcome(status):
+    return f'{str(status)[0]}xx'
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streamed responses (/chat/stream) are timed to their last byte
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; its path template keeps labels bounded
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            http_requests.inc(scope['method'], route, str(status['code']))
+            http_duration.observe(time.perf_counter() - start, scope['method'], route)
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+
+    def __init__(self, service, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+
+    def handle_request(self, request):
+        # Also the tracing hook: one span per call, with traceparent passed downstream
+        with tracing.span(f'{self.service} {request.method}', path=request.url.path) as span:
+            tracing.inject(request.headers)
+            start = time.perf_counter()
+            try:
+                response = super().handle_request(request)
+            except Exception:
+                upstream_duration.observe(time.perf_counter() - start, self.service, 'error')
+                raise
+            upstream_duration.observe(time.perf_counter() - start, self.service, _outcome(response.status_code))
+            span.set(status=response.status_code)
+            return response
+
+
+class AsyncInstrumentedTransport(httpx.AsyncHTTPTransport):
+
+    def __init__(self, service, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+
+    async def handle_async_request(self, request):
+        with tracing.span(f'{self.service} {request.method}', path=request.url.path) as span:
+            tracing.inject(request.headers)
+            start = time.perf_counter()
+            try:
+                response = await super().handle_async_request(request)
+            except Exception:
+                upstream_duration.observe(time.perf_counter() - start, self.service, 'error')
+                raise
+            upstream_duration.observe(time.perf_counter() - start, self.service, _outcome(response.status_code))
+            span.set(status=response.status_code)
+            return response
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    # The same for code that still uses requests
+
+    def __init__(self, service, **kwargs):
+        self.service = service
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        with tracing.span(f'{self.service} {request.method}', path=request.path_url.split('?')[0]) as span:
+            tracing.inject(request.headers)
+            start = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                upstream_duration.observe(time.perf_counter() - start, self.service, 'error')
+                raise
+            upstream_duration.observe(time.perf_counter() - start, self.service, _outcome(response.status_code))
+            span.set(status=response.status_code)
+            return response
+
+
+def observe_llm(model, seconds, outcome):
+    llm_duration.observe(seconds, model or 'unknown', outcome)
+
+
+def observe_llm_tokens(model, message):
+    # usage_metadata is LangChain's provider-neutral token count, when the provider sent one
+    usage = getattr(message, 'usage_metadata', None) or {}
+    for key, kind in (('input_tokens', 'prompt'), ('output_tokens', 'completion')):
+        if usage.get(key):
+            llm_tokens.inc(model or 'unknown', kind, amount=usage[key])
+
+
+def authorized(request):
+    forwarded = 'x-forwarded-for' in request.headers or 'forwarded' in request.headers
+    host = request.client.host if request.client is not None else None
+    return allowed(METRICS_TOKEN, request.headers.get('authorization'), host, forwarded)
+
+
+def render():
+    return registry.render()
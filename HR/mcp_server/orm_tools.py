@@ -0,0 +1,65 @@
+# In-process tool backend: runs the candidate tools against the Django ORM
+# (accounts.tool_backend) instead of HTTP calls to the Django API.
+# Enable with MCP_TOOL_BACKEND=orm; DJANGO_BACKEND_DIR points at the Django project.
+import os
+import sys
+import asyncio
+
+DJANGO_BACKEND_DIR = os.path.abspath(os.getenv('DJANGO_BACKEND_DIR', os.path.join(os.path.dirname(__file__), '..', 'backend')))
+if DJANGO_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, DJANGO_BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django
+django.setup()
+
+from django.db import close_old_connections, connection
+from accounts import tool_backend
+import tracing
+
+def _run(fn, *args, **kwargs):
+    # Tools run on worker threads outside Django's request cycle; drop stale/broken connections like a request would
+    close_old_connections()
+    try:
+        # In-process there is no Django hop to carry the trace, so the queries are traced here
+        with tracing.span(f'orm {fn.__name__}'), connection.execute_wrapper(tracing.sql_wrapper):
+            return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+def get_candidate(candidate_id, auth_token=None):
+    return _run(tool_backend.get_candidate, candidate_id, auth_token=auth_token)
+
+def delete_candidate(candidate_id, auth_token=None):
+    return _run(tool_backend.delete_candidate, candidate_id, auth_token=auth_token)
+
+def update_candidate(candidate_id, field, value, auth_token=None):
+    return _run(tool_backend.update_candidate, candidate_id, field, value, auth_token=auth_token)
+
+def get_candidate_metrics(params=None, auth_token=None):
+    return _run(tool_backend.get_candidate_metrics, params, auth_token=auth_token)
+
+def list_candidates(page=1, auth_token=None):
+    return _run(tool_backend.list_candidates, page, auth_token=auth_token)
+
+def find_candidates(query, limit=10, auth_token=None):
+    return _run(tool_backend.find_candidates, query, limit, auth_token=auth_token)
+
+# The ORM is synchronous: the async variants run it on a worker thread
+async def aget_candidate(candidate_id, auth_token=None):
+    return await asyncio.to_thread(get_candidate, candidate_id, auth_token)
+
+async def adelete_candidate(candidate_id, auth_token=None):
+    return await asyncio.to_thread(delete_candidate, candidate_id, auth_token)
+
+async def aupdate_candidate(candidate_id, field, value, auth_token=None):
+    return await asyncio.to_thread(update_candidate, candidate_id, field, value, auth_token)
+
+async def aget_candidate_metrics(params=None, auth_token=None):
+    return await asyncio.to_thread(get_candidate_metrics, params, auth_token)
+
+async def alist_candidates(page=1, auth_token=None):
+    return await asyncio.to_thread(list_candidates, page, auth_token)
+
+async def afind_candidates(query, limit=10, auth_token=None):
+    return await asyncio.to_thread(find_candidates, query, limit, auth_token)
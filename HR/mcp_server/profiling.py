@@ -0,0 +1,71 @@
+import os
+import asyncio
+import tempfile
+import profiler
+from profiler import Profiler, Switch, authorized
+
+# On-demand profiling of single requests. A request is profiled when it sends
+# "X-Profile: <mode>" with "X-Profile-Token: <PROFILING_TOKEN>", or when PUT /profiling has
+# switched on a sampled share of requests. The modes and result files are described in
+# profiler.py, shared with the Django API.
+# The event loop and the agent's worker threads are shared by concurrent requests, so sampling
+# covers every thread and memory mode the whole process while the request runs; profile on a
+# quiet worker for a clean picture. There is no deterministic (cProfile) mode here: it only sees
+# the thread that enables it.
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'hr-profiles', 'mcp_server'))
+MODES = ('sampling', 'memory')
+
+# Runtime toggle, per worker process (PUT /profiling)
+_switch = Switch(MODES)
+
+
+def configure(changes):
+    # Validates and applies a PUT /profiling body; raises ValueError with a message for the client
+    return _switch.configure(changes)
+
+
+def status():
+    return _switch.status()
+
+
+def list_profiles():
+    return profiler.list_profiles(PROFILE_DIR)
+
+
+def profile_path(name):
+    return profiler.profile_path(PROFILE_DIR, name)
+
+
+class ProfilingMiddleware:
+    # Pure ASGI so streamed responses are profiled to their last byte; X-Profile-Id names the file
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get('headers') or [])
+        mode = _switch.requested_mode(scope['path'], headers.get(b'x-profile', b'').decode('latin-1'),
+                                      headers.get(b'x-profile-token', b'').decode('latin-1'))
+        if mode is None or not _switch.busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        run = Profiler(mode, f"{scope['method']} {scope['path']}", PROFILE_DIR, every_thread=True)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', run.filename.encode())]
+            await send(message)
+
+        try:
+            run.start()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            try:
+                # Snapshot diffs and file writes stay off the event loop
+                await asyncio.to_thread(run.stop)
+            finally:
+                _switch.busy.release()
@@ -0,0 +1,418 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait, FIRST_COMPLETED
+import httpx
+from langchain_core.messages import AIMessage
+from catalogue import is_known_model, supports_function_calling
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Tried in this order (healthiest first) when the requested model fails
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv(
+    'LLM_FALLBACK_MODELS', 'qwen/qwen3-235b-a22b-07-25:free,meta-llama/llama-3.3-70b-instruct:free',
+).split(',') if m.strip()]
+# Hedging: if the primary has not answered by its p95 latency, ask the next model too and keep the first good answer
+LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'False') == 'True'
+LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '8'))  # used until a model has LATENCY_MIN_SAMPLES
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1'))
+# Circuit breaker: a 429 opens it at once; timeouts and server errors after BREAKER_THRESHOLD in a row
+BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '3'))
+BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+HF_FALLBACK_URL = "https://api-inference.huggingface.co/models/gpt2"  # Public model for fallback
+HF_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+class LatencyTracker:
+    # Rolling window of successful call durations (seconds)
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class BreakerOpen(Exception):
+    # The model's breaker refused the call; nothing was sent
+    pass
+
+
+class CircuitBreaker:
+    # closed -> open (calls skipped for `cooldown` seconds) -> half-open (one probe at a time) -> closed
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def _probing(self, now):
+        # A probe that never reported back (its task was cancelled) stops blocking after one cooldown
+        return self.probe_started is not None and now - self.probe_started < self.cooldown
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown or self._probing(now):
+            return 'open'
+        return 'half-open'
+
+    def admit(self):
+        # Whether a call may go out now. Half-open lets exactly one caller through, as the probe;
+        # the rest see the breaker as open until the probe reports back.
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.cooldown or self._probing(now):
+                return False
+            self.probe_started = now
+            return True
+
+    def release(self):
+        # The call ended without telling us anything about the model's health (a 4xx, a cancelled hedge)
+        with self._lock:
+            self.probe_started = None
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def failure(self, trip=False):
+        with self._lock:
+            self.probe_started = None
+            self.failures += 1
+            if trip or self.failures >= self.threshold or self.opened_at is not None:
+                # A failed half-open probe re-opens for another cooldown
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+
+
+def is_rate_limit(e):
+    msg = str(e).lower()
+    return getattr(e, 'status_code', None) == 429 or 'rate limit' in msg or '429' in msg or 'quota' in msg or 'limit exceeded' in msg
+
+
+def is_transient(e):
+    # Timeouts, connection errors and 5xx count towards the breaker; 4xx are the request's fault
+    status = getattr(e, 'status_code', None)
+    name = e.__class__.__name__
+    return (status is not None and status >= 500) or 'Timeout' in name or 'Connection' in name \
+        or isinstance(e, (httpx.TimeoutException, httpx.TransportError, TimeoutError))
+
+
+def _hf_message(response):
+    try:
+        result = response.json()
+    except Exception:
+        return {"role": "assistant", "content": "Sorry, I couldn't get a valid response from the backup AI service. Please try again later or check your Hugging Face API token."}
+    # Extract text from result
+    if isinstance(result, dict) and "generated_text" in result:
+        return {"role": "assistant", "content": result["generated_text"]}
+    if isinstance(result, list) and result and "generated_text" in result[0]:
+        return {"role": "assistant", "content": result[0]["generated_text"]}
+    if isinstance(result, dict) and "error" in result:
+        return {"role": "assistant", "content": f"Sorry, the backup AI service returned an error: {result['error']}"}
+    return {"role": "assistant", "content": "Sorry, the backup AI service returned an unexpected response. Please try again later."}
+
+
+def _hf_request(prompt):
+    hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
+    headers = {"Authorization": f"Bearer {hf_token}"} if hf_token else {}
+    return headers, {"inputs": prompt}
+
+
+# Last resort once every OpenRouter model has failed: Hugging Face Inference API
+def call_hf_fallback(prompt):
+    headers, data = _hf_request(prompt)
+    try:
+        with httpx.Client(timeout=HF_TIMEOUT) as client:
+            return _hf_message(client.post(HF_FALLBACK_URL, headers=headers, json=data))
+    except httpx.HTTPError:
+        return {"role": "assistant", "content": "Sorry, there was a problem contacting the backup AI service. Please try again later."}
+
+
+async def acall_hf_fallback(prompt):
+    headers, data = _hf_request(prompt)
+    try:
+        async with httpx.AsyncClient(timeout=HF_TIMEOUT) as client:
+            return _hf_message(await client.post(HF_FALLBACK_URL, headers=headers, json=data))
+    except httpx.HTTPError:
+        return {"role": "assistant", "content": "Sorry, there was a problem contacting the backup AI service. Please try again later."}
+
+
+class _HedgeFailed(Exception):
+    # Both the primary and its hedge were tried and failed; carries the last error
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+def _last_user_text(messages):
+    for m in reversed(messages):
+        if getattr(m, 'type', None) == 'human':
+            return m.content
+    return ''
+
+
+class ProviderRouter:
+    # Calls `build(model).invoke(messages)` on the requested model, falling back through
+    # LLM_FALLBACK_MODELS (healthy and fast first), optionally hedging with the next model.
+
+    def __init__(self, fallbacks=LLM_FALLBACK_MODELS, hedge=LLM_HEDGE_ENABLED):
+        self.fallbacks = fallbacks
+        self.hedge = hedge
+        self._latency = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='llm-hedge')
+
+    def latency(self, model):
+        with self._lock:
+            return self._latency.setdefault(model, LatencyTracker())
+
+    def breaker(self, model):
+        with self._lock:
+            return self._breakers.setdefault(model, CircuitBreaker())
+
+    def candidates(self, model, tools=False):
+        # Requested model first unless its breaker is open; fallbacks by (open, p50, configured order).
+        # Open breakers go last; the final candidate is always called, so a request is never refused untried.
+        fallbacks = [m for m in self.fallbacks if m != model and (not tools or supports_function_calling(m))]
+        def rank(item):
+            index, m = item
+            p50 = self.latency(m).percentile(0.5)
+            return (self.breaker(m).state == 'open', p50 if p50 is not None else float('inf'), index)
+        ordered = [m for _, m in sorted(enumerate(fallbacks), key=rank)]
+        if self.breaker(model).state == 'open':
+            return [m for m in ordered if self.breaker(m).state != 'open'] + [model] + \
+                [m for m in ordered if self.breaker(m).state == 'open']
+        return [model] + ordered
+
+    def hedge_delay(self, model):
+        p95 = self.latency(model).percentile(0.95)
+        return max(LLM_HEDGE_MIN_DELAY, p95) if p95 is not None else LLM_HEDGE_DELAY
+
+    def metric_label(self, model):
+        # Metric label for a model: the client picks the name, so anything outside the catalogue
+        # and the configured fallbacks is counted as 'other' to keep the series bounded
+        return model if model in self.fallbacks or is_known_model(model) else 'other'
+
+    def _record(self, model, started, error=None, response=None):
+        elapsed = time.monotonic() - started
+        label = self.metric_label(model)
+        if error is None:
+            self.latency(model).record(elapsed)
+            self.breaker(model).success()
+            metrics.observe_llm(label, elapsed, 'ok')
+            metrics.observe_llm_tokens(label, response)
+            return
+        if is_rate_limit(error):
+            self.breaker(model).failure(trip=True)
+        elif is_transient(error):
+            self.breaker(model).failure()
+        else:
+            self.breaker(model).release()
+        metrics.observe_llm(label, elapsed, 'rate_limited' if is_rate_limit(error) else 'error')
+
+    def _admit(self, model, force):
+        # A model whose breaker is open (or already has its half-open probe out) is skipped unless forced
+        if not self.breaker(model).admit() and not force:
+            raise BreakerOpen(f'Circuit breaker open for {model}')
+
+    def _attempt(self, model, build, messages, force=False):
+        self._admit(model, force)
+        with tracing.span('llm', model=model):
+            started = time.monotonic()
+            try:
+                response = build(model).invoke(messages)
+            except Exception as e:
+                self._record(model, started, e)
+                logger.warning('LLM %s failed: %s', model, e)
+                raise
+            self._record(model, started, response=response)
+            return response
+
+    async def _aattempt(self, model, build, messages, force=False):
+        self._admit(model, force)
+        with tracing.span('llm', model=model):
+            started = time.monotonic()
+            try:
+                response = await build(model).ainvoke(messages)
+            except asyncio.CancelledError:
+                # The losing side of a hedge: frees the probe if it was one
+                self.breaker(model).release()
+                raise
+            except Exception as e:
+                self._record(model, started, e)
+                logger.warning('LLM %s failed: %s', model, e)
+                raise
+            self._record(model, started, response=response)
+            return response
+
+    # Both raise the primary's own error if it fails before the backup was started (the caller moves
+    # on to the backup next), and _HedgeFailed once both were tried
+    def _hedged(self, primary, backup, build, messages, force_backup=False):
+        first = self._executor.submit(contextvars.copy_context().run, self._attempt, primary, build, messages)
+        try:
+            return first.result(timeout=self.hedge_delay(primary))
+        except FuturesTimeout:
+            pending = {first, self._executor.submit(contextvars.copy_context().run, self._attempt, backup, build, messages, force_backup)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower call finishes in the background and only feeds the latency stats
+                    return future.result()
+                error = future.exception()
+        raise _HedgeFailed(error)
+
+    async def _ahedged(self, primary, backup, build, messages, force_backup=False):
+        first = asyncio.ensure_future(self._aattempt(primary, build, messages))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(primary))
+        if done:
+            return first.result()
+        pending = {first, asyncio.ensure_future(self._aattempt(backup, build, messages, force_backup))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise _HedgeFailed(error)
+
+    def invoke(self, messages, model, build, tools=False, hedge=None):
+        hedge = self.hedge if hedge is None else hedge
+        candidates = self.candidates(model, tools=tools)
+        error = None
+        i = 0
+        while i < len(candidates):
+            last = i == len(candidates) - 1
+            try:
+                if hedge and not last:
+                    return self._hedged(candidates[i], candidates[i + 1], build, messages, force_backup=i + 2 == len(candidates))
+                return self._attempt(candidates[i], build, messages, force=last)
+            except _HedgeFailed as e:
+                error = e.error
+                i += 2
+            except Exception as e:
+                # Includes a primary that failed before its hedge was started: the next one is still untried
+                error = e
+                i += 1
+        if os.getenv('HUGGINGFACE_API_TOKEN') and not tools:
+            return AIMessage(content=call_hf_fallback(_last_user_text(messages))['content'])
+        raise error
+
+    async def ainvoke(self, messages, model, build, tools=False, hedge=None):
+        hedge = self.hedge if hedge is None else hedge
+        candidates = self.candidates(model, tools=tools)
+        error = None
+        i = 0
+        while i < len(candidates):
+            last = i == len(candidates) - 1
+            try:
+                if hedge and not last:
+                    return await self._ahedged(candidates[i], candidates[i + 1], build, messages, force_backup=i + 2 == len(candidates))
+                return await self._aattempt(candidates[i], build, messages, force=last)
+            except _HedgeFailed as e:
+                error = e.error
+                i += 2
+            except Exception as e:
+                # Includes a primary that failed before its hedge was started: the next one is still untried
+                error = e
+                i += 1
+        if os.getenv('HUGGINGFACE_API_TOKEN') and not tools:
+            return AIMessage(content=(await acall_hf_fallback(_last_user_text(messages)))['content'])
+        raise error
+
+    async def astream(self, messages, model, build):
+        # Streaming cannot be hedged or retried once tokens have been sent, so fall back only
+        # while the current model has produced nothing
+        error = None
+        candidates = self.candidates(model)
+        for i, candidate in enumerate(candidates):
+            try:
+                self._admit(candidate, force=i == len(candidates) - 1)
+            except BreakerOpen as e:
+                error = e
+                continue
+            started = time.monotonic()
+            streamed = False
+            with tracing.span('llm', model=candidate, stream=True) as span:
+                try:
+                    async for chunk in build(candidate).astream(messages):
+                        if not streamed:
+                            span.set(first_token_ms=round((time.monotonic() - started) * 1000, 1))
+                        streamed = True
+                        yield chunk
+                except (GeneratorExit, asyncio.CancelledError):
+                    # The client went away mid-stream: frees the probe if it was one
+                    self.breaker(candidate).release()
+                    raise
+                except Exception as e:
+                    self._record(candidate, started, e)
+                    logger.warning('LLM %s failed: %s', candidate, e)
+                    if streamed:
+                        raise
+                    span.fail(e)
+                    error = e
+                    continue
+            self._record(candidate, started)
+            return
+        raise error
+
+    def stats(self):
+        with self._lock:
+            models = sorted(set(self._latency) | set(self._breakers))
+        result = {}
+        for m in models:
+            latency, breaker = self.latency(m), self.breaker(m)
+            result[m] = {
+                'samples': len(latency),
+                'p50': latency.percentile(0.5),
+                'p95': latency.percentile(0.95),
+                'breaker': breaker.state,
+                'consecutive_failures': breaker.failures,
+                'trips': breaker.trips,
+            }
+        return {'hedging': self.hedge, 'fallbacks': self.fallbacks, 'models': result}
+
+
+providers = ProviderRouter()
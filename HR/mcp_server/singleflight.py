@@ -0,0 +1,99 @@
+import json
+import asyncio
+import hashlib
+import threading
+
+# Single-flight: concurrent calls with the same key share one upstream call and its result
+# (or exception). Nothing is kept once the call finishes; caching is the callers' business.
+
+_groups = {}
+
+
+def fingerprint(*parts):
+    # Stable key for arbitrary JSON-able arguments; secrets such as auth tokens only ever appear hashed
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # For code running on threads (sync tools, the agent in the threadpool)
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+        _groups[name] = self
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    # For coroutines on the server's event loop. The upstream call runs as its own task, so a
+    # caller that goes away (client disconnect) does not cancel it for the others.
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+        self.calls = 0
+        self.shared = 0
+        _groups[name] = self
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._tasks)}
+
+
+def stats():
+    return {name: group.stats() for name, group in sorted(_groups.items())}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The server's modules are imported flat (`import cache`), as main.py does when run from mcp_server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import agent
+from cache import ResponseCache
+
+TOOL_MODEL = 'openai/gpt-4o'
+PLAIN_MODEL = 'meta-llama/llama-3-8b-instruct'
+GENERAL = [{'role': 'user', 'content': 'How should I structure a phone screen?'}]
+
+
+def key_for(model, auth_token):
+    return agent._prepare_context(GENERAL, model=model, auth_token=auth_token)[1]
+
+
+def test_tool_capable_model_caches_per_user():
+    alice, bob = key_for(TOOL_MODEL, 'alice-token'), key_for(TOOL_MODEL, 'bob-token')
+    assert alice and bob and alice != bob
+    assert key_for(TOOL_MODEL, 'alice-token') == alice
+
+
+def test_model_without_tools_shares_general_answers():
+    assert key_for(PLAIN_MODEL, 'alice-token') == key_for(PLAIN_MODEL, 'bob-token')
+
+
+def test_cached_answer_is_not_served_to_another_user(monkeypatch):
+    monkeypatch.setattr(agent, 'response_cache', ResponseCache())
+    agent.response_cache.set(key_for(TOOL_MODEL, 'alice-token'), 'answer built for alice')
+    assert agent._cached_response(key_for(TOOL_MODEL, 'bob-token')) is None
+    assert agent._cached_response(key_for(TOOL_MODEL, 'alice-token')) == 'answer built for alice'
+
+
+def test_data_questions_are_never_cached():
+    messages = [{'role': 'user', 'content': 'How many candidates were hired?'}]
+    assert agent._prepare_context(messages, model=PLAIN_MODEL)[1] is None
+
+
+def flight_keys(monkeypatch, model, callers):
+    seen = []
+
+    def record(key, fn, *args, **kwargs):
+        seen.append(key)
+        return 'answer', False
+
+    monkeypatch.setattr(agent.llm_flights, 'do', record)
+    for auth_token in callers:
+        agent.run_agent(GENERAL, model=model, auth_token=auth_token)
+    return seen
+
+
+def test_tool_capable_turns_never_share_a_flight_across_users(monkeypatch):
+    alice, bob = flight_keys(monkeypatch, TOOL_MODEL, ['alice-token', 'bob-token'])
+    assert alice != bob
+
+
+def test_model_without_tools_shares_a_flight_for_general_questions(monkeypatch):
+    alice, bob = flight_keys(monkeypatch, PLAIN_MODEL, ['alice-token', 'bob-token'])
+    assert alice == bob
@@ -0,0 +1,30 @@
+from context import assemble_context, context_budget, RESPONSE_TOKEN_RESERVE
+
+LONG = 'policy ' * 20000
+
+
+def test_client_system_message_is_kept_alongside_the_prompt():
+    messages = [{'role': 'system', 'content': 'Answer in French.'}, {'role': 'user', 'content': 'Hello'}]
+    history, _ = assemble_context(messages, prompt='You are the HR assistant.')
+    assert [m['content'] for m in history] == ['You are the HR assistant.', 'Answer in French.', 'Hello']
+
+
+def test_latest_turn_survives_an_oversized_system_prompt():
+    messages = [
+        {'role': 'user', 'content': 'first question'},
+        {'role': 'assistant', 'content': 'first answer'},
+        {'role': 'user', 'content': 'How many candidates were hired?'},
+    ]
+    history, usage = assemble_context(messages, model='openai/gpt-4', prompt=LONG)
+    assert history[-1] == messages[-1]
+    assert usage['truncated']
+    assert usage['turns_dropped'] == 2
+    assert usage['prompt_tokens'] <= context_budget('openai/gpt-4') - RESPONSE_TOKEN_RESERVE
+
+
+def test_oversized_latest_turn_is_cut_not_dropped():
+    history, usage = assemble_context([{'role': 'user', 'content': LONG}], model='openai/gpt-4', prompt='Prompt')
+    assert history[0]['content'] == 'Prompt'
+    assert history[-1]['role'] == 'user' and history[-1]['content'].startswith('policy')
+    assert usage['truncated']
+    assert usage['prompt_tokens'] <= usage['budget']
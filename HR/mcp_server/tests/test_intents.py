@@ -0,0 +1,55 @@
+import pytest
+
+from intents import accepts, route
+
+
+@pytest.mark.parametrize('message, args', [
+    ('update the stage of candidate 4 to Rejected', {'candidate_id': '4', 'stage': 'rejected'}),
+    ("please change candidate 12's status to interview stage", {'candidate_id': '12', 'stage': 'interview'}),
+])
+def test_stage_update_to_a_known_stage(message, args):
+    intent = route(message)
+    assert intent.name == 'update_stage'
+    assert intent.args == args
+
+
+@pytest.mark.parametrize('message', [
+    'update stage of candidate 4 to rejected because he lied',
+    'move candidate 7 to banana stage',
+    'delete candidate 3 and email them',
+])
+def test_write_that_does_not_parse_in_full_is_left_to_the_model(message):
+    assert route(message) is None
+
+
+def test_write_intents_go_to_the_agent_for_function_calling_models():
+    intent = route('delete candidate 3')
+    assert intent.name == 'delete_candidate'
+    assert not accepts(intent, function_calling=True)
+    assert accepts(intent, function_calling=False)
+
+
+def test_candidate_id_in_a_question_fetches_that_candidate():
+    intent = route('Is candidate 42 a good fit for the backend role?')
+    assert intent.name == 'get_candidate'
+    assert intent.args == {'candidate_id': '42'}
+    assert accepts(intent, function_calling=False)
+    assert not accepts(intent, function_calling=True)
+
+
+def test_reads_are_still_answered_directly_for_function_calling_models():
+    assert accepts(route('show candidate 42'), function_calling=True)
+
+
+@pytest.mark.parametrize('message', [
+    'what are the metrics for hiring a senior engineer?',
+    'write a summary of this job description',
+])
+def test_metrics_need_a_reference_to_candidates_or_the_dashboard(message):
+    assert not accepts(route(message), function_calling=False)
+
+
+def test_metrics_question_about_the_pipeline():
+    intent = route('give me a summary of the candidate pipeline')
+    assert intent.name == 'metrics'
+    assert accepts(intent, function_calling=False)
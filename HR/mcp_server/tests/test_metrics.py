@@ -0,0 +1,33 @@
+from starlette.requests import Request
+
+import metrics
+from catalogue import FUNCTION_CALLING_MODELS
+from providers import ProviderRouter
+
+
+def request(host, headers=()):
+    return Request({'type': 'http', 'method': 'GET', 'path': '/metrics', 'client': (host, 50000),
+                    'headers': [(k.encode(), v.encode()) for k, v in headers]})
+
+
+def test_without_token_only_direct_loopback_clients_are_allowed(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', None)
+    assert metrics.authorized(request('127.0.0.1'))
+    assert metrics.authorized(request('::1'))
+    assert not metrics.authorized(request('10.0.0.5'))
+    assert not metrics.authorized(request('127.0.0.1', [('x-forwarded-for', '203.0.113.9')]))
+
+
+def test_token_is_required_from_every_client_when_set(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 's3cret')
+    assert metrics.authorized(request('10.0.0.5', [('authorization', 'Bearer s3cret')]))
+    assert not metrics.authorized(request('127.0.0.1'))
+    assert not metrics.authorized(request('127.0.0.1', [('authorization', 'Bearer wrong')]))
+
+
+def test_uncatalogued_models_share_one_label():
+    router = ProviderRouter(fallbacks=['backup'], hedge=False)
+    known = next(iter(FUNCTION_CALLING_MODELS))
+    assert router.metric_label(known) == known
+    assert router.metric_label('backup') == 'backup'
+    assert router.metric_label('made-up/model-123') == 'other'
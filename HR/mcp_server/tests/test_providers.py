@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import pytest
+
+from providers import CircuitBreaker, ProviderRouter
+
+
+class FakeModel:
+    def __init__(self, name, calls, fail=False):
+        self.name, self.calls, self.fail = name, calls, fail
+
+    def invoke(self, messages):
+        self.calls.append(self.name)
+        if self.fail:
+            raise RuntimeError(f'{self.name} failed')
+        return f'answer from {self.name}'
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def builder(calls, failing=()):
+    return lambda model: FakeModel(model, calls, fail=model in failing)
+
+
+def router():
+    return ProviderRouter(fallbacks=['backup', 'last'], hedge=True)
+
+
+def test_backup_is_tried_when_the_primary_fails_before_the_hedge_starts():
+    calls = []
+    assert router().invoke([], 'primary', builder(calls, failing={'primary'})) == 'answer from backup'
+    assert calls[:2] == ['primary', 'backup']
+
+
+def test_async_backup_is_tried_when_the_primary_fails_before_the_hedge_starts():
+    calls = []
+    result = asyncio.run(router().ainvoke([], 'primary', builder(calls, failing={'primary'})))
+    assert result == 'answer from backup'
+    assert calls[:2] == ['primary', 'backup']
+
+
+def test_every_candidate_is_tried_once():
+    calls = []
+    with pytest.raises(RuntimeError):
+        router().invoke([], 'primary', builder(calls, failing={'primary', 'backup', 'last'}))
+    assert sorted(calls) == ['backup', 'last', 'primary']
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.failure()
+    breaker.opened_at -= 30
+    admitted = []
+    barrier = threading.Barrier(8)
+
+    def caller():
+        barrier.wait()
+        admitted.append(breaker.admit())
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert admitted.count(True) == 1
+
+
+def test_probe_blocks_other_callers_until_it_reports():
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.failure()
+    breaker.opened_at -= 30
+    assert breaker.state == 'half-open'
+    assert breaker.admit()
+    assert breaker.state == 'open'
+    assert not breaker.admit()
+    breaker.success()
+    assert breaker.state == 'closed' and breaker.admit()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.failure()
+    breaker.opened_at -= 30
+    assert breaker.admit()
+    breaker.failure()
+    assert breaker.state == 'open' and not breaker.admit()
+
+
+def test_last_candidate_is_called_even_with_its_breaker_open():
+    calls = []
+    providers = ProviderRouter(fallbacks=[], hedge=False)
+    providers.breaker('primary').failure(trip=True)
+    assert providers.invoke([], 'primary', builder(calls)) == 'answer from primary'
+
+
+class StreamingModel:
+    async def astream(self, messages):
+        for token in ('one', 'two', 'three'):
+            yield token
+
+
+def test_abandoned_stream_frees_the_half_open_probe():
+    providers = ProviderRouter(fallbacks=[], hedge=False)
+    breaker = providers.breaker('primary')
+    breaker.failure(trip=True)
+    breaker.opened_at -= breaker.cooldown
+
+    async def consume_one():
+        stream = providers.astream([], 'primary', lambda model: StreamingModel())
+        assert await stream.__anext__() == 'one'
+        assert breaker.state == 'open'  # the probe is out
+        await stream.aclose()
+
+    asyncio.run(consume_one())
+    assert breaker.state == 'half-open'
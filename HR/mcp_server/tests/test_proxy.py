@@ -0,0 +1,44 @@
+import httpx
+from starlette.testclient import TestClient
+
+import main
+
+
+class Upstream(httpx.AsyncBaseTransport):
+    # Like httpx.MockTransport, but leaves the response body unread so the proxy can stream it
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.seen = {}
+
+    async def handle_async_request(self, request):
+        self.seen.update(method=request.method, body=await request.aread(), headers=request.headers)
+        status, body, headers = self.respond
+        return httpx.Response(status, headers=headers, stream=httpx.ByteStream(body))
+
+
+def proxy(monkeypatch, *respond):
+    upstream = Upstream(respond)
+    client = httpx.AsyncClient(transport=upstream)
+    monkeypatch.setattr(main, 'get_async_client', lambda: client)
+    return TestClient(main.app), upstream.seen
+
+
+def test_proxy_streams_request_body_with_its_length(monkeypatch):
+    client, seen = proxy(monkeypatch, 201, b'{"id": 7}', {'Content-Type': 'application/json', 'ETag': '"v1"'})
+    response = client.post('/proxy/chatsessions/', json={'session_name': 'x'},
+                           headers={'Authorization': 'Token abc'})
+    assert response.status_code == 201
+    assert response.json() == {'id': 7}
+    assert response.headers['etag'] == '"v1"'
+    assert seen['body'] == b'{"session_name":"x"}'
+    assert seen['headers']['content-length'] == str(len(seen['body']))
+    assert 'transfer-encoding' not in seen['headers']
+    assert seen['headers']['authorization'] == 'Token abc'
+
+
+def test_proxy_sends_no_body_for_bodyless_requests(monkeypatch):
+    client, seen = proxy(monkeypatch, 200, b'[]', {'Content-Type': 'application/json'})
+    assert client.get('/proxy/chatmessages/?session=3').status_code == 200
+    assert seen['body'] == b''
+    assert 'transfer-encoding' not in seen['headers']
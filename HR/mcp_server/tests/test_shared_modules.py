@@ -0,0 +1,48 @@
+import logging
+import os
+
+import pytest
+
+import log
+import tracing
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_CORE = os.path.join(os.path.dirname(HERE), 'backend', 'core')
+
+
+@pytest.mark.parametrize('name', ['log.py', 'tracing.py', 'prometheus.py', 'profiler.py'])
+def test_copies_match_the_backend(name):
+    # Deliberate copies (see the header of each file): a change must be made to both
+    with open(os.path.join(HERE, name), encoding='utf-8') as ours, \
+            open(os.path.join(BACKEND_CORE, name), encoding='utf-8') as theirs:
+        assert ours.read() == theirs.read(), f'mcp_server/{name} and backend/core/{name} differ'
+
+
+def test_filter_redacts_credentials_and_adds_the_trace_id():
+    record = logging.makeLogRecord({'levelno': logging.INFO, 'msg': 'calling with Token abcdef0123456789', 'api_key': 'sk-secret',
+                                    'payload': {'password': 'pw', 'q': 'x'}})
+    root = tracing.begin_trace('test', 'tests')
+    token = tracing.activate(root)
+    try:
+        assert log.StructuredFilter().filter(record)
+    finally:
+        tracing.restore(token)
+    assert 'abcdef0123456789' not in record.msg
+    assert record.api_key == log.REDACTED
+    assert record.payload == {'password': log.REDACTED, 'q': 'x'}
+    assert record.trace_id == root.trace.trace_id
+
+
+def test_continued_trace_keeps_the_caller_ids_and_tags_the_service():
+    root = tracing.begin_trace('GET /x', 'tests', '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01')
+    token = tracing.activate(root)
+    try:
+        with tracing.span('child') as child:
+            headers = tracing.inject({})
+    finally:
+        tracing.restore(token)
+    root.finish(always=True)
+    assert root.trace.trace_id == '4bf92f3577b34da6a3ce929d0e0e4736'
+    assert root.parent_id == '00f067aa0ba902b7'
+    assert headers['traceparent'] == f'00-4bf92f3577b34da6a3ce929d0e0e4736-{child.span_id}-01'
+    assert {span.export()['service'] for span in root.trace.spans} == {'tests'}
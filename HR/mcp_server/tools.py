@@ -1,26 +1,51 @@
+import os
+import logging
 import requests
+import httpx
+from cache import tool_memo
+from metrics import InstrumentedAdapter, AsyncInstrumentedTransport
+from singleflight import SingleFlight, AsyncSingleFlight, fingerprint
 
-DJANGO_API = 'http://localhost:8000/api'
+logger = logging.getLogger(__name__)
 
-def get_candidate(candidate_id, auth_token=None):
-    headers = {"Authorization": f"Token {auth_token}"} if auth_token else {}
-    url = f'{DJANGO_API}/candidates/{candidate_id}/'
-    print(f"[MCP tools] get_candidate URL: {url}")
-    print(f"[MCP tools] get_candidate headers: {headers}")
-    r = requests.get(url, headers=headers)
-    print(f"[MCP tools] get_candidate status: {r.status_code}")
-    print(f"[MCP tools] get_candidate response: {r.text}")
+# Base URL of the Django API (e.g. a staging backend or a local stub for benchmarks)
+DJANGO_API = os.getenv('DJANGO_API_URL', 'http://localhost:8000/api').rstrip('/')
+
+# Every call to the Django API is bounded; a slow backend must not hang a chat turn
+REQUEST_TIMEOUT = 10
+DJANGO_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+DJANGO_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+
+# Sync tools share one keep-alive session; both clients report call durations to /metrics
+django_session = requests.Session()
+django_session.mount('http://', InstrumentedAdapter('django', pool_maxsize=20))
+django_session.mount('https://', InstrumentedAdapter('django', pool_maxsize=20))
+
+_async_client = None
+
+def get_async_client():
+    # Shared keep-alive pool for the async tools; created lazily on the server's event loop
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=DJANGO_TIMEOUT, transport=AsyncInstrumentedTransport('django', limits=DJANGO_LIMITS))
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _auth_headers(auth_token):
+    return {"Authorization": f"Token {auth_token}"} if auth_token else {}
+
+# --- Response handling shared by the sync (requests) and async (httpx) tools ---
+def _candidate_result(r, candidate_id):
     if r.status_code == 200:
         return r.json()
     return {"success": False, "message": f'Candidate {candidate_id} not found.'}
 
-def delete_candidate(candidate_id, auth_token=None):
-    headers = {"Authorization": f"Token {auth_token}"} if auth_token else {}
-    print("[MCP tools] delete_candidate headers:", headers)
-    url = f'{DJANGO_API}/candidates/{candidate_id}/'
-    r = requests.delete(url, headers=headers)
-    print(f"[MCP tools] delete_candidate status: {r.status_code}")
-    print(f"[MCP tools] delete_candidate response: {r.text}")
+def _delete_result(r, candidate_id):
     if r.status_code == 204:
         return {"success": True, "message": f'Candidate {candidate_id} deleted successfully.'}
     # Try to extract error details from backend
@@ -34,51 +59,131 @@ def delete_candidate(candidate_id, auth_token=None):
         msg += f' Reason: {detail}'
     return {"success": False, "message": msg}
 
-def update_candidate(candidate_id, field, value, auth_token=None):
-    headers = {"Authorization": f"Token {auth_token}"} if auth_token else {}
-    print("[MCP tools] update_candidate headers:", headers)
-    r = requests.patch(f'{DJANGO_API}/candidates/{candidate_id}/', json={field: value}, headers=headers)
+def _update_result(r, candidate_id, field, value):
     if r.status_code == 200:
         return {"success": True, "message": f'Candidate {candidate_id} updated: {field} set to {value}.'}
     return {"success": False, "message": f'Failed to update candidate {candidate_id}.'}
 
-def get_candidate_metrics(params=None, auth_token=None):
-    headers = {"Authorization": f"Token {auth_token}"} if auth_token else {}
-    url = f'{DJANGO_API}/candidates/metrics/'
-    print(f"[MCP tools] get_candidate_metrics URL: {url}")
-    print(f"[MCP tools] get_candidate_metrics headers: {headers}")
-    r = requests.get(url, params=params or {}, headers=headers)
-    print(f"[MCP tools] get_candidate_metrics status: {r.status_code}")
-    print(f"[MCP tools] get_candidate_metrics response: {r.text}")
+def _metrics_result(r):
     if r.status_code == 200:
         return r.json()
     return {"success": False, "message": 'Failed to fetch candidate metrics.'}
 
-def list_candidates(page=1, auth_token=None):
-    headers = {"Authorization": f"Token {auth_token}"} if auth_token else {}
-    url = f'{DJANGO_API}/candidates/'
-    print(f"[MCP tools] list_candidates URL: {url}")
-    print(f"[MCP tools] list_candidates headers: {headers}")
-    r = requests.get(url, params={'page': page}, headers=headers)
-    print(f"[MCP tools] list_candidates status: {r.status_code}")
-    print(f"[MCP tools] list_candidates response: {r.text}")
+def _list_result(r):
     if r.status_code == 200:
         return r.json()
     return {"success": False, "message": 'Failed to fetch candidates list.'}
 
+def _find_result(r):
+    if r.status_code == 200:
+        return r.json()
+    return {"success": False, "message": 'Failed to look up candidates.'}
+
+def _log_call(tool, r):
+    # Status and size only; bodies hold whole candidate pages
+    logger.debug('%s %s %s -> %s (%d bytes)', tool, r.request.method, r.url, r.status_code, len(r.content))
+
+def get_candidate(candidate_id, auth_token=None):
+    headers = _auth_headers(auth_token)
+    url = f'{DJANGO_API}/candidates/{candidate_id}/'
+    r = django_session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    _log_call('get_candidate', r)
+    return _candidate_result(r, candidate_id)
+
+def delete_candidate(candidate_id, auth_token=None):
+    headers = _auth_headers(auth_token)
+    url = f'{DJANGO_API}/candidates/{candidate_id}/'
+    r = django_session.delete(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    _log_call('delete_candidate', r)
+    return _delete_result(r, candidate_id)
+
+def update_candidate(candidate_id, field, value, auth_token=None):
+    headers = _auth_headers(auth_token)
+    r = django_session.patch(f'{DJANGO_API}/candidates/{candidate_id}/', json={field: value}, headers=headers, timeout=REQUEST_TIMEOUT)
+    _log_call('update_candidate', r)
+    return _update_result(r, candidate_id, field, value)
+
+def get_candidate_metrics(params=None, auth_token=None):
+    headers = _auth_headers(auth_token)
+    url = f'{DJANGO_API}/candidates/metrics/'
+    r = django_session.get(url, params=params or {}, headers=headers, timeout=REQUEST_TIMEOUT)
+    _log_call('get_candidate_metrics', r)
+    return _metrics_result(r)
+
+def list_candidates(page=1, auth_token=None):
+    headers = _auth_headers(auth_token)
+    url = f'{DJANGO_API}/candidates/'
+    r = django_session.get(url, params={'page': page}, headers=headers, timeout=REQUEST_TIMEOUT)
+    _log_call('list_candidates', r)
+    return _list_result(r)
+
+def find_candidates(query, limit=10, auth_token=None):
+    # Server-side prefix lookup by name, email or phone; returns {'count', 'results'} with the top `limit` matches
+    r = django_session.get(f'{DJANGO_API}/candidates/lookup/', params={'q': query, 'limit': limit},
+                           headers=_auth_headers(auth_token), timeout=REQUEST_TIMEOUT)
+    _log_call('find_candidates', r)
+    return _find_result(r)
+
+# --- Async variants for the FastAPI handlers: never block the event loop on the Django API ---
+def _unavailable(e):
+    logger.warning('Django API call failed: %r', e)
+    return {"success": False, "message": f'HR backend unavailable: {e.__class__.__name__}.'}
+
+async def aget_candidate(candidate_id, auth_token=None):
+    try:
+        r = await get_async_client().get(f'{DJANGO_API}/candidates/{candidate_id}/', headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _candidate_result(r, candidate_id)
+
+async def adelete_candidate(candidate_id, auth_token=None):
+    try:
+        r = await get_async_client().delete(f'{DJANGO_API}/candidates/{candidate_id}/', headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _delete_result(r, candidate_id)
+
+async def aupdate_candidate(candidate_id, field, value, auth_token=None):
+    try:
+        r = await get_async_client().patch(f'{DJANGO_API}/candidates/{candidate_id}/', json={field: value}, headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _update_result(r, candidate_id, field, value)
+
+async def aget_candidate_metrics(params=None, auth_token=None):
+    try:
+        r = await get_async_client().get(f'{DJANGO_API}/candidates/metrics/', params=params or {}, headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _metrics_result(r)
+
+async def alist_candidates(page=1, auth_token=None):
+    try:
+        r = await get_async_client().get(f'{DJANGO_API}/candidates/', params={'page': page}, headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _list_result(r)
+
+async def afind_candidates(query, limit=10, auth_token=None):
+    try:
+        r = await get_async_client().get(f'{DJANGO_API}/candidates/lookup/', params={'q': query, 'limit': limit}, headers=_auth_headers(auth_token))
+    except httpx.HTTPError as e:
+        return _unavailable(e)
+    return _find_result(r)
+
 # Format a single candidate dict as markdown
 def format_candidate(candidate):
     # Compose a detailed markdown summary of the candidate
     name = f"{candidate.get('first_name', '')} {candidate.get('last_name', '')}".strip()
     email = candidate.get('email', '')
     phone = candidate.get('phone_number', '')
-    job_title = candidate.get('job_title_detail', {}).get('name', '')
+    job_title = (candidate.get('job_title_detail') or {}).get('name', '')
     status = candidate.get('candidate_stage', candidate.get('status', ''))
-    skills = candidate.get('skills') or candidate.get('communication_skills_detail', {}).get('name', '')
+    skills = candidate.get('skills') or (candidate.get('communication_skills_detail') or {}).get('name', '')
     if isinstance(skills, list):
         skills = ', '.join(skills)
-    city = candidate.get('city_detail', {}).get('name', '')
-    source = candidate.get('source_detail', {}).get('name', '')
+    city = (candidate.get('city_detail') or {}).get('name', '')
+    source = (candidate.get('source_detail') or {}).get('name', '')
     experience = candidate.get('years_of_experience', candidate.get('experience', ''))
     notes = candidate.get('notes', '')
     created_at = candidate.get('created_at', '')
@@ -116,5 +221,117 @@ def format_candidate_list(candidates):
     md = '| ' + ' | '.join(headers) + ' |\n'
     md += '| ' + ' | '.join(['---'] * len(headers)) + ' |\n'
     for row in rows:
-        md += '| ' + ' | '.join(row) + ' |\n'
-    return md 
\ No newline at end of file
+        md += '| ' + ' | '.join(str(cell) for cell in row) + ' |\n'
+    return md 
+
+# --- Tool backend selection ---
+# 'http' (default) calls the Django API; 'orm' runs the same tools in-process against the ORM
+TOOL_BACKEND = os.getenv('MCP_TOOL_BACKEND', 'http')
+if TOOL_BACKEND == 'orm':
+    from orm_tools import (  # noqa: F811
+        get_candidate, delete_candidate, update_candidate, get_candidate_metrics, list_candidates, find_candidates,
+        aget_candidate, adelete_candidate, aupdate_candidate, aget_candidate_metrics, alist_candidates, afind_candidates,
+    )
+
+# --- Conversation-scoped memo (cache.ToolMemo): repeated reads in a chat session are free ---
+# Wraps whichever backend was selected above; writes invalidate what they touch.
+def _succeeded(result):
+    return isinstance(result, dict) and result.get('success') is not False
+
+def _memo_read(tool, read, args_of):
+    def wrapper(*args, auth_token=None, **kwargs):
+        scope = tool_memo.scope(auth_token)
+        if scope is None:
+            return read(*args, auth_token=auth_token, **kwargs)
+        key = tool_memo.key(scope, tool, args_of(*args, **kwargs))
+        result = tool_memo.get(key)
+        if result is None:
+            generation = tool_memo.generation
+            result = read(*args, auth_token=auth_token, **kwargs)
+            if _succeeded(result):
+                tool_memo.set(key, result, generation)
+        return result
+    return wrapper
+
+def _amemo_read(tool, read, args_of):
+    async def wrapper(*args, auth_token=None, **kwargs):
+        scope = tool_memo.scope(auth_token)
+        if scope is None:
+            return await read(*args, auth_token=auth_token, **kwargs)
+        key = tool_memo.key(scope, tool, args_of(*args, **kwargs))
+        result = tool_memo.get(key)
+        if result is None:
+            generation = tool_memo.generation
+            result = await read(*args, auth_token=auth_token, **kwargs)
+            if _succeeded(result):
+                tool_memo.set(key, result, generation)
+        return result
+    return wrapper
+
+def _memo_write(write):
+    def wrapper(candidate_id, *args, **kwargs):
+        try:
+            return write(candidate_id, *args, **kwargs)
+        finally:
+            # Even a failed write may have reached the database
+            tool_memo.invalidate_candidate(candidate_id)
+    return wrapper
+
+def _amemo_write(write):
+    async def wrapper(candidate_id, *args, **kwargs):
+        try:
+            return await write(candidate_id, *args, **kwargs)
+        finally:
+            tool_memo.invalidate_candidate(candidate_id)
+    return wrapper
+
+def _candidate_args(candidate_id):
+    return {'candidate_id': str(candidate_id)}
+
+def _metrics_args(params=None):
+    return {'params': params or {}}
+
+def _list_args(page=1):
+    return {'page': str(page or 1)}
+
+def _find_args(query, limit=10):
+    return {'query': ' '.join(str(query).lower().split()), 'limit': limit}
+
+# --- Single-flight: identical concurrent reads (same tool, arguments and user) share one call ---
+# The memo generation is part of the key, so a read issued after a write never joins one from before it.
+tool_flights = SingleFlight('tools')
+atool_flights = AsyncSingleFlight('tools_async')
+
+def _coalesced(tool, read, args_of):
+    def wrapper(*args, auth_token=None, **kwargs):
+        key = fingerprint(tool, args_of(*args, **kwargs), auth_token, tool_memo.generation)
+        return tool_flights.do(key, read, *args, auth_token=auth_token, **kwargs)
+    return wrapper
+
+def _acoalesced(tool, read, args_of):
+    async def wrapper(*args, auth_token=None, **kwargs):
+        key = fingerprint(tool, args_of(*args, **kwargs), auth_token, tool_memo.generation)
+        return await atool_flights.do(key, read, *args, auth_token=auth_token, **kwargs)
+    return wrapper
+
+get_candidate = _coalesced('get_candidate', get_candidate, _candidate_args)
+aget_candidate = _acoalesced('get_candidate', aget_candidate, _candidate_args)
+get_candidate_metrics = _coalesced('get_candidate_metrics', get_candidate_metrics, _metrics_args)
+aget_candidate_metrics = _acoalesced('get_candidate_metrics', aget_candidate_metrics, _metrics_args)
+list_candidates = _coalesced('list_candidates', list_candidates, _list_args)
+alist_candidates = _acoalesced('list_candidates', alist_candidates, _list_args)
+find_candidates = _coalesced('find_candidates', find_candidates, _find_args)
+afind_candidates = _acoalesced('find_candidates', afind_candidates, _find_args)
+
+get_candidate = _memo_read('get_candidate', get_candidate, _candidate_args)
+aget_candidate = _amemo_read('get_candidate', aget_candidate, _candidate_args)
+get_candidate_metrics = _memo_read('get_candidate_metrics', get_candidate_metrics, _metrics_args)
+aget_candidate_metrics = _amemo_read('get_candidate_metrics', aget_candidate_metrics, _metrics_args)
+list_candidates = _memo_read('list_candidates', list_candidates, _list_args)
+alist_candidates = _amemo_read('list_candidates', alist_candidates, _list_args)
+find_candidates = _memo_read('find_candidates', find_candidates, _find_args)
+afind_candidates = _amemo_read('find_candidates', afind_candidates, _find_args)
+update_candidate = _memo_write(update_candidate)
+aupdate_candidate = _amemo_write(aupdate_candidate)
+delete_candidate = _memo_write(delete_candidate)
+adelete_candidate = _amemo_write(adelete_candidate)
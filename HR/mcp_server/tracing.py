@@ -0,0 +1,258 @@
+# Request tracing for the Django API (core/tracing.py) and the MCP server (mcp_server/tracing.py).
+#
+# The two files are deliberate copies and must stay identical: the services are installed and
+# deployed separately, and neither can import the other's code. mcp_server/tests/test_shared_modules.py
+# fails when they drift, so change one and copy it over the other. Framework glue lives next to
+# each copy (core/tracing_middleware.py, mcp_server/tracing_middleware.py).
+#
+# Trace context travels in the W3C "traceparent" header; every hop (handler, intent router,
+# agent, LLM call, tool, HTTP call, SQL statement) is a span. Finished traces are written as one
+# JSON line each by a background thread; mcp_server/benchmarks/trace_waterfall.py merges both
+# services' files into waterfalls.
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'False') == 'True'
+# Share of new traces exported; an incoming traceparent's sampled flag wins
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.1'))
+# 'stdout' or a file path (JSON lines, appended)
+TRACE_EXPORT = os.environ.get('TRACE_EXPORT', 'stdout')
+# Spans kept per trace; the rest are counted as dropped (e.g. an N+1 loop or a tool run issuing thousands of queries)
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '500'))
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+
+class Trace:
+
+    def __init__(self, trace_id, sampled, service):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.service = service
+        self.spans = []
+        self.dropped = 0
+        # Wall clock once per trace; span offsets come from the monotonic clock
+        self.epoch = time.time()
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span, always=False):
+        with self._lock:
+            if always or len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attrs', 'status', 'start', 'end')
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.status = 'ok'
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, error):
+        self.status = 'error'
+        self.attrs['error'] = f'{error.__class__.__name__}: {error}'[:300]
+
+    def finish(self, always=False):
+        self.end = time.perf_counter()
+        self.trace.add(self, always)
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def export(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'service': self.trace.service,
+            'start': round(self.trace.epoch + self.start - self.trace.origin, 6),
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'attrs': self.attrs,
+        }
+
+
+class _NoopSpan:
+    # Handed out when there is no active trace, so call sites never need to check
+
+    def set(self, **attrs):
+        pass
+
+    def fail(self, error):
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+def parse_traceparent(value):
+    # version-trace_id-parent_id-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+    parts = (value or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == '0' * 32:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def current_span():
+    return _current.get()
+
+
+def inject(headers):
+    # Adds traceparent for the active span to an outgoing request's headers
+    span = _current.get()
+    if span is not None:
+        headers['traceparent'] = f"00-{span.trace.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+    return headers
+
+
+def activate(span):
+    # Makes `span` the current span; pass the result to restore() when it ends
+    return _current.set(span)
+
+
+def restore(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A generator (streamed body) closed from another context, e.g. on client disconnect; nothing to restore
+        pass
+
+
+def begin_trace(name, service, traceparent=None, **attrs):
+    # Root span of this service's part of a trace; continues the caller's trace when given one
+    parent = parse_traceparent(traceparent)
+    if parent:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < TRACE_SAMPLE_RATE
+    return Span(Trace(trace_id, sampled, service), name, parent_id, attrs)
+
+
+def end_trace(root, slow_ms=0):
+    # Exports sampled traces, and unsampled ones slower than slow_ms (0 turns that off)
+    root.finish(always=True)
+    if root.trace.sampled or (slow_ms and root.duration_ms >= slow_ms):
+        exporter.submit(root)
+
+
+@contextmanager
+def start_trace(name, service, traceparent=None, slow_ms=0, **attrs):
+    if not TRACING_ENABLED:
+        yield NOOP
+        return
+    root = begin_trace(name, service, traceparent, **attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.fail(e)
+        raise
+    finally:
+        restore(token)
+        end_trace(root, slow_ms)
+
+
+@contextmanager
+def span(name, **attrs):
+    parent = _current.get()
+    if parent is None:
+        yield NOOP
+        return
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        restore(token)
+        child.finish()
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    # Django connection.execute_wrapper hook: one span per statement or executemany batch (no parameters)
+    with span('sql', statement=sql[:200], many=many):
+        return execute(sql, params, many, context)
+
+
+class Exporter:
+    # Writes finished traces from a background thread so requests never wait on I/O
+
+    def __init__(self, target):
+        self.target = target
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, root):
+        trace = root.trace
+        with trace._lock:
+            spans = [s.export() for s in trace.spans]
+            dropped = trace.dropped
+        record = {
+            'trace_id': trace.trace_id,
+            'service': trace.service,
+            'root': root.name,
+            'duration_ms': round(root.duration_ms, 3),
+            'sampled': trace.sampled,
+            'dropped_spans': dropped,
+            'spans': spans,
+        }
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        out = sys.stdout if self.target == 'stdout' else open(self.target, 'a', buffering=1)
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            out.write(json.dumps(record, default=str) + '\n')
+        out.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+
+exporter = Exporter(TRACE_EXPORT)
@@ -0,0 +1,37 @@
+import os
+import tracing
+
+# ASGI side of request tracing (the span and export code is tracing.py, shared with the Django
+# API). Continues the caller's trace from its traceparent header or starts a new one.
+
+SERVICE_NAME = 'mcp_server'
+# Unsampled requests slower than this are exported anyway (0 turns it off)
+TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', '2000'))
+
+
+class TracingMiddleware:
+    # Pure ASGI: the root span covers streamed bodies too; X-Trace-Id on the response finds it
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not tracing.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get('headers') or [])
+        traceparent = headers.get(b'traceparent', b'').decode('latin-1')
+        with tracing.start_trace(f"{scope['method']} {scope['path']}", SERVICE_NAME, traceparent, TRACE_SLOW_MS) as root:
+
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    root.set(status=message['status'])
+                    message['headers'] = list(message.get('headers', [])) + [(b'x-trace-id', root.trace.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get('route'), 'path', None)
+                if route:
+                    root.name = f"{scope['method']} {route}"